@@ -17,6 +17,7 @@ import requests
 import logging
 from logging.handlers import RotatingFileHandler
 import threading
+import concurrent.futures
 import psutil
 from datetime import datetime, timedelta, timezone
 import mimetypes
@@ -29,7 +30,22 @@ import shutil
 # auto-setup, will create .env and settings.json if not present
 import setup
 import git_utils
+import git_cat_file
+import git_backend
+import git_executor
+import git_cache
+import lastmod_index
+import status_cache
 import local_ip
+import http_client
+import delta_chunks
+import heartbeat_manifest
+import metrics_sampler
+import task_channel
+import task_executor
+import task_registry
+import result_outbox
+import task_coalescer
 
 # Ensure console logging works on Windows terminals with non-ASCII messages.
 for _stream in (sys.stdout, sys.stderr):
@@ -123,6 +139,7 @@ AUTH_ENDPOINT = f"{STARGIT_API_URL}/api/auth/token"
 REGISTER_ENDPOINT = f"{STARGIT_API_URL}/api/servers/register"
 HEARTBEAT_ENDPOINT = f"{STARGIT_API_URL}/api/servers/heartbeat"
 POLL_ENDPOINT = f"{STARGIT_API_URL}/api/servers/poll"
+TASK_STREAM_ENDPOINT = f"{STARGIT_API_URL}/api/servers/tasks/stream"
 
 GIT_VERBOSE_MODE = os.getenv("GIT_VERBOSE", "false").lower() in ("1", "true", "yes", "on")
 
@@ -166,7 +183,7 @@ def check_api_key():
             "Content-Type": "application/json"
         }
         try:
-            response = requests.post(STARGIT_URL, headers=headers)
+            response = http_client.post(STARGIT_URL, endpoint="token_check", headers=headers)
             if response.status_code != 200:
                 logger.warning("Invalid StarGit token, status code: %s", response.status_code)
                 abort(401, description="Unauthorized access, invalid Token")
@@ -216,18 +233,37 @@ def validate_session(lock_path, session_id):
     logger.debug("Session validated successfully")
     return True, None
 
-def run_git_command(path, command):
-    """Utility function to run a git command and return the output."""
+def run_git_command(path, command, cache=False):
+    """
+    Utility function to run a git command and return the output.
+    cache=True serves read-only, ref-derived queries from git_cache until
+    the repository's refs/HEAD/index/config change.
+    """
+    if cache:
+        return git_cache.get_or_compute(
+            path, command,
+            lambda: run_git_command(path, command),
+            cacheable=lambda output: not output.startswith("Error:")
+        )
+
     if GIT_VERBOSE_MODE:
         logger.debug("Running git command: %s in path: %s", command, path)
     try:
-        result = subprocess.run(command, cwd=path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+        result = git_executor.run(command, cwd=path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
         if GIT_VERBOSE_MODE:
             logger.debug("Git command output: %s", result.stdout.strip())
         return result.stdout.strip()
     except subprocess.CalledProcessError as e:
         logger.error("Git command error: %s", e.stderr.strip())
         return f"Error: {e.stderr.strip()}"
+    except subprocess.TimeoutExpired as e:
+        logger.error("Git command timed out after %ss: %s", e.timeout, command)
+        return f"Error: git command timed out after {e.timeout}s"
+
+def _run_git_bytes(command):
+    """Run git and return (returncode, stdout bytes, stderr bytes)."""
+    result = git_executor.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return result.returncode, result.stdout, result.stderr
 
 @app.route('/api/refs', methods=['POST'])
 def get_refs():
@@ -242,16 +278,10 @@ def get_refs():
         return jsonify({"error": f"Repository path '{repo_path}' not found in registered repositories"}), 400
 
     # Get local refs
-    local_refs = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "show-ref"])
-    local_refs_info = []
-    
-    for ref in local_refs.splitlines():
-        if ref.strip():  # Check if the line is not empty
-            sha, name = ref.split(' ', 1)
-            local_refs_info.append({
-                "name": name,
-                "sha": sha
-            })
+    local_refs_info = [
+        {"name": name, "sha": sha}
+        for sha, name in git_backend.get_backend().show_ref(repo_path)
+    ]
 
     # Get remote refs
     remote_refs = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "ls-remote"])
@@ -322,13 +352,11 @@ def get_branches_data(repo_path):
         return None, {"type": "NotFound", "message": f"Repository path '{repo_path}' not found in registered repositories"}
 
     try:
+        backend = git_backend.get_backend()
+
         # Local branches
-        local_branches = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "branch", "--format", "%(refname:short)"])
         local_branches_info = []
-        for b in local_branches.splitlines():
-            name = b.strip()
-            if not name:
-                continue
+        for name in backend.branches(repo_path):
             # Detached HEAD appears as a pseudo-branch like "(HEAD detached from ...)".
             # It is not a real ref and fails rev-parse/sync logic.
             if name.startswith("(") and "detached" in name.lower():
@@ -336,8 +364,7 @@ def get_branches_data(repo_path):
             local_branches_info.append({"name": name})
 
         # Remote branches
-        remote_branches = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "branch", "-r", "--format", "%(refname:short)"])
-        remote_branches_info = [{"name": b.strip()} for b in remote_branches.splitlines() if b.strip()]
+        remote_branches_info = [{"name": b} for b in backend.branches(repo_path, remote=True)]
 
         branches_data = {
             "local_branches": local_branches_info,
@@ -433,27 +460,10 @@ def get_remotes():
         return jsonify({"error": f"Repository path '{repo_path}' not found in registered repositories"}), 400
 
     # Get list of remotes
-    try:
-        remotes = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "remote", "-v"])
-    except subprocess.CalledProcessError as e:
-        logger.error("Failed to retrieve remotes: %s", e)
-        return jsonify({"error": f"Failed to retrieve remotes: {e}"}), 500
-
-    # Parse remote information
-    remotes_info = []
-    for line in remotes.splitlines():
-        if line.strip():  # Ensure the line is not empty
-            parts = line.split()
-            if len(parts) >= 2:  # Expected format: <name> <url> (fetch/push)
-                remote_name, remote_url = parts[0], parts[1]
-                remote_type = parts[2].strip("()") if len(parts) > 2 else "unknown"
-                
-                # Append remote information to the list
-                remotes_info.append({
-                    "name": remote_name,
-                    "url": remote_url,
-                    "type": remote_type
-                })
+    remotes_info = [
+        {"name": remote_name, "url": remote_url, "type": remote_type}
+        for remote_name, remote_url, remote_type in git_backend.get_backend().remotes(repo_path)
+    ]
 
     # Return remote information
     result = {
@@ -486,8 +496,8 @@ def rev_walk():
     # Git command to get commit details with parents, author info, date, and message
     command = [GIT_EXECUTABLE, "-C", path, "log", f"--date=iso", "--pretty=format:%H|%P|%an|%ae|%ad|%s", branch]
 
-    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stdout, stderr = process.communicate()
+    process = git_executor.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = process.stdout, process.stderr
 
     if process.returncode != 0:
         # for initial commit
@@ -570,7 +580,7 @@ def diff():
         # If no commit1 or commit2 is provided, it defaults to the working directory diff (uncommitted changes)
 
         # Run the git diff command
-        result = subprocess.run(git_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        result = git_executor.run(git_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
         if result.returncode != 0:
             logger.error("Error running git diff: %s", result.stderr)
@@ -593,7 +603,7 @@ def diff():
             commit_details_command = [
                 GIT_EXECUTABLE, "-C", repo_path, "show", "--no-patch", "--format=%B%n%an%n%ae%n%ad%n%P", commit
             ]
-            result_message = subprocess.run(commit_details_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            result_message = git_executor.run(commit_details_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
             if result_message.returncode != 0:
                 logger.error("Error getting commit details: %s", result_message.stderr)
@@ -665,11 +675,12 @@ def push():
         git_push_command.extend([remote, branch])
 
         # Run the git push command
-        result = subprocess.run(git_push_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        result = git_executor.run(git_push_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
         if result.returncode != 0:
             logger.error("Error pushing changes: %s", result.stderr.strip())
             raise Exception(f"Error pushing changes: {result.stderr.strip()}")
+        git_utils.invalidate_remote_heads(repo_path, remote)
 
         # Return success response
         return jsonify({
@@ -718,6 +729,9 @@ def git_pull():
         logger.debug("Running git pull for repository at %s with mode %s", repo_path, pull_mode)
         pull_result = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "pull", pull_mode])
         logger.debug("Git pull output: %s", pull_result)
+        lastmod_index.update(repo_path)
+        status_cache.invalidate(repo_path)
+        git_utils.invalidate_remote_heads(repo_path)
         
         return jsonify({
             "success": True,
@@ -751,7 +765,7 @@ def add_remote():
 
     try:
         # Run git remote add command
-        result = subprocess.run(
+        result = git_executor.run(
             [GIT_EXECUTABLE, "remote", "add", remote_name, remote_url],
             cwd=repo_path,
             stdout=subprocess.PIPE,
@@ -806,12 +820,14 @@ def commit():
 
         # Commit with the provided message
         author_info = f"{name} <{email}>"
-        subprocess.run([GIT_EXECUTABLE, "commit", "--author", author_info, "-a", "-m", commit_message], cwd=path, check=True)
+        git_executor.run([GIT_EXECUTABLE, "commit", "--author", author_info, "-a", "-m", commit_message], cwd=path, check=True)
         #subprocess.run([GIT_EXECUTABLE, "commit", "-m", commit_message], cwd=path, check=True)
 
         # Get the latest commit ID
-        result = subprocess.run([GIT_EXECUTABLE, "rev-parse", "HEAD"], cwd=path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        result = git_executor.run([GIT_EXECUTABLE, "rev-parse", "HEAD"], cwd=path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
         commit_id = result.stdout.decode().strip()
+        lastmod_index.update(path)
+        status_cache.invalidate(path)
 
         # Return success response with the new commit ID
         return jsonify({
@@ -830,12 +846,19 @@ def commit():
 def get_git_status_data(repo_path, git_executable="git"):
     """
     Full Git status with staged/unstaged/conflicts support using porcelain=v2.
+    Served from status_cache while the watched repo has not changed.
     """
+    return status_cache.get_or_compute(
+        repo_path,
+        lambda: _compute_git_status_data(repo_path, git_executable)
+    )
+
+def _compute_git_status_data(repo_path, git_executable="git"):
     logger.debug(f"Fetching git status for {repo_path}")
     try:
         # Use porcelain=v2 with -z for machine-readable, unambiguous output
         # Use "--untracked-files=all" to list all untracked files
-        result = subprocess.run(
+        result = git_executor.run(
             [git_executable, "-C", repo_path, "status", "--porcelain=v2", "-z", "--branch"],
             capture_output=True,
             text=True,
@@ -1171,7 +1194,7 @@ def create_user_repos():
 
     try:
         # Initialize a new Git repository
-        subprocess.run(['git', 'init', repo_path], check=True)
+        git_executor.run([GIT_EXECUTABLE, 'init', repo_path], check=True)
         
 
         ### Create a README file with the description
@@ -1224,14 +1247,9 @@ def list_user_repos():
         elif "You have unmerged paths" in status:
             action_status = "merge"
 
-        # Get the remote URL
-        remote = run_git_command(local_path, [GIT_EXECUTABLE, "remote", "-v"])
-
-        # Parse the remote information to get the URL
-        remote_url = None
-        if remote:
-            remote_lines = remote.splitlines()
-            remote_url = remote_lines[0].split()[1] if remote_lines else None
+        # Get the remote URL (first listed remote)
+        remotes = git_backend.get_backend().remotes(local_path)
+        remote_url = remotes[0][1] if remotes else None
 
         # Append the repository information to the list
         repositories.append({
@@ -1291,16 +1309,9 @@ def list_repositories():
             elif "You have unmerged paths" in status:
                 action_status = "merge"
 
-            # Get the remote URL
-            remote = run_git_command(local_path, [GIT_EXECUTABLE, "remote", "-v"])
-
-            # Parse the remote information to get the URL
-            remote_url = None
-            remote_name = None
-            if remote:
-                remote_lines = remote.splitlines()
-                remote_url = remote_lines[0].split()[1] if remote_lines else None
-                remote_name = remote_lines[0].split()[0] if remote_lines else None
+            # Get the remote URL (first listed remote)
+            remotes = git_backend.get_backend().remotes(local_path)
+            remote_name, remote_url = (remotes[0][0], remotes[0][1]) if remotes else (None, None)
 
             # Append the repository information to the list
             repositories.append({
@@ -1679,7 +1690,7 @@ def reset_branch(repo_path, branch):
             logger.debug("Resetting branch '%s' in non-bare repository at %s to match the latest pushed commit.", branch, repo_path)
             
             # Perform git reset --hard using the git binary
-            result = subprocess.run(['git', 'reset', '--hard'], cwd=repo_path, capture_output=True, text=True)
+            result = git_executor.run([GIT_EXECUTABLE, 'reset', '--hard'], cwd=repo_path, capture_output=True, text=True)
 
             if result.returncode != 0:
                 logger.error(f"Error during git reset --hard: {result.stderr}")
@@ -1888,6 +1899,7 @@ def update_ref():
         logger.debug("Writing to heads/%s with commit_id: %s", branch, commit_id)
         with open(heads_master_path, 'w') as f:
             f.write(commit_id + '\n')
+        lastmod_index.update(repo_path)
         
         result = {
             "message": f"Reference updated successfully for {branch}",
@@ -1908,17 +1920,19 @@ def update_ref():
         return jsonify({"error": "Failed to update reference"}), 500
 
 def collect_server_metrics():
-    """Collect basic server metrics for registration."""
+    """Collect basic server metrics for registration (latest background sample, no blocking)."""
     try:
         uptime = time.time() - psutil.boot_time()
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
+        sample = metrics_sampler.latest()
         host_name = socket.gethostname()
         stats = {
             'host_name': host_name,
             "uptime_seconds": uptime,
-            "cpu_percent": cpu_percent,
-            "memory_percent": memory.percent,
+            "cpu_percent": sample["cpu_percent"],
+            "memory_percent": sample["memory_percent"],
+            "open_files": sample["open_files"],
+            "threads": sample["threads"],
+            "git_processes": sample["git_processes"],
             "repo_count": len(REPOSITORIES),
             "version": "1.0.0"  # Replace with __version__ or similar
         }
@@ -1940,8 +1954,9 @@ def get_access_token():
     # Try refreshing if refresh_token exists
     if tokens['refresh_token']:
         try:
-            response = requests.post(
+            response = http_client.post(
                 AUTH_ENDPOINT.replace('/token', '/refresh'),
+                endpoint="auth",
                 json={'refresh_token': tokens['refresh_token']}
             )
             if response.status_code == 200:
@@ -1977,7 +1992,7 @@ def get_access_token():
                 "server_uuid": SERVER_UUID
             }
         }
-        response = requests.post(AUTH_ENDPOINT, json=payload, headers=headers)
+        response = http_client.post(AUTH_ENDPOINT, endpoint="auth", json=payload, headers=headers)
         if response.status_code == 200:
             data = response.json()
             tokens['access_token'] = data['access_token']
@@ -1994,12 +2009,21 @@ def get_access_token():
         return None
 
 
-import concurrent.futures
-
 def get_file_list(repo_path):
     """Get a list of committed files with metadata: name, latest_sha, size."""
-    # Single command for all files: mode type blob_sha size path
-    command = [GIT_EXECUTABLE, "-C", repo_path, "ls-tree", "-r", "-l", "HEAD"]
+    return git_cache.get_or_compute(
+        repo_path, ("get_file_list",),
+        lambda: _compute_file_list(repo_path),
+        cacheable=lambda result: bool(result[0])
+    )
+
+def _compute_file_list(repo_path):
+    head = git_backend.get_backend().rev_parse(repo_path, "HEAD")
+    if not head:
+        return [], 0
+
+    # Single command for all files: "mode type blob_sha size\tpath\0"
+    command = [GIT_EXECUTABLE, "-C", repo_path, "ls-tree", "-r", "-l", "-z", head]
     output = run_git_command(repo_path, command)
     if output.startswith("Error:"):
         logger.warning("Failed to get file list for repo %s", repo_path)
@@ -2007,38 +2031,31 @@ def get_file_list(repo_path):
     
     file_info = []
     total_size = 0
-    for line in output.splitlines():
-        if not line.strip():
+    for entry in output.split("\0"):
+        if "\t" not in entry:
             continue
-        parts = line.split(maxsplit=4)  # mode, type, blob_sha, size, path (handle spaces in paths)
-        if len(parts) == 5:
-            mode, obj_type, blob_sha, size_str, file_path = parts
+        meta, file_path = entry.split("\t", 1)  # paths are not quoted with -z
+        parts = meta.split()  # mode, type, blob_sha, size
+        if len(parts) == 4:
+            mode, obj_type, blob_sha, size_str = parts
             if obj_type == 'blob':  # Only files, skip trees
                 file_size = int(size_str) if size_str.isdigit() else 0
                 total_size += file_size
                 file_info.append({
-                    "name": file_path.strip(),
+                    "name": file_path,
                     "blob_sha": blob_sha,  # Not latest commit SHA, but blob SHA (if needed)
                     "size": file_size
                 })
     
-    # Parallelize latest commit SHA per file
-    def get_latest_sha(file_path):
-        command_sha = [GIT_EXECUTABLE, "-C", repo_path, "log", "-1", "--format=%H", "--", file_path]
-        latest_sha = run_git_command(repo_path, command_sha)
-        return latest_sha if not latest_sha.startswith("Error:") else None
-    
-    file_paths = [f["name"] for f in file_info]
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        shas = list(executor.map(get_latest_sha, file_paths))
-    
-    for info, sha in zip(file_info, shas):
-        info["latest_sha"] = sha
+    # Latest commit SHA per file, from the persistent per-repo index
+    latest = lastmod_index.get_last_commits(repo_path, [f["name"] for f in file_info], head=head)
+    for info in file_info:
+        info["latest_sha"] = latest.get(info["name"])
     
     return file_info, total_size
 
 def get_readme_text(repo_path):
-    """Read and serialize README.md text if it exists."""
+    """Read and serialize README.md text if it exists (working tree, else HEAD for bare repos)."""
     readme_path = os.path.join(repo_path, "README.md")
     if os.path.exists(readme_path):
         try:
@@ -2047,6 +2064,14 @@ def get_readme_text(repo_path):
         except Exception as e:
             logger.error("Error reading README.md in %s: %s", repo_path, str(e))
             return ""
+
+    if is_bare_repository(repo_path):
+        try:
+            content = git_cat_file.read_blob(repo_path, "HEAD", "README.md")
+            if content is not None:
+                return content.decode('utf-8', errors='replace')
+        except git_cat_file.CatFileError as e:
+            logger.error("Error reading HEAD:README.md in %s: %s", repo_path, str(e))
     #logger.debug("No README.md found in %s", repo_path)
     return ""
 
@@ -2098,17 +2123,12 @@ def full_sync(repo_path: str, repo_name: str = None) -> dict:
 
         # === 4. Remotes ===
         remotes_info = []
-        remotes_output = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "remote", "-v"])
         seen = set()
-        for line in remotes_output.splitlines():
-            if line.strip():
-                parts = line.split()
-                if len(parts) >= 3:
-                    name, url, typ = parts[0], parts[1], parts[2].strip('()')
-                    key = (name, typ, url)
-                    if key not in seen:
-                        remotes_info.append({"name": name, "type": typ, "url": url})
-                        seen.add(key)
+        for name, url, typ in git_backend.get_backend().remotes(repo_path):
+            key = (name, typ, url)
+            if key not in seen:
+                remotes_info.append({"name": name, "type": typ, "url": url})
+                seen.add(key)
         sync_result["remotes"] = remotes_info
 
         # === 5. Description ===
@@ -2128,11 +2148,14 @@ def full_sync(repo_path: str, repo_name: str = None) -> dict:
             "log", "--max-count=300", "--date=iso",
             "--pretty=format:%H|%P|%an|%ae|%ad|%s"
         ]
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
+        returncode, stdout, stderr = git_cache.get_or_compute(
+            repo_path, command,
+            lambda: _run_git_bytes(command),
+            cacheable=lambda r: r[0] == 0
+        )
 
         commits = []
-        if process.returncode == 0:
+        if returncode == 0:
             for line in stdout.decode('utf-8').splitlines():
                 if line.strip():
                     try:
@@ -2205,14 +2228,15 @@ def safe_rev_parse(repo_path, ref):
     # Detached pseudo-branch strings (e.g. "(HEAD detached from abc123)") are not valid refs.
     if not ref or (ref.startswith("(") and "detached" in ref.lower()):
         return None
-    result = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "rev-parse", "--verify", ref])
-    if result.startswith("Error:") or not result.strip():
+    backend = git_backend.get_backend()
+    result = backend.rev_parse(repo_path, ref)
+    if not result:
         # Fallback: try to resolve via HEAD if ref is current
-        current = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "symbolic-ref", "-q", "HEAD"])
-        if current and current.strip().endswith(ref):
-            return run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "rev-parse", "HEAD"])
+        current = backend.symbolic_ref(repo_path)
+        if current and current.endswith(ref):
+            return backend.rev_parse(repo_path, "HEAD")
         return None
-    return result.strip()
+    return result
 
 
 # Collect lightweight summaries DEPRECATED
@@ -2225,13 +2249,9 @@ def collect_repo_summaries(include_remote=True):
         print(f"[collect] Processing repo: {repo_name}", flush=True)
 
         # --- Branch heads ---
-        print("[collect] get_branches_data", flush=True)
-        branches_data, _ = get_branches_data(repo_path)
-
-        heads = {}
-        for branch in branches_data['local_branches']:
-            branch_name = branch['name']
-            heads[branch_name] = safe_rev_parse(repo_path, branch_name)
+        print("[collect] get_ref_snapshot", flush=True)
+        snapshot = git_utils.get_ref_snapshot(repo_path)
+        heads = dict(snapshot["local_heads"]) if snapshot else {}
 
         # --- Status ---
         print("[collect] get_git_status_data", flush=True)
@@ -2261,7 +2281,11 @@ def collect_repo_summaries(include_remote=True):
 
     return summaries
 
-def collect_and_send_repo_summary(repo_path, include_remote=True):
+def collect_and_send_repo_summary(repo_path, include_remote=True, remote_heads_details=None):
+    """
+    Collect the heartbeat summary for one repo. `remote_heads_details` may be
+    prefetched for many repos at once (git_utils.get_remote_heads_details_many).
+    """
     repo_name = os.path.basename(repo_path)
     summary = {
         "heads": {},
@@ -2274,17 +2298,13 @@ def collect_and_send_repo_summary(repo_path, include_remote=True):
     try:
         print(f"[Heartbeat] Processing repo: {repo_name}", flush=True)
 
-        # 1. Local branch heads
+        # 1. Local branch heads (single for-each-ref for all branches)
         try:
-            branches_data, err = get_branches_data(repo_path)
-            if err:
-                logger.warning(f"[{repo_name}] Failed to get branches: {err}")
+            snapshot = git_utils.get_ref_snapshot(repo_path)
+            if snapshot is None:
+                logger.warning(f"[{repo_name}] Failed to get branches: for-each-ref failed")
             else:
-                for branch in branches_data.get('local_branches', []):
-                    branch_name = branch['name']
-                    head_sha = safe_rev_parse(repo_path, branch_name)
-                    if head_sha:
-                        summary["heads"][branch_name] = head_sha
+                summary["heads"] = dict(snapshot["local_heads"])
         except Exception as e:
             logger.error(f"[{repo_name}] Error getting local heads: {e}")
 
@@ -2301,7 +2321,8 @@ def collect_and_send_repo_summary(repo_path, include_remote=True):
         # 3. Remote heads (non-blocking)
         if include_remote:
             try:
-                remote_heads_details = git_utils.get_remote_heads_details(repo_path, timeout=3)
+                if remote_heads_details is None:
+                    remote_heads_details = git_utils.get_remote_heads_details(repo_path, timeout=3)
                 summary["remote_heads"] = remote_heads_details.get("canonical_heads", {})
                 summary["remote_heads_meta"] = remote_heads_details
             except Exception as e:
@@ -2338,7 +2359,7 @@ def compute_commit_delta(repo_path, branch, last_head):
         command = [GIT_EXECUTABLE, "-C", repo_path, "log", f"{last_head}..HEAD", "--date=iso", "--pretty=format:%H|%P|%an|%ae|%ad|%s", branch]
     
     # Run the command
-    result = subprocess.run(
+    result = git_executor.run(
         command,
         cwd=repo_path,
         stdout=subprocess.PIPE,
@@ -2395,6 +2416,10 @@ def find_repo_path_by_name(repo_name):
 import subprocess
 import os
 
+# Capability flag from the heartbeat probe answer ("accept_files_delta")
+_server_accepts_files_delta = False
+
+
 # Compute other deltas (e.g., files, branches if HEAD changed)
 def compute_other_deltas(repo_path, branch, last_head, current_head):
     if last_head == current_head:
@@ -2404,28 +2429,30 @@ def compute_other_deltas(repo_path, branch, last_head, current_head):
     branches_data, _ = get_branches_data(repo_path)
     deltas['branches'] = branches_data
     # Remotes (full)
-    remotes_output = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "remote", "-v"])
     # Parse remotes as in /api/remotes
     remotes_info = []
     seen = set()  # To avoid duplicates for fetch/push
-    for line in remotes_output.splitlines():
-        if line.strip():
-            parts = line.split()
-            if len(parts) >= 3:
-                remote_name, remote_url, remote_type = parts[0], parts[1], parts[2].strip('()')
-                key = (remote_name, remote_url, remote_type)
-                if key not in seen:
-                    remotes_info.append({
-                        "name": remote_name,
-                        "url": remote_url,
-                        "type": remote_type
-                    })
-                    seen.add(key)
+    for remote_name, remote_url, remote_type in git_backend.get_backend().remotes(repo_path):
+        key = (remote_name, remote_url, remote_type)
+        if key not in seen:
+            remotes_info.append({
+                "name": remote_name,
+                "url": remote_url,
+                "type": remote_type
+            })
+            seen.add(key)
     deltas['remotes'] = {"remotes": remotes_info}  # Match structure if needed, or just list
     # deltas['remotes'] = remotes_info # simpler structure MAYBE TBD !!!! TODO INVESTICGATE
-    # Files (full ls-tree if changed)
-    files, total_size = get_file_list(repo_path)
-    deltas['files'] = files
+    # Files: changes since the server's head if it understands "files_delta",
+    # full ls-tree list otherwise or when there is no usable base
+    file_delta = None
+    if _server_accepts_files_delta and last_head and current_head:
+        file_delta = git_utils.get_file_delta(repo_path, last_head, current_head)
+    if file_delta is not None:
+        deltas['files_delta'] = file_delta
+    else:
+        files, total_size = get_file_list(repo_path)
+        deltas['files'] = files
     # README (if exists and changed)
     deltas['readme'] = get_readme_text(repo_path)
     # Status/Diff (always refresh if changed)
@@ -2439,7 +2466,7 @@ def compute_other_deltas(repo_path, branch, last_head, current_head):
             # Fallback to full HEAD diff if no last_head
             git_command = [GIT_EXECUTABLE, "-C", repo_path, "diff", "HEAD"]
         
-        result = subprocess.run(
+        result = git_executor.run(
             git_command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
@@ -2454,9 +2481,9 @@ def compute_other_deltas(repo_path, branch, last_head, current_head):
         else:
             diff_output = result.stdout
             original_size = len(diff_output)
-            # Log warning if diff is very large (e.g., >5MB), but send full
+            # Sent in full; delta_chunks splits it across update chunks
             if original_size > 5 * 1024 * 1024:
-                logger.warning("Large diff detected for %s: %d bytes; consider truncation in future", repo_path, original_size)
+                logger.info("Large diff detected for %s: %d bytes", repo_path, original_size)
             deltas['diff'] = {
                 "diff": diff_output,
                 "diff_info": {
@@ -2482,23 +2509,11 @@ def refresh_token_and_retry(access_token, func, *args, **kwargs):
         logger.error("Failed to refresh token; skipping retry")
         return None
 
-# Simple retry wrapper (since no sessions; max 3 attempts with backoff)
+# Heartbeat POST through the shared session (max 3 attempts with backoff, compressed body)
 def post_with_retry(url, json_data, headers, timeout=10, max_retries=3):
-    for attempt in range(1, max_retries + 1):
-        try:
-            response = requests.post(url, json=json_data, headers=headers, timeout=timeout)
-            if response.status_code // 100 == 5 or response.status_code in [429]:  # Server errors or rate limit
-                if attempt < max_retries:
-                    time.sleep(attempt)  # Backoff
-                    continue
-            return response
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"Request failed (attempt {attempt}): {str(e)}")
-            if attempt < max_retries:
-                time.sleep(attempt)
-            else:
-                raise
-    raise Exception("Max retries exceeded")
+    return http_client.post(url, endpoint="heartbeat", json=json_data, headers=headers,
+                            timeout=timeout, retries=max_retries - 1,
+                            compress=True, payload_type=json_data.get("mode"))
 
 def compute_repo_deltas(repo_name, branch_deltas, summaries):
     """Compute deltas for a single repository."""
@@ -2522,24 +2537,48 @@ def compute_repo_deltas(repo_name, branch_deltas, summaries):
 
     return repo_deltas
 
-def send_update(deltas, mode, access_token, headers, base_payload):
-    """Send delta update to Stargit with retry + logging."""
-    payload = {**base_payload, "mode": "update", "deltas": deltas}
-    response = post_with_retry(HEARTBEAT_ENDPOINT, payload, headers, timeout=30)
+def prepare_delta_upload(repo_name, branch_deltas, summaries, fingerprint=None):
+    """
+    Return a delta_chunks upload for the repo: the undelivered remainder
+    of a previous one computed for the same heads and the same repository
+    state (heartbeat_fingerprint), or a freshly computed and chunked
+    delta. None if there is nothing to send.
+    """
+    heads = summaries.get(repo_name, {}).get('heads', {})
+    upload_basis = delta_chunks.basis(branch_deltas, heads, fingerprint)
+    upload = delta_chunks.pending(repo_name, upload_basis)
+    if upload:
+        logger.info(f"[{repo_name}] Resuming delta upload at chunk {upload['next_seq'] + 1}/{upload['total']}")
+        return upload
+
+    deltas = compute_repo_deltas(repo_name, branch_deltas, summaries)
+    if not deltas:
+        return None
+    return delta_chunks.plan(repo_name, {repo_name: deltas}, upload_basis)
 
-    if response.status_code == 401:
-        response = refresh_token_and_retry(access_token, post_with_retry, HEARTBEAT_ENDPOINT, payload, headers, timeout=30)
+def send_delta_upload(upload, base_payload, headers, access_token):
+    """Send the remaining chunks of an upload. Returns (ok, last_response)."""
+    def post_chunk(fields):
+        return _heartbeat_post({**base_payload, **fields}, headers, access_token, 30)
+    return delta_chunks.send(upload, post_chunk)
 
-    if response.status_code == 200:
-        logger.info("%s delta update successful", mode.capitalize())
+def send_update(deltas, mode, access_token, headers, base_payload):
+    """Send delta update to Stargit with retry + logging (chunked when large)."""
+    upload = delta_chunks.plan(mode, deltas)
+    ok, response = send_delta_upload(upload, base_payload, headers, access_token)
+
+    if ok:
+        logger.info("%s delta update successful (%d chunks)", mode.capitalize(), upload["total"])
     else:
-        logger.error("%s delta update failed: %s (status: %d)", 
-                     mode.capitalize(), response.text, response.status_code)
+        logger.error("%s delta update failed at chunk %d/%d: %s",
+                     mode.capitalize(), upload["next_seq"] + 1, upload["total"],
+                     response.text if response is not None else "no response")
 
     return response
 
 # Send heartbeat to stargit.com
 def send_heartbeat_to_stargit(batch_mode=False):
+    global _server_accepts_files_delta
     logger.debug(">>>>>>>>>> Sending heartbeat to stargit.com")
     refresh_runtime_settings()
     if not STARGIT_API_KEY:
@@ -2556,24 +2595,28 @@ def send_heartbeat_to_stargit(batch_mode=False):
         "Content-Type": "application/json"
     }
 
-    try:
-        ip_address = requests.get('https://api.ipify.org', timeout=5).text
-    except:
-        ip_address = None
-
+    # Cached by the local_ip refresher; never blocks on a lookup
     base_payload = {
         "server_uuid": SERVER_UUID,
         "event_type": "heartbeat",
         "status": "online",
         "timestamp": time.time(),
-        "ip_address": ip_address,
-        "ip_locals": local_ip.get_local_ip_addresses()
+        "ip_address": local_ip.get_public_ip(),
+        "ip_locals": local_ip.get_cached_local_ip_addresses()
     }
 
     metrics = collect_server_metrics()
 
     # === Step 2: Send Metrics ===
-    payload = {**base_payload, "mode": "probe", "metrics": metrics}
+    payload = {
+        **base_payload,
+        "mode": "probe",
+        "metrics": metrics,
+        "content_encodings": http_client.supported_encodings(),
+        "delta_chunks": True,
+        "unchanged_manifest": True,
+        "files_delta": True
+    }
     response = post_with_retry(HEARTBEAT_ENDPOINT, payload, headers, timeout=15)
     logger.info(">>>>>>>>>> Sending hearbeat metrics")
 
@@ -2584,74 +2627,253 @@ def send_heartbeat_to_stargit(batch_mode=False):
         logger.error(f"Heartbeat probe failed: {response.text}")
         return
 
+    # Capability flags: request body encodings, chunked deltas, file-list deltas and
+    # the unchanged-repos manifest the server accepts (absent = none)
+    try:
+        capabilities = response.json()
+        http_client.set_server_encodings(HEARTBEAT_ENDPOINT, capabilities.get("accept_encoding"))
+        http_client.set_server_encodings(POLL_ENDPOINT, capabilities.get("accept_encoding"))
+        delta_chunks.set_server_support(capabilities.get("accept_delta_chunks"))
+        heartbeat_manifest.set_server_support(capabilities.get("accept_unchanged_manifest"))
+        _server_accepts_files_delta = bool(capabilities.get("accept_files_delta"))
+    except (ValueError, AttributeError):
+        delta_chunks.set_server_support(False)
+        heartbeat_manifest.set_server_support(False)
+        _server_accepts_files_delta = False
+
+    run_heartbeat_pipeline(base_payload, headers, access_token)
+
+
+def _heartbeat_post(payload, headers, access_token, timeout):
+    response = post_with_retry(HEARTBEAT_ENDPOINT, payload, headers, timeout=timeout)
+    if response.status_code == 401:
+        response = refresh_token_and_retry(access_token, post_with_retry,
+                                          HEARTBEAT_ENDPOINT, payload, headers)
+    return response
+
+
+def _timed(func, *args, **kwargs):
+    """Run func and return (result, seconds)."""
+    start = time.monotonic()
+    return func(*args, **kwargs), time.monotonic() - start
+
+
+# Collectors: one bounded pool shared by every cycle, and the repos it is still working on
+_heartbeat_pool = None
+_heartbeat_busy = set()
+_heartbeat_lock = threading.Lock()
+
+
+def _get_heartbeat_pool():
+    """The long-lived collector pool; sized by heartbeat.collect_workers at first use."""
+    global _heartbeat_pool
+    with _heartbeat_lock:
+        if _heartbeat_pool is None:
+            workers = max(1, settings.get_nested("heartbeat", "collect_workers", 4))
+            _heartbeat_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="StarBridge-Heartbeat"
+            )
+        return _heartbeat_pool
+
+
+def heartbeat_fingerprint(repo_path):
+    """
+    Cheap "did anything change" key for a repo: refs/HEAD/index/config stat
+    (git_cache), the watchdog's worktree dirty counter and the remote heads
+    cache version. None when it cannot be trusted (repo not watched).
+    """
+    if not status_cache.is_watched(repo_path):
+        return None
+    refs = git_cache.fingerprint(repo_path)
+    if refs is None:
+        return None
+    return (refs, status_cache.generation(repo_path), git_utils.remote_heads_version(repo_path))
+
+
+def run_heartbeat_pipeline(base_payload, headers, access_token):
+    """
+    Per-repository heartbeat as a two-stage pipeline:
+    - collectors (bounded pool): summary collection, and delta computation
+      when the probe response asks for it
+    - sender (this thread): probe POST as soon as a summary is ready,
+      update POST as soon as its deltas are ready
+    Every git command a collector runs is capped by
+    heartbeat.repo_deadline_seconds (git_executor.deadline()); a repo still
+    running past it is reported as failed and its late result dropped, so
+    it cannot stall the rest of the cycle. The pool outlives the cycle, and
+    a repo whose previous work has not finished yet is skipped rather than
+    queued a second time.
+
+    If the server advertised "accept_unchanged_manifest", repos whose
+    heartbeat_fingerprint() did not move since their last successful send
+    are reported together in one "unchanged" manifest instead (see
+    heartbeat_manifest.py).
+    """
+    cycle_start = time.monotonic()
+    repo_deadline = settings.get_nested("heartbeat", "repo_deadline_seconds", 120)
+
     successful_repos = []
     failed_repos = []
+    timings = {"remote_probe": 0.0, "collect": 0.0, "probe_send": 0.0, "delta": 0.0, "update_send": 0.0}
+    slowest = (None, 0.0)
 
+    repo_paths = []
     for repo_path in REPOSITORIES:
-        repo_name = os.path.basename(repo_path)
-        logger.info(f">>>>>>>>>> Heartbeat -> Processing repository: {repo_name}")
-        try:
-            if not os.path.isdir(repo_path):
-                logger.warning("[%s] Repository path is invalid or missing: %s", repo_name, repo_path)
-                failed_repos.append(repo_name)
-                continue
+        if os.path.isdir(repo_path):
+            repo_paths.append(repo_path)
+        else:
+            logger.warning("[%s] Repository path is invalid or missing: %s", os.path.basename(repo_path), repo_path)
+            failed_repos.append(os.path.basename(repo_path))
 
-            # === 1. Collect summary for THIS repo only ===
-            repo_name_out, summary = collect_and_send_repo_summary(repo_path)
-            if repo_name_out != repo_name:
-                logger.warning(f"Repo name mismatch: expected {repo_name}, got {repo_name_out}")
-                failed_repos.append(repo_name)
-                continue
+    # Probe every remote of every repo concurrently, under one cycle deadline
+    remote_details_by_repo, timings["remote_probe"] = _timed(
+        git_utils.get_remote_heads_details_many, repo_paths, timeout=3
+    )
 
-            # === 2. Send PROBE for THIS repo only ===
-            probe_payload = {
-                **base_payload,
-                "mode": "probe",
-                "repo_summaries": {repo_name: summary}  # send single repo update
-            }
+    # === Change detection: idle repos go into one compact manifest ===
+    force_full = heartbeat_manifest.start_cycle()
+    fingerprints = {repo_path: heartbeat_fingerprint(repo_path) for repo_path in repo_paths}
+    unchanged = heartbeat_manifest.unchanged(repo_paths, fingerprints, force_full)
+    if unchanged:
+        def post_manifest(fields):
+            response, seconds = _timed(_heartbeat_post, {**base_payload, **fields}, headers, access_token, 15)
+            timings["probe_send"] += seconds
+            return response
 
-            response = post_with_retry(HEARTBEAT_ENDPOINT, probe_payload, headers, timeout=15)
-            if response.status_code == 401:
-                response = refresh_token_and_retry(access_token, post_with_retry,
-                                                  HEARTBEAT_ENDPOINT, probe_payload, headers)
+        resend = heartbeat_manifest.exchange(unchanged, post_manifest)
+        successful_repos.extend(os.path.basename(p) for p in unchanged if p not in resend)
+        repo_paths = [p for p in repo_paths if p not in unchanged or p in resend]
 
-            if response.status_code != 200:
-                logger.error(f"[{repo_name}] Probe failed: {response.text}")
+    started = {}   # (stage, repo_path) -> monotonic start of the work (not of the queueing)
+
+    def tracked(key, func, *args, **kwargs):
+        started[key] = time.monotonic()
+        try:
+            with git_executor.deadline(repo_deadline):
+                return _timed(func, *args, **kwargs)
+        finally:
+            with _heartbeat_lock:
+                _heartbeat_busy.discard(key[1])
+
+    def submit(stage, repo_path, func, *args, **kwargs):
+        with _heartbeat_lock:
+            if repo_path in _heartbeat_busy:
+                return None
+            _heartbeat_busy.add(repo_path)
+        return pool.submit(tracked, (stage, repo_path), func, *args, **kwargs)
+
+    pool = _get_heartbeat_pool()
+    pending = {}   # future -> (stage, repo_path, summary)
+    try:
+        for repo_path in repo_paths:
+            future = submit(
+                "collect", repo_path, collect_and_send_repo_summary,
+                repo_path, remote_heads_details=remote_details_by_repo.get(repo_path)
+            )
+            if future is None:
+                repo_name = os.path.basename(repo_path)
+                logger.warning(f"[{repo_name}] Previous heartbeat collection still running; skipping this cycle")
                 failed_repos.append(repo_name)
                 continue
+            pending[future] = ("collect", repo_path, None)
 
-            data = response.json()
-            needed_deltas = data.get("needed_deltas", {})
+        while pending:
+            done, _ = concurrent.futures.wait(pending, timeout=1.0, return_when=concurrent.futures.FIRST_COMPLETED)
+            now = time.monotonic()
 
-            # === 3. If server wants delta -> compute and send immediately ===
-            if needed_deltas and repo_name in needed_deltas:
-                branch_deltas = needed_deltas[repo_name]
+            for future in done:
+                stage, repo_path, summary = pending.pop(future)
+                repo_name = os.path.basename(repo_path)
                 try:
-                    delta = compute_repo_deltas(repo_name, branch_deltas, {repo_name: summary})
-                    if delta:
-                        delta_payload = {
+                    result, seconds = future.result()
+                    timings[stage] += seconds
+
+                    if stage == "collect":
+                        if seconds > slowest[1]:
+                            slowest = (repo_name, seconds)
+                        repo_name_out, summary = result
+                        if repo_name_out != repo_name:
+                            logger.warning(f"Repo name mismatch: expected {repo_name}, got {repo_name_out}")
+                            failed_repos.append(repo_name)
+                            continue
+
+                        # === Send PROBE for THIS repo only ===
+                        probe_payload = {
                             **base_payload,
-                            "mode": "update",
-                            "deltas": {repo_name: delta}
+                            "mode": "probe",
+                            "repo_summaries": {repo_name: summary}  # send single repo update
                         }
-                        resp = post_with_retry(HEARTBEAT_ENDPOINT, delta_payload, headers, timeout=30)
-                        if resp.status_code == 200:
-                            logger.info(f"[{repo_name}] Full sync completed")
+                        response, seconds = _timed(_heartbeat_post, probe_payload, headers, access_token, 15)
+                        timings["probe_send"] += seconds
+                        if response is None or response.status_code != 200:
+                            logger.error(f"[{repo_name}] Probe failed: {response.text if response is not None else 'no response'}")
+                            failed_repos.append(repo_name)
+                            continue
+
+                        needed_deltas = response.json().get("needed_deltas", {})
+                        if needed_deltas and repo_name in needed_deltas:
+                            # === Server wants deltas -> compute (or resume) on the pool, send when ready ===
+                            delta_future = submit(
+                                "delta", repo_path, prepare_delta_upload,
+                                repo_name, needed_deltas[repo_name], {repo_name: summary},
+                                fingerprints.get(repo_path)
+                            )
+                            if delta_future is None:
+                                logger.warning(f"[{repo_name}] Previous delta computation still running; skipping this cycle")
+                                failed_repos.append(repo_name)
+                                continue
+                            pending[delta_future] = ("delta", repo_path, summary)
+                            continue
+
+                    elif stage == "delta" and result:
+                        (ok, resp), seconds = _timed(send_delta_upload, result, base_payload, headers, access_token)
+                        timings["update_send"] += seconds
+                        if ok:
+                            logger.info(f"[{repo_name}] Full sync completed ({result['total']} chunks)")
                         else:
-                            logger.error(f"[{repo_name}] Delta send failed: {resp.text}")
-                except Exception as e:
-                    logger.error(f"[{repo_name}] Delta computation failed: {e}", exc_info=True)
+                            logger.error(
+                                f"[{repo_name}] Delta send failed at chunk {result['next_seq'] + 1}/{result['total']}: "
+                                f"{resp.text if resp is not None else 'no response'}"
+                            )
+                            # Not in sync with the server: collect in full next cycle
+                            heartbeat_manifest.forget(repo_path)
+                            successful_repos.append(repo_name)
+                            continue
+
+                    heartbeat_manifest.record_sent(repo_path, fingerprints.get(repo_path))
+                    successful_repos.append(repo_name)
+                    logger.info(f"[{repo_name}] Heartbeat cycle completed successfully")
 
-            successful_repos.append(repo_name)
-            logger.info(f"[{repo_name}] Heartbeat cycle completed successfully")
-
-        except Exception as e:
-            logger.error(f"[{repo_name}] Unexpected error in heartbeat cycle: {e}", exc_info=True)
-            failed_repos.append(repo_name)
+                except Exception as e:
+                    logger.error(f"[{repo_name}] Unexpected error in heartbeat {stage}: {e}", exc_info=True)
+                    failed_repos.append(repo_name)
+
+            # Per-repo deadline: abandon work that has been running too long
+            for future, (stage, repo_path, _) in list(pending.items()):
+                start = started.get((stage, repo_path))
+                if start is not None and now - start > repo_deadline:
+                    pending.pop(future)
+                    repo_name = os.path.basename(repo_path)
+                    logger.warning(f"[{repo_name}] Heartbeat {stage} exceeded {repo_deadline}s deadline; skipping this cycle")
+                    failed_repos.append(repo_name)
+    finally:
+        # Work not started yet is dropped; running work stops at its next git call
+        # (deadline) and keeps the repo marked busy until then
+        for future, (_, repo_path, _) in pending.items():
+            if future.cancel():
+                with _heartbeat_lock:
+                    _heartbeat_busy.discard(repo_path)
 
     # === Final Summary ===
     total = len(REPOSITORIES)
-    logger.info(f"Heartbeat completed: {len(successful_repos)}/{total} repos synced")
+    logger.info(
+        "Heartbeat completed: %d/%d repos synced (%d unchanged%s) in %.1fs "
+        "(remote probe %.1fs, collect %.1fs [slowest %s %.1fs], probe send %.1fs, deltas %.1fs, update send %.1fs, %d repos still busy)",
+        len(successful_repos), total, len(unchanged), ", forced full cycle" if force_full else "",
+        time.monotonic() - cycle_start,
+        timings["remote_probe"], timings["collect"], slowest[0] or "-", slowest[1],
+        timings["probe_send"], timings["delta"], timings["update_send"], len(_heartbeat_busy)
+    )
     if failed_repos:
         logger.warning(f"Failed repos: {', '.join(failed_repos)}")
 
@@ -2679,8 +2901,8 @@ def register_with_stargit(event_type='online'):
             "status": "online",
             "metrics": metrics,
             "timestamp": time.time(),
-            "ip_address": requests.get('https://api.ipify.org').text if event_type == 'online' else None,
-            "ip_locals": local_ip.get_local_ip_addresses()
+            "ip_address": local_ip.get_public_ip(wait_seconds=5) if event_type == 'online' else None,
+            "ip_locals": local_ip.get_cached_local_ip_addresses()
         }
         # Include detailed repo info only in heartbeats if PUSH_MODE is enabled
         if event_type == 'heartbeat' and PUSH_MODE:
@@ -2699,7 +2921,8 @@ def register_with_stargit(event_type='online'):
         logger.info("*** Calling %s ", endpoint)
         logger.info("*** *** payload %s ", payload)
         logger.info("*** *** **** headers %s ", headers)
-        response = requests.post(endpoint, json=payload, headers=headers)
+        endpoint_name = "register" if event_type == 'online' else "heartbeat"
+        response = http_client.post(endpoint, endpoint=endpoint_name, json=payload, headers=headers)
         if response.status_code == 200:
             logger.info("Successfully sent %s to %s: %s", event_type, endpoint, response.json())
         elif response.status_code == 401:
@@ -2709,7 +2932,7 @@ def register_with_stargit(event_type='online'):
             access_token = get_access_token()
             if access_token:
                 headers["Authorization"] = f"Bearer {access_token}"
-                response = requests.post(endpoint, json=payload, headers=headers)
+                response = http_client.post(endpoint, endpoint=endpoint_name, json=payload, headers=headers)
                 if response.status_code == 200:
                     logger.info("Successfully sent %s after token refresh: %s", event_type, response.json())
                 else:
@@ -2734,15 +2957,23 @@ def registration_thread():
     else:
         print("<<<<<<<<<<<< Invalid stargit api key", STARGIT_API_KEY, flush=True)
 
-# Binary-safe file fetch (git show returns bytes)
+# Binary-safe file fetch (cat-file worker returns bytes, git show as fallback)
 def get_file_content(repo_path, file_path, ref='HEAD'):
     command = [GIT_EXECUTABLE, "-C", repo_path, "show", f"{ref}:{file_path}"]
     try:
-        result = subprocess.run(command, cwd=repo_path, capture_output=True, text=False, timeout=30)
-        if result.returncode != 0:
-            return None, result.stderr.decode('utf-8', errors='ignore')
-        
-        content = result.stdout  # bytes
+        content = None
+        try:
+            content = git_cat_file.read_blob(repo_path, ref, file_path)
+        except git_cat_file.CatFileError as e:
+            logger.warning("cat-file read failed for %s:%s, falling back to git show: %s", ref, file_path, e)
+
+        # Missing paths, trees and worker failures go through git show for its output/error text
+        if content is None:
+            result = git_executor.run(command, cwd=repo_path, capture_output=True, text=False, timeout=30)
+            if result.returncode != 0:
+                return None, result.stderr.decode('utf-8', errors='ignore')
+            content = result.stdout  # bytes
+
         mime, _ = mimetypes.guess_type(file_path)
         
         # Attempt decode to check if text
@@ -2881,8 +3112,8 @@ def get_new_commits_and_diff(repo_path, old_head_sha=None):
     """
     try:
         # Get current HEAD
-        current_head = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "rev-parse", "HEAD"]).strip()
-        if not current_head or current_head.startswith("Error:"):
+        current_head = git_backend.get_backend().rev_parse(repo_path, "HEAD")
+        if not current_head:
             return None, [], git_utils.get_diff(repo_path)
 
         new_commits = []
@@ -2931,27 +3162,15 @@ def get_head(repo_path):
         ("DETACHED", commit_hash)   → detached HEAD state
     """
     try:
-        result = subprocess.run(
-            [GIT_EXECUTABLE, "-C", repo_path, "rev-parse", "HEAD"],
-            capture_output=True, text=True
-        )
+        backend = git_backend.get_backend()
+        head_hash = backend.rev_parse(repo_path, "HEAD")
 
-        if result.returncode != 0:
-            msg = (result.stderr + result.stdout).lower()
-            # Cases like: empty repo / no commits
-            if "unknown revision" in msg or "needed a single revision" in msg or "fatal:" in msg:
-                return None
+        # Cases like: empty repo / no commits
+        if not head_hash:
             return None
 
-        head_hash = result.stdout.strip()
-
         # Detect detached HEAD
-        symbolic = subprocess.run(
-            [GIT_EXECUTABLE, "-C", repo_path, "symbolic-ref", "-q", "HEAD"],
-            capture_output=True, text=True
-        )
-
-        if symbolic.returncode != 0:  # Not pointing to refs/heads/* → detached
+        if backend.symbolic_ref(repo_path) is None:  # Not pointing to refs/heads/* → detached
             return ("DETACHED", head_hash)
 
         return head_hash
@@ -2959,1126 +3178,1181 @@ def get_head(repo_path):
     except Exception as e:
         logger.warning(f"[StarBridge] Failed to read HEAD: {e}")
         return None
-    
-# Process tasks from poll response - handles 'get_file' and 'get_file_history' actions
-def process_tasks(tasks):
-    logger.debug(f"Processing {len(tasks)} tasks")
-    results = []
-
-    # Actions that modify the working tree / index and should return fresh status
-    STATUS_CHANGING_ACTIONS = {
-        "resolve_conflict",
-        "continue_merge",
-        "stage_file",
-        "unstage_file",
-        "discard_file",
-        "commit",
-        "reset",            # future
-        "checkout_file",    # future
-        "push",
-        "pull",
-        "create_file",
-        "abort_merge"
-    }
 
-    HEADS_CHANGING_ACTIONS = {
-        "continue_merge",
-        "commit",
-        "reset",            # future
-        "checkout_file",    # future
-        "push",
-        "pull"
-    }
+#
+# Task handlers: one per polled action, registered with their scheduling
+# and refresh properties (see task_registry.py). A handler fills
+# task_result; returning a list ends the task early with those results.
+#
 
-    FULL_SYNC_ACTIONS = {
-        "import_repo",
-        "create_repo"
-    }
+@task_registry.task_handler("get_file", kind="read", timeout=120)
+def _task_get_file(task, params, repo_name, repo_path, task_result, results):
+    file_path = params.get('file_path')
+    commit_sha = params.get('commit_sha', 'HEAD')
+    logger.debug(f"get_file params: repo={repo_name}, path={file_path}, sha={commit_sha}")
+    content_data, error = get_file_content(repo_path, file_path, commit_sha)
+    if error:
+        logger.error(f"get_file error: {error}")
+        #results.append({"task_id": task['id'], "result": None, "error": error})
+        task_result.update({"result": None, "error": error})
+    else:
+        logger.debug(f"get_file success: {content_data}")
+        #results.append({"task_id": task['id'], "result": content_data, "error": None})
+        task_result.update({"result": content_data, "error": None})
 
-    for task in tasks:
-        logger.debug(f"Task details: {task}")
-        action = task.get('action')
-        params = task.get('params', {})
-        repo_name = params.get('repo_name')
 
-        if action == "create_repo" or action == "import_repo" or action == "update_starbridge":
-            repo_path = None
-        else:
-            repo_path = find_repo_path_by_name(repo_name)
+@task_registry.task_handler("create_file", changes_status=True)
+def _task_create_file(task, params, repo_name, repo_path, task_result, results):
+    file_path = params.get("file_path")      # e.g. ".stargit/ci.yml"
+    content = params.get("content", "")
+    overwrite = params.get("overwrite", False)
+    git_add = params.get("git_add", False)
+    logger.debug(f"create_file params: repo={repo_name}, path={file_path}, overwrite={overwrite}")
 
-            if not repo_path:
-                logger.warning(f"Repo {repo_name} not found")
-                results.append({"task_id": task['id'], "result": None, "error": f"Repo {repo_name} not found"})
-                continue
-        
-        task_result = {"task_id": task['id'], 'repo_name': repo_name}
-        needs_status_refresh = action in STATUS_CHANGING_ACTIONS
-        needs_heads_refresh = action in HEADS_CHANGING_ACTIONS
-        needs_full_sync = action in FULL_SYNC_ACTIONS
-        
-        # Capture old/previous remote heads
-        if action in HEADS_CHANGING_ACTIONS:
-            task["previous_remote_heads"] = git_utils.get_remote_heads(repo_path) or {}
-
-        if action == 'get_file':
-            file_path = params.get('file_path')
-            commit_sha = params.get('commit_sha', 'HEAD')
-            logger.debug(f"get_file params: repo={repo_name}, path={file_path}, sha={commit_sha}")
-            content_data, error = get_file_content(repo_path, file_path, commit_sha)
-            if error:
-                logger.error(f"get_file error: {error}")
-                #results.append({"task_id": task['id'], "result": None, "error": error})
-                task_result.update({"result": None, "error": error})
-            else:
-                logger.debug(f"get_file success: {content_data}")
-                #results.append({"task_id": task['id'], "result": content_data, "error": None})
-                task_result.update({"result": content_data, "error": None})
-        
-        elif action == "create_file":
-            
-            file_path = params.get("file_path")      # e.g. ".stargit/ci.yml"
-            content = params.get("content", "")
-            overwrite = params.get("overwrite", False)
-            git_add = params.get("git_add", False)
-            logger.debug(f"create_file params: repo={repo_name}, path={file_path}, overwrite={overwrite}")
-            
-            full_path = os.path.join(repo_path, file_path)
+    full_path = os.path.join(repo_path, file_path)
 
-            # Security: prevent path traversal
-            full_path = os.path.abspath(full_path)
-            repo_path_abs = os.path.abspath(repo_path)
+    # Security: prevent path traversal
+    full_path = os.path.abspath(full_path)
+    repo_path_abs = os.path.abspath(repo_path)
 
-            if not full_path.startswith(repo_path_abs + os.sep):
-                task_result.update({"error": "Invalid file path (outside repo)"})
-                continue
+    if not full_path.startswith(repo_path_abs + os.sep):
+        task_result.update({"error": "Invalid file path (outside repo)"})
+        return results
 
-            try:
-                # Create parent directories
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
-                # Write file
-                mode = 'w' if overwrite else 'x'
-                with open(full_path, mode, encoding="utf-8") as f:
-                    f.write(content)
-
-                if git_add:
-                    add_result = subprocess.run(
-                        [GIT_EXECUTABLE, "-C", repo_path, "add", file_path],
-                        capture_output=True,
-                        text=True
-                    )
-
-                    if add_result.returncode == 0:
-                        logger.info(f"Auto-added {file_path} to index")
-                    else:
-                        logger.warning(f"git add failed for {file_path}: {add_result.stderr}")
-
-                task_result.update({
-                    "result": {
-                        "status": "file_created",
-                        "file_path": file_path,
-                        "git_added": git_add and add_result.returncode == 0,
-                        "size_bytes": len(content)
-                    }
-                })
-                
-                logger.info(f"Created file {file_path} in {repo_name}")
+    try:
+        # Create parent directories
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        # Write file
+        mode = 'w' if overwrite else 'x'
+        with open(full_path, mode, encoding="utf-8") as f:
+            f.write(content)
+
+        if git_add:
+            add_result = git_executor.run(
+                [GIT_EXECUTABLE, "-C", repo_path, "add", file_path],
+                capture_output=True,
+                text=True
+            )
 
-            except FileExistsError:
-                task_result.update({"error": f"File {file_path} already exists (use overwrite=true)"})
-            except Exception as e:
-                task_result.update({"error": str(e)})
-                logger.error(f"Failed to create file {file_path}: {e}")
-
-        elif action == 'get_file_history':
-            file_path = params.get('file_path')
-            commit_sha = params.get('commit_sha', 'HEAD')
-            logger.debug(f"get_file_history params: repo={repo_name}, path={file_path}, sha={commit_sha}")
-            history = get_file_history(repo_path, file_path, commit_sha)
-            if history is None:
-                #results.append({"task_id": task['id'], "result": None, "error": "Failed to fetch history"})
-                task_result.update({"result": None, "error": "Failed to fetch history"})
-            else:
-                #results.append({"task_id": task['id'], "result": {"history": history}, "error": None})
-                task_result.update({"result": {"history": history}, "error": None})
-        
-        elif action == 'get_commit_diff':
-            commit_sha = params.get('commit_sha')
-            logger.debug(f"get_commit_diff params: repo={repo_name}, sha={commit_sha}")
-            files = get_commit_diff(repo_path, commit_sha)
-            if files is None:
-                #results.append({"task_id": task['id'], "result": None, "error": "Failed to fetch commit diff"})
-                task_result.update({"result": None, "error": "Failed to fetch commit diff"})
+            if add_result.returncode == 0:
+                logger.info(f"Auto-added {file_path} to index")
             else:
-                #results.append({"task_id": task['id'], "result": {"files": files}, "error": None})
-                task_result.update({"result": {"files": files}, "error": None})
-
-        elif action == 'resolve_conflict':
-            params = task.get('params', {})
-            repo_name = params.get('repo_name')
-            file_path = params.get('file_path')
-            resolution = params.get('resolution')  # ours, theirs, local, content
-
-            repo_path = find_repo_path(repo_name)
-            if not repo_path:
-                results.append({"task_id": task['id'], "error": "Repo not found"})
-                continue
+                logger.warning(f"git add failed for {file_path}: {add_result.stderr}")
+
+        task_result.update({
+            "result": {
+                "status": "file_created",
+                "file_path": file_path,
+                "git_added": git_add and add_result.returncode == 0,
+                "size_bytes": len(content)
+            }
+        })
 
-            try:
-                full_path = os.path.join(repo_path, file_path)
+        logger.info(f"Created file {file_path} in {repo_name}")
 
-                if resolution == "ours":
-                    subprocess.run([GIT_EXECUTABLE, "-C", repo_path, "checkout", "--ours", file_path], check=True, capture_output=True)
-                    logger.info(f"Resolved {file_path}: Kept OURS")
+    except FileExistsError:
+        task_result.update({"error": f"File {file_path} already exists (use overwrite=true)"})
+    except Exception as e:
+        task_result.update({"error": str(e)})
+        logger.error(f"Failed to create file {file_path}: {e}")
+
+
+@task_registry.task_handler("get_file_history", kind="read", timeout=120)
+def _task_get_file_history(task, params, repo_name, repo_path, task_result, results):
+    file_path = params.get('file_path')
+    commit_sha = params.get('commit_sha', 'HEAD')
+    logger.debug(f"get_file_history params: repo={repo_name}, path={file_path}, sha={commit_sha}")
+    history = get_file_history(repo_path, file_path, commit_sha)
+    if history is None:
+        #results.append({"task_id": task['id'], "result": None, "error": "Failed to fetch history"})
+        task_result.update({"result": None, "error": "Failed to fetch history"})
+    else:
+        #results.append({"task_id": task['id'], "result": {"history": history}, "error": None})
+        task_result.update({"result": {"history": history}, "error": None})
+
+
+@task_registry.task_handler("get_commit_diff", kind="read", timeout=120)
+def _task_get_commit_diff(task, params, repo_name, repo_path, task_result, results):
+    commit_sha = params.get('commit_sha')
+    logger.debug(f"get_commit_diff params: repo={repo_name}, sha={commit_sha}")
+    files = get_commit_diff(repo_path, commit_sha)
+    if files is None:
+        #results.append({"task_id": task['id'], "result": None, "error": "Failed to fetch commit diff"})
+        task_result.update({"result": None, "error": "Failed to fetch commit diff"})
+    else:
+        #results.append({"task_id": task['id'], "result": {"files": files}, "error": None})
+        task_result.update({"result": {"files": files}, "error": None})
 
-                elif resolution == "theirs":
-                    subprocess.run([GIT_EXECUTABLE, "-C", repo_path, "checkout", "--theirs", file_path], check=True, capture_output=True)
-                    logger.info(f"Resolved {file_path}: Kept THEIRS")
 
-                elif resolution == "local":
-                    # Just stage current working tree version (no checkout)
-                    logger.info(f"Resolved {file_path}: Kept CURRENT working tree version")
-                    pass  # Nothing to do — file is already as user wants
+@task_registry.task_handler("resolve_conflict", changes_status=True)
+def _task_resolve_conflict(task, params, repo_name, repo_path, task_result, results):
+    params = task.get('params', {})
+    repo_name = params.get('repo_name')
+    file_path = params.get('file_path')
+    resolution = params.get('resolution')  # ours, theirs, local, content
 
-                elif resolution == "content":
-                    content = params.get('content', '')
-                    with open(full_path, 'w', encoding='utf-8') as f:
-                        f.write(content)
-                    logger.info(f"Resolved {file_path}: Replaced with provided content")
+    repo_path = find_repo_path(repo_name)
+    if not repo_path:
+        results.append({"task_id": task['id'], "error": "Repo not found"})
+        return results
 
-                else:
-                    results.append({"task_id": task['id'], "error": f"Invalid resolution: {resolution}"})
-                    continue
+    try:
+        full_path = os.path.join(repo_path, file_path)
 
-                # Always stage the final version
-                result = subprocess.run([GIT_EXECUTABLE, "-C", repo_path, "add", file_path], capture_output=True, text=True)
-                if result.returncode != 0:
-                    results.append({"task_id": task['id'], "error": f"git add failed: {result.stderr}"})
-                    continue
+        if resolution == "ours":
+            git_executor.run([GIT_EXECUTABLE, "-C", repo_path, "checkout", "--ours", file_path], check=True, capture_output=True)
+            logger.info(f"Resolved {file_path}: Kept OURS")
 
-                task_result.update({
-                    "result": {
-                        "status": "resolved",
-                        "resolution": resolution,
-                        "file": file_path
-                    }
-                })
+        elif resolution == "theirs":
+            git_executor.run([GIT_EXECUTABLE, "-C", repo_path, "checkout", "--theirs", file_path], check=True, capture_output=True)
+            logger.info(f"Resolved {file_path}: Kept THEIRS")
 
-            except Exception as e:
-                logger.error(f"Conflict resolution failed for {file_path}: {str(e)}")
-                #results.append({"task_id": task['id'], "error": str(e)})
-                results.append({"task_id": task['id'], "error": str(e)})
-                continue
+        elif resolution == "local":
+            # Just stage current working tree version (no checkout)
+            logger.info(f"Resolved {file_path}: Kept CURRENT working tree version")
+            pass  # Nothing to do — file is already as user wants
 
-        elif action == 'continue_merge':
-            logger.debug(">>>>>>>>> continue_merge >>>>>>>>>")
+        elif resolution == "content":
+            content = params.get('content', '')
+            with open(full_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            logger.info(f"Resolved {file_path}: Replaced with provided content")
 
-            try:
-                params = task.get('params') or {}
-                repo_name = params.get('repo_name')
-                commit_message = params.get('commit_message')
-                name = params.get('name')
-                email = params.get('email')
-
-                # Validate parameters
-                if not repo_name:
-                    results.append({"task_id": task["id"], "error": "Missing repo_name"})
-                    continue
-                if not commit_message:
-                    results.append({"task_id": task["id"], "error": "Missing commit_message"})
-                    continue
+        else:
+            results.append({"task_id": task['id'], "error": f"Invalid resolution: {resolution}"})
+            return results
 
-                repo_path = find_repo_path(repo_name)
-                if not repo_path:
-                    results.append({"task_id": task["id"], "error": f"Repository '{repo_name}' not found"})
-                    continue
+        # Always stage the final version
+        result = git_executor.run([GIT_EXECUTABLE, "-C", repo_path, "add", file_path], capture_output=True, text=True)
+        if result.returncode != 0:
+            results.append({"task_id": task['id'], "error": f"git add failed: {result.stderr}"})
+            return results
+
+        task_result.update({
+            "result": {
+                "status": "resolved",
+                "resolution": resolution,
+                "file": file_path
+            }
+        })
 
-                # Prepare environment with committer identity
-                env = os.environ.copy()
-                env["GIT_EDITOR"] = "true"                    # ← No editor
-                env["GIT_TERMINAL_PROMPT"] = "0"              # ← No prompts
-                env["GIT_MERGE_AUTOEDIT"] = "no"              # ← No auto-edit
-                if name and email:
-                    env["GIT_AUTHOR_NAME"] = name
-                    env["GIT_AUTHOR_EMAIL"] = email
-                    env["GIT_COMMITTER_NAME"] = name
-                    env["GIT_COMMITTER_EMAIL"] = email
-                    
-                # Detect merge or rebase in progress
-                git_dir = os.path.join(repo_path, ".git")
-
-                is_rebase = (
-                    os.path.exists(os.path.join(git_dir, "rebase-merge")) or
-                    os.path.exists(os.path.join(git_dir, "rebase-apply"))
-                )
-                is_merge = os.path.exists(os.path.join(git_dir, "MERGE_HEAD"))
-
-                logger.debug(f"Repo path: {repo_path}")
-                logger.debug(f"is_rebase={is_rebase}, is_merge={is_merge}")
-
-                if not is_merge and not is_rebase:
-                    results.append({
-                        "task_id": task["id"],
-                        "error": "No merge or rebase is currently in progress"
-                    })
-                    continue
+    except Exception as e:
+        logger.error(f"Conflict resolution failed for {file_path}: {str(e)}")
+        #results.append({"task_id": task['id'], "error": str(e)})
+        results.append({"task_id": task['id'], "error": str(e)})
+        return results
 
-                # First: try merge --continue if merge in progress
-                merge_completed = False
-                if is_merge:
-                    logger.debug("Attempting: git merge --continue")
-
-                    merge_cmd = [
-                        GIT_EXECUTABLE, "-C", repo_path,
-                        "merge", "--continue"
-                    ]
-
-                    merge_result = subprocess.run(
-                        merge_cmd, capture_output=True, text=True, env=env
-                    )
-
-                    logger.debug({
-                        "merge_stdout": merge_result.stdout,
-                        "merge_stderr": merge_result.stderr,
-                        "return_code": merge_result.returncode
-                    })
-
-                    if merge_result.returncode == 0:
-                        logger.info({"task_id": task["id"], "result": {"status": "merge_completed"}})
-                        task_result.update({"result": {"status": "merge_completed"}})
-                        merge_completed = True
-
-                    # If merge failed and no rebase is present → fatal
-                    elif not is_rebase:
-                        results.append({
-                            "task_id": task["id"],
-                            "error": merge_result.stderr or merge_result.stdout or "Unknown merge error"
-                        })
-                        continue 
-
-                if merge_completed == False:
-                    # If here → merge didn't apply OR we are in rebase → try rebase --continue
-                    logger.debug("Attempting: git rebase --continue")
-
-                    # For rebase, Git uses an internal commit message — but we can write ours into .git/rebase-merge/message
-                    rebase_msg_path = os.path.join(git_dir, "rebase-merge", "message")
-                    if is_rebase:
-                        try:
-                            os.makedirs(os.path.dirname(rebase_msg_path), exist_ok=True)
-                            with open(rebase_msg_path, "w", encoding="utf-8") as f:
-                                f.write(commit_message)
-                            logger.debug("Custom commit message written to rebase-merge/message")
-                        except Exception as msg_err:
-                            logger.error(f"Failed to write rebase commit message: {msg_err}")
-
-                    rebase_cmd = [
-                        GIT_EXECUTABLE, "-C", repo_path,
-                        "rebase", "--continue"
-                    ]
-
-                    rebase_result = subprocess.run(
-                        rebase_cmd, capture_output=True, text=True, env=env
-                    )
-
-                    logger.debug({
-                        "rebase_stdout": rebase_result.stdout,
-                        "rebase_stderr": rebase_result.stderr,
-                        "return_code": rebase_result.returncode
-                    })
-
-                    if rebase_result.returncode == 0:
-                        task_result.update({"result": {"status": "merge_completed"}})
-                    else:
-                        results.append({
-                            "task_id": task["id"],
-                            "error": rebase_result.stderr or rebase_result.stdout or "Unknown rebase error"
-                        })
-                        continue
 
-            except Exception as e:
-                logger.error(f"Merge Continue failed for {repo_name}: {str(e)}")
-                results.append({"task_id": task["id"], "error": str(e)})
-                continue
+@task_registry.task_handler("continue_merge", changes_status=True, changes_heads=True)
+def _task_continue_merge(task, params, repo_name, repo_path, task_result, results):
+    logger.debug(">>>>>>>>> continue_merge >>>>>>>>>")
 
-        elif action == "stage_file":
-            params = task.get('params', {})
-            repo_name = params.get('repo_name')
-            file_path = params.get('file_path')
+    try:
+        params = task.get('params') or {}
+        repo_name = params.get('repo_name')
+        commit_message = params.get('commit_message')
+        name = params.get('name')
+        email = params.get('email')
+
+        # Validate parameters
+        if not repo_name:
+            results.append({"task_id": task["id"], "error": "Missing repo_name"})
+            return results
+        if not commit_message:
+            results.append({"task_id": task["id"], "error": "Missing commit_message"})
+            return results
+
+        repo_path = find_repo_path(repo_name)
+        if not repo_path:
+            results.append({"task_id": task["id"], "error": f"Repository '{repo_name}' not found"})
+            return results
+
+        # Prepare environment with committer identity
+        env = os.environ.copy()
+        env["GIT_EDITOR"] = "true"                    # ← No editor
+        env["GIT_TERMINAL_PROMPT"] = "0"              # ← No prompts
+        env["GIT_MERGE_AUTOEDIT"] = "no"              # ← No auto-edit
+        if name and email:
+            env["GIT_AUTHOR_NAME"] = name
+            env["GIT_AUTHOR_EMAIL"] = email
+            env["GIT_COMMITTER_NAME"] = name
+            env["GIT_COMMITTER_EMAIL"] = email
+
+        # Detect merge or rebase in progress
+        git_dir = os.path.join(repo_path, ".git")
+
+        is_rebase = (
+            os.path.exists(os.path.join(git_dir, "rebase-merge")) or
+            os.path.exists(os.path.join(git_dir, "rebase-apply"))
+        )
+        is_merge = os.path.exists(os.path.join(git_dir, "MERGE_HEAD"))
 
-            repo_path = find_repo_path(repo_name)
-            if not repo_path:
-                results.append({"task_id": task['id'], "error": "Repo not found"})
-                continue
+        logger.debug(f"Repo path: {repo_path}")
+        logger.debug(f"is_rebase={is_rebase}, is_merge={is_merge}")
 
-            try:
-                subprocess.run([GIT_EXECUTABLE, "-C", repo_path, "add", file_path], check=True, capture_output=True)
-                task_result.update({
-                    "result": {
-                        "status": "staged", 
-                        "file": file_path
-                    }
-                })
-                logger.info(f"Staged: {file_path}")
-            except Exception as e:
-                results.append({"task_id": task['id'], "error": str(e)})
-                continue
+        if not is_merge and not is_rebase:
+            results.append({
+                "task_id": task["id"],
+                "error": "No merge or rebase is currently in progress"
+            })
+            return results
 
-        elif action == "unstage_file":
-            params = task.get('params', {})
-            repo_name = params.get('repo_name')
-            file_path = params.get('file_path')
+        # First: try merge --continue if merge in progress
+        merge_completed = False
+        if is_merge:
+            logger.debug("Attempting: git merge --continue")
 
-            repo_path = find_repo_path(repo_name)
-            if not repo_path:
-                results.append({"task_id": task['id'], "error": "Repo not found"})
-                continue
+            merge_cmd = [
+                GIT_EXECUTABLE, "-C", repo_path,
+                "merge", "--continue"
+            ]
 
-            try:
-                subprocess.run([GIT_EXECUTABLE, "-C", repo_path, "restore", "--staged", file_path], check=True, capture_output=True)
-                task_result.update({
-                    "result": {"status": "unstaged", "file": file_path}
-                })
-                logger.info(f"Unstaged: {file_path}")
-            except Exception as e:
-                results.append({"task_id": task['id'], "error": str(e)})
-                continue
+            merge_result = git_executor.run(
+                merge_cmd, capture_output=True, text=True, env=env
+            )
 
-        elif action == "discard_file":
-            params = task.get('params', {})
-            repo_name = params.get('repo_name')
-            file_path = params.get('file_path')
+            logger.debug({
+                "merge_stdout": merge_result.stdout,
+                "merge_stderr": merge_result.stderr,
+                "return_code": merge_result.returncode
+            })
 
-            repo_path = find_repo_path(repo_name)
-            if not repo_path:
-                results.append({"task_id": task['id'], "error": "Repo not found"})
-                continue
+            if merge_result.returncode == 0:
+                logger.info({"task_id": task["id"], "result": {"status": "merge_completed"}})
+                task_result.update({"result": {"status": "merge_completed"}})
+                merge_completed = True
 
-            try:
-                subprocess.run([GIT_EXECUTABLE, "-C", repo_path, "restore", file_path], check=True, capture_output=True)
-                task_result.update({
-                    "result": {"status": "discarded", "file": file_path}
+            # If merge failed and no rebase is present → fatal
+            elif not is_rebase:
+                results.append({
+                    "task_id": task["id"],
+                    "error": merge_result.stderr or merge_result.stdout or "Unknown merge error"
                 })
-                logger.info(f"Discarded changes: {file_path}")
-            except Exception as e:
-                results.append({"task_id": task['id'], "error": str(e)})
-                continue
-        
-        elif action == "push":
-            
-            remote = params.get('remote', 'origin')
-            branch = params.get('branch', 'HEAD')
-            force = params.get('force', False)
+                return results
 
-            try:
-                cmd = [GIT_EXECUTABLE, "-C", repo_path, "push"]
-                if force:
-                    cmd.append("--force-with-lease")
-                cmd.extend([remote, branch])
-
-                result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-                
-                if result.returncode == 0:
-                    task_result.update({
-                        "result": {
-                            "status": "pushed",
-                            "output": result.stdout
-                        }
-                    })
-                else:
-                    task_result.update({
-                        "error": result.stderr or "Push failed"
-                    })
-            except Exception as e:
-                task_result.update({"error": str(e)})
+        if merge_completed == False:
+            # If here → merge didn't apply OR we are in rebase → try rebase --continue
+            logger.debug("Attempting: git rebase --continue")
 
-        elif action == "commit":
-            message = params.get('commit_message', '').strip()
-            name = params.get('name')
-            email = params.get('email')
+            # For rebase, Git uses an internal commit message — but we can write ours into .git/rebase-merge/message
+            rebase_msg_path = os.path.join(git_dir, "rebase-merge", "message")
+            if is_rebase:
+                try:
+                    os.makedirs(os.path.dirname(rebase_msg_path), exist_ok=True)
+                    with open(rebase_msg_path, "w", encoding="utf-8") as f:
+                        f.write(commit_message)
+                    logger.debug("Custom commit message written to rebase-merge/message")
+                except Exception as msg_err:
+                    logger.error(f"Failed to write rebase commit message: {msg_err}")
+
+            rebase_cmd = [
+                GIT_EXECUTABLE, "-C", repo_path,
+                "rebase", "--continue"
+            ]
 
-            if not message:
-                results.append({"task_id": task['id'], "error": "Commit message required"})
-                continue
+            rebase_result = git_executor.run(
+                rebase_cmd, capture_output=True, text=True, env=env
+            )
 
-            try:
+            logger.debug({
+                "rebase_stdout": rebase_result.stdout,
+                "rebase_stderr": rebase_result.stderr,
+                "return_code": rebase_result.returncode
+            })
 
-                
-                # CAPTURE OLD HEAD BEFORE COMMIT
-                old_head_sha = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "rev-parse", "HEAD"]).strip()
-                if old_head_sha.startswith("Error:") or not old_head_sha:
-                    old_head_sha = None  # First commit case
+            if rebase_result.returncode == 0:
+                task_result.update({"result": {"status": "merge_completed"}})
+            else:
+                results.append({
+                    "task_id": task["id"],
+                    "error": rebase_result.stderr or rebase_result.stdout or "Unknown rebase error"
+                })
+                return results
 
+    except Exception as e:
+        logger.error(f"Merge Continue failed for {repo_name}: {str(e)}")
+        results.append({"task_id": task["id"], "error": str(e)})
+        return results
 
 
-                env = os.environ.copy()
+@task_registry.task_handler("stage_file", changes_status=True)
+def _task_stage_file(task, params, repo_name, repo_path, task_result, results):
+    params = task.get('params', {})
+    repo_name = params.get('repo_name')
+    file_path = params.get('file_path')
 
-                if name and email:
-                    env["GIT_AUTHOR_NAME"] = name
-                    env["GIT_AUTHOR_EMAIL"] = email
-                    env["GIT_COMMITTER_NAME"] = name
-                    env["GIT_COMMITTER_EMAIL"] = email
+    repo_path = find_repo_path(repo_name)
+    if not repo_path:
+        results.append({"task_id": task['id'], "error": "Repo not found"})
+        return results
 
-                    author_info = f"{name} <{email}>"
-                    print("commiting with provided author info:", author_info, flush=True)
-                    cmd = [GIT_EXECUTABLE, "-C", repo_path, "commit", "--author", author_info, "-a", "-m", message]
-                else:
-                    cmd = [GIT_EXECUTABLE, "-C", repo_path, "commit", "-a", "-m", message]
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, env=env)
-
-                if result.returncode == 0:
-
-                    # Now get fresh status + new commits
-                    new_head_sha, new_commits, diff_data = get_new_commits_and_diff(repo_path, old_head_sha or "")
-
-                    task_result.update({
-                        "result": {
-                            "status": "committed",
-                            "message": message,
-                            "old_head": old_head_sha,
-                            "new_head": new_head_sha,
-                            "new_commits": new_commits or [],
-                            "diff": diff_data
-                        }
-                    })
-                    logger.info(f"Commit successful: {repo_path}")
+    try:
+        git_executor.run([GIT_EXECUTABLE, "-C", repo_path, "add", file_path], check=True, capture_output=True)
+        task_result.update({
+            "result": {
+                "status": "staged", 
+                "file": file_path
+            }
+        })
+        logger.info(f"Staged: {file_path}")
+    except Exception as e:
+        results.append({"task_id": task['id'], "error": str(e)})
+        return results
 
-                else:
-                    full_error = f"Commit failed (exit {result.returncode})\n\n"
-                    
-                    if result.stderr:
-                        full_error += "Git error output:\n"
-                        full_error += result.stderr.strip()
-                    else:
-                        full_error += "No error output from Git"
-                    
-                    if result.stdout:
-                        full_error += "\n\nGit output:\n"
-                        full_error += result.stdout.strip()
-
-                    logger.error(
-                        f"Commit FAILED for {repo_name}\n"
-                        f"Command: {' '.join(cmd)}\n"
-                        f"Exit code: {result.returncode}\n"
-                        f"STDERR:\n{result.stderr}\n"
-                        f"STDOUT:\n{result.stdout}"
-                    )
-
-                    results.append({
-                        "task_id": task['id'],
-                        "error": full_error,
-                        "exit_code": result.returncode,
-                        "stdout": result.stdout,
-                        "stderr": result.stderr
-                    })
-                    continue
 
-            except Exception as e:
-                logger.exception("Exception during commit")
-                results.append({"task_id": task['id'], "error": str(e)})
-                continue
+@task_registry.task_handler("unstage_file", changes_status=True)
+def _task_unstage_file(task, params, repo_name, repo_path, task_result, results):
+    params = task.get('params', {})
+    repo_name = params.get('repo_name')
+    file_path = params.get('file_path')
 
-        elif action == "pull":
-            logger.info(f"[StarBridge] Pull requested for {repo_path}")
+    repo_path = find_repo_path(repo_name)
+    if not repo_path:
+        results.append({"task_id": task['id'], "error": "Repo not found"})
+        return results
 
-            remote = params.get('remote', 'origin')
-            branch = params.get('branch')
-            pull_mode = params.get('pull_mode', 'ff-only')
-            name = params.get('name')
-            email = params.get('email')
+    try:
+        git_executor.run([GIT_EXECUTABLE, "-C", repo_path, "restore", "--staged", file_path], check=True, capture_output=True)
+        task_result.update({
+            "result": {"status": "unstaged", "file": file_path}
+        })
+        logger.info(f"Unstaged: {file_path}")
+    except Exception as e:
+        results.append({"task_id": task['id'], "error": str(e)})
+        return results
 
-            if not branch:
-                results.append({"task_id": task['id'], "error": "Branch not specified"})
-                continue
 
-            # --- 1. Capture old HEAD (supports empty repo + detached HEAD) ---
-            old_head = get_head(repo_path)
+@task_registry.task_handler("discard_file", changes_status=True)
+def _task_discard_file(task, params, repo_name, repo_path, task_result, results):
+    params = task.get('params', {})
+    repo_name = params.get('repo_name')
+    file_path = params.get('file_path')
 
-            if old_head is None:
-                logger.info("[StarBridge] Old HEAD: none (empty repo)")
-            elif isinstance(old_head, tuple):
-                logger.info(f"[StarBridge] Old HEAD: DETACHED at {old_head[1]}")
-            else:
-                logger.info(f"[StarBridge] Old HEAD: {old_head}")
-
-            # --- 2. Prepare pull command ---
-            pull_cmd = [GIT_EXECUTABLE, "-C", repo_path, "pull"]
-
-            if pull_mode == "rebase":
-                pull_cmd.append("--rebase")
-            elif pull_mode == "ff-only":
-                pull_cmd.append("--ff-only")
-            elif pull_mode == "merge":
-                pull_cmd.append("--no-rebase")
-            elif pull_mode is not None:
-                results.append({"task_id": task['id'], "error": f"Invalid pull_mode '{pull_mode}'"})
-                continue
-                
-            pull_cmd.append(remote)
-            pull_cmd.append(branch)
-            
-            # Prepare environment with committer identity
-            env = os.environ.copy()
-            if name and email:
-                env["GIT_AUTHOR_NAME"] = name
-                env["GIT_AUTHOR_EMAIL"] = email
-                env["GIT_COMMITTER_NAME"] = name
-                env["GIT_COMMITTER_EMAIL"] = email
-                
-            # --- 3. Execute pull ---
-            result = subprocess.run(pull_cmd, capture_output=True, text=True, env=env)
+    repo_path = find_repo_path(repo_name)
+    if not repo_path:
+        results.append({"task_id": task['id'], "error": "Repo not found"})
+        return results
 
-            if result.returncode != 0:
-                # Combine stdout + stderr for more info
-                error_msg = "\n".join(filter(None, [
-                    result.stderr.strip(),
-                    result.stdout.strip()
-                ])) or "Unknown pull error"
-
-                logger.error(f"[StarBridge] Pull failed for {repo_path} ({remote}/{branch}): {error_msg}")
-                
-                results.append({
-                    "task_id": task['id'],
-                    "error": "pull_failed: " + error_msg,
-                    "remote": remote,
-                    "branch": branch
-                })
-                continue
+    try:
+        git_executor.run([GIT_EXECUTABLE, "-C", repo_path, "restore", file_path], check=True, capture_output=True)
+        task_result.update({
+            "result": {"status": "discarded", "file": file_path}
+        })
+        logger.info(f"Discarded changes: {file_path}")
+    except Exception as e:
+        results.append({"task_id": task['id'], "error": str(e)})
+        return results
 
-            # --- 4. Determine new HEAD ---
-            new_head = get_head(repo_path)
 
-            if new_head is None:
-                logger.info("[StarBridge] New HEAD: none (still empty?)")
-            elif isinstance(new_head, tuple):
-                logger.info(f"[StarBridge] New HEAD: DETACHED at {new_head[1]}")
-            else:
-                logger.info(f"[StarBridge] New HEAD: {new_head}")
+@task_registry.task_handler("push", changes_status=True, changes_heads=True)
+def _task_push(task, params, repo_name, repo_path, task_result, results):
+    remote = params.get('remote', 'origin')
+    branch = params.get('branch', 'HEAD')
+    force = params.get('force', False)
 
-            # --- 5. Detect newly fetched commits + live diff ---
-            new_commits, diff_data = [], None
+    try:
+        cmd = [GIT_EXECUTABLE, "-C", repo_path, "push"]
+        if force:
+            cmd.append("--force-with-lease")
+        cmd.extend([remote, branch])
 
-            # Only compute diff when a meaningful change occurred
-            def head_value(h):
-                return h[1] if isinstance(h, tuple) else h
+        result = git_executor.run(cmd, capture_output=True, text=True, timeout=60)
 
-            if head_value(old_head) != head_value(new_head) and head_value(new_head) is not None:
-                try:
-                    _, new_commits, diff_data = get_new_commits_and_diff(
-                        repo_path,
-                        head_value(old_head)
-                    )
-                except Exception as e:
-                    logger.exception(f"[StarBridge] Failed computing commits/diff: {e}")
+        if result.returncode == 0:
+            task_result.update({
+                "result": {
+                    "status": "pushed",
+                    "output": result.stdout
+                }
+            })
+        else:
+            task_result.update({
+                "error": result.stderr or "Push failed"
+            })
+    except Exception as e:
+        task_result.update({"error": str(e)})
+
+
+@task_registry.task_handler("commit", changes_status=True, changes_heads=True)
+def _task_commit(task, params, repo_name, repo_path, task_result, results):
+    message = params.get('commit_message', '').strip()
+    name = params.get('name')
+    email = params.get('email')
+
+    if not message:
+        results.append({"task_id": task['id'], "error": "Commit message required"})
+        return results
+
+    try:
+
+
+        # CAPTURE OLD HEAD BEFORE COMMIT
+        old_head_sha = git_backend.get_backend().rev_parse(repo_path, "HEAD")  # None on first commit
+
+
+
+        env = os.environ.copy()
+
+        if name and email:
+            env["GIT_AUTHOR_NAME"] = name
+            env["GIT_AUTHOR_EMAIL"] = email
+            env["GIT_COMMITTER_NAME"] = name
+            env["GIT_COMMITTER_EMAIL"] = email
+
+            author_info = f"{name} <{email}>"
+            print("commiting with provided author info:", author_info, flush=True)
+            cmd = [GIT_EXECUTABLE, "-C", repo_path, "commit", "--author", author_info, "-a", "-m", message]
+        else:
+            cmd = [GIT_EXECUTABLE, "-C", repo_path, "commit", "-a", "-m", message]
+
+        result = git_executor.run(cmd, capture_output=True, text=True, env=env)
+
+        if result.returncode == 0:
+
+            # Now get fresh status + new commits
+            new_head_sha, new_commits, diff_data = get_new_commits_and_diff(repo_path, old_head_sha or "")
 
-            # --- 6. Build final response ---
             task_result.update({
                 "result": {
-                    "status": "pulled",
-                    "remote": remote,
-                    "branch": branch,
-                    "old_head": old_head,
-                    "old_detached": isinstance(old_head, tuple),
-                    "new_head": new_head,
-                    "new_detached": isinstance(new_head, tuple),
+                    "status": "committed",
+                    "message": message,
+                    "old_head": old_head_sha,
+                    "new_head": new_head_sha,
                     "new_commits": new_commits or [],
-                    "diff": diff_data,
-                    "pull_output": result.stdout.strip()
+                    "diff": diff_data
                 }
             })
+            logger.info(f"Commit successful: {repo_path}")
+
+        else:
+            full_error = f"Commit failed (exit {result.returncode})\n\n"
 
-            logger.info(
-                f"[StarBridge] Pull completed for {repo_path} ({remote}/{branch}): "
-                f"{len(new_commits or [])} new commits."
+            if result.stderr:
+                full_error += "Git error output:\n"
+                full_error += result.stderr.strip()
+            else:
+                full_error += "No error output from Git"
+
+            if result.stdout:
+                full_error += "\n\nGit output:\n"
+                full_error += result.stdout.strip()
+
+            logger.error(
+                f"Commit FAILED for {repo_name}\n"
+                f"Command: {' '.join(cmd)}\n"
+                f"Exit code: {result.returncode}\n"
+                f"STDERR:\n{result.stderr}\n"
+                f"STDOUT:\n{result.stdout}"
             )
 
-        elif action == "reset_hard":
-            
-            target = params.get('target', 'HEAD')  # e.g. "HEAD~3" or commit SHA
+            results.append({
+                "task_id": task['id'],
+                "error": full_error,
+                "exit_code": result.returncode,
+                "stdout": result.stdout,
+                "stderr": result.stderr
+            })
+            return results
 
-            try:
-                # --- 1. Save current state as backup diff (undo safety) ---
-                backup_msg = f"StarGit backup before reset hard ({datetime.now(timezone.utc).isoformat()})"
-                
-                now_utc = datetime.now(timezone.utc)
-                timestamp = now_utc.strftime("%Y-%m-%d_%H-%M-%S")
-
-                # --- Create backup folder ---
-                backup_dir = os.path.join(repo_path, ".stargit", "backups", timestamp)
-                os.makedirs(backup_dir, exist_ok=True)
-
-                # ---  Save backup message to file ---
-                backup_msg_file = os.path.join(backup_dir, f"{timestamp}_backup_commit_message.txt")
-                with open(backup_msg_file, "w", encoding="utf-8") as f:
-                    f.write(backup_msg)
-                # --- 4. Save current working tree diff ---
-                try:
-                    pre_diff = git_utils.get_diff(repo_path)
-                    if pre_diff:
-                        diff_file = os.path.join(backup_dir, f"{timestamp}_pre_reset_diff.diff")
-                        with open(diff_file, "w", encoding="utf-8") as f:
-                            f.write(json.dumps(pre_diff, indent=2))
-                           
-                except Exception as e:
-                    logger.warning(f"Failed to get pre-reset diff: {e}")
-                    pre_diff = None
+    except Exception as e:
+        logger.exception("Exception during commit")
+        results.append({"task_id": task['id'], "error": str(e)})
+        return results
 
-                # 2. Get diff before reset (for UI)
-                try:
-                    pre_diff = git_utils.get_diff(repo_path)
-                except Exception as e:
-                    logger.warning(f"Failed to get pre-reset diff: {e}")
-                    pre_diff = None
 
-                # 3. Hard reset
-                cmd = [GIT_EXECUTABLE, "-C", repo_path, "reset", "--hard", target]
-                result = subprocess.run(cmd, capture_output=True, text=True)
+@task_registry.task_handler("pull", changes_status=True, changes_heads=True)
+def _task_pull(task, params, repo_name, repo_path, task_result, results):
+    logger.info(f"[StarBridge] Pull requested for {repo_path}")
 
-                if result.returncode != 0:
-                    error_text = (result.stderr or result.stdout or "Reset failed").strip()
-                    logger.error(f"Hard reset failed: {error_text}")
-                    results.append({"task_id": task['id'], "error": f"reset_failed: {error_text}"})
-                    continue
+    remote = params.get('remote', 'origin')
+    branch = params.get('branch')
+    pull_mode = params.get('pull_mode', 'ff-only')
+    name = params.get('name')
+    email = params.get('email')
 
-                # 4. Fresh status + diff
-                try:
-                    fresh_status, _ = get_git_status_data(repo_path)
-                except Exception as e:
-                    logger.warning(f"Failed to get repo status after reset: {e}")
-                    fresh_status = {}
+    if not branch:
+        results.append({"task_id": task['id'], "error": "Branch not specified"})
+        return results
 
-                try:
-                    post_diff = git_utils.get_diff(repo_path)
-                except Exception as e:
-                    logger.warning(f"Failed to get post-reset diff: {e}")
-                    post_diff = None
-
-                # --- 5. Append result ---
-                task_result.update({
-                    "result": {
-                        "status": "reset_hard_complete",
-                        "target": target,
-                        "backup_message": f"Backup saved at {timestamp}",
-                        "backup_path": f".stargit/backups/{timestamp}",
-                        "pre_reset_diff": pre_diff,
-                        "post_reset_diff": post_diff,
-                        "repo_status": fresh_status
-                    }
-                })
+    # --- 1. Capture old HEAD (supports empty repo + detached HEAD) ---
+    old_head = get_head(repo_path)
 
-                logger.info(f"[StarBridge] Hard reset to {target} completed with backup commit")
+    if old_head is None:
+        logger.info("[StarBridge] Old HEAD: none (empty repo)")
+    elif isinstance(old_head, tuple):
+        logger.info(f"[StarBridge] Old HEAD: DETACHED at {old_head[1]}")
+    else:
+        logger.info(f"[StarBridge] Old HEAD: {old_head}")
+
+    # --- 2. Prepare pull command ---
+    pull_cmd = [GIT_EXECUTABLE, "-C", repo_path, "pull"]
+
+    if pull_mode == "rebase":
+        pull_cmd.append("--rebase")
+    elif pull_mode == "ff-only":
+        pull_cmd.append("--ff-only")
+    elif pull_mode == "merge":
+        pull_cmd.append("--no-rebase")
+    elif pull_mode is not None:
+        results.append({"task_id": task['id'], "error": f"Invalid pull_mode '{pull_mode}'"})
+        return results
 
-            except Exception as e:
-                logger.exception(f"Exception during reset_hard: {str(e)}")
-                results.append({"task_id": task['id'], "error": str(e)})
-                
-        elif action == "get_status":
+    pull_cmd.append(remote)
+    pull_cmd.append(branch)
 
-            try:
-                logger.info(f"[StarBridge] Getting status for repo: {repo_name}")
-                output = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "status"])
-                output = output.strip()  # Remove leading/trailing newlines
+    # Prepare environment with committer identity
+    env = os.environ.copy()
+    if name and email:
+        env["GIT_AUTHOR_NAME"] = name
+        env["GIT_AUTHOR_EMAIL"] = email
+        env["GIT_COMMITTER_NAME"] = name
+        env["GIT_COMMITTER_EMAIL"] = email
 
-                task_result.update({
-                    "result": {
-                        "status_output": output
-                    }
-                })
-            except Exception as e:
-                logger.exception(f"[StarBridge] Exception while getting status for {repo_name}")
-                results.append({"task_id": task['id'], "error": str(e)})
+    # --- 3. Execute pull ---
+    result = git_executor.run(pull_cmd, capture_output=True, text=True, env=env)
 
-        elif action == "sync_remote_heads":
-            
-            
-            try:
-                # Optionally refresh ahead/behind
-                remote_heads = git_utils.get_remote_heads(repo_path)
-                ahead, behind = git_utils.get_ahead_behind(repo_path)
-                if "result" not in task_result:
-                    task_result["result"] = {}
-                task_result.update({
-                    "result": {
-                        "status": "remote_heads_synced",
-                        "remote_heads": remote_heads,
-                        "ahead": ahead,
-                        "behind": behind
-                    }
-                })
-                logger.info(f"Synced remote_heads for {repo_name} from another device")
-            except Exception as e:
-                if "error" not in task_result:
-                    task_result["error"] = {}
-                task_result.update({"error": str(e)})
+    if result.returncode != 0:
+        # Combine stdout + stderr for more info
+        error_msg = "\n".join(filter(None, [
+            result.stderr.strip(),
+            result.stdout.strip()
+        ])) or "Unknown pull error"
 
-        elif action == "run_ci":
-            start_time = time.time()
-            event_name = params.get("event", "manual")
-            runner_id = params.get("runner_id")  # optional: specific runner
+        logger.error(f"[StarBridge] Pull failed for {repo_path} ({remote}/{branch}): {error_msg}")
 
-            try:
-                logger.info(f"Running CI/CD for {repo_name} -> event: {event_name}")
-
-                # Use your elite CI runner
-                cmd = [
-                    "venv/bin/python", "stargit_ci.py",
-                    str(repo_path),
-                    event_name
-                ]
-
-                result = subprocess.run(
-                    cmd,
-                    cwd=repo_path,
-                    capture_output=True,
-                    text=True,
-                    timeout=1800  # 30 min max
-                )
-
-                commit_sha = git_utils.get_current_commit_sha(repo_path)
-
-                task_result.update({
-                    "result": {
-                        "status": "success" if result.returncode == 0 else "failed",
-                        "args": result.args,
-                        "exit_code": result.returncode,
-                        "stdout": result.stdout,
-                        "stderr": result.stderr,
-                        "duration_seconds": time.time() - start_time,
-                        "commit_sha": commit_sha
-                    }
-                })
+        results.append({
+            "task_id": task['id'],
+            "error": "pull_failed: " + error_msg,
+            "remote": remote,
+            "branch": branch
+        })
+        return results
 
-                print("runner task result:", json.dumps({
-                    "args": result.args,
-                    "returncode": result.returncode,
-                    "stdout": result.stdout,
-                    "stderr": result.stderr
-                }, indent=4), flush=True)
+    # --- 4. Determine new HEAD ---
+    new_head = get_head(repo_path)
 
-                if result.returncode == 0:
-                    logger.info(f"CI/CD succeeded for {repo_name}")
-                else:
-                    logger.error(f"CI/CD failed for {repo_name}: {result.stderr[:500]}")
+    if new_head is None:
+        logger.info("[StarBridge] New HEAD: none (still empty?)")
+    elif isinstance(new_head, tuple):
+        logger.info(f"[StarBridge] New HEAD: DETACHED at {new_head[1]}")
+    else:
+        logger.info(f"[StarBridge] New HEAD: {new_head}")
 
-            except subprocess.TimeoutExpired:
-                task_result.update({
-                    "error": "CI/CD timed out after 30 minutes"
-                })
-                logger.error(f"CI/CD timeout for {repo_name}")
-            except Exception as e:
-                task_result.update({"error": str(e)})
-                logger.exception(f"CI/CD crashed for {repo_name}")
-
-        elif action == "create_repo":
-            print("create_repo action event", flush=True)
-            params = params or {}
-            repo_name = params.get("repo_name")
-            repo_uuid = params.get("repo_uuid")
-            owner = params.get("owner", "user")
-            description = params.get("description", "")
-            default_branch = params.get("default_branch", "main")
-            visibility = params.get("visibility", "private")
-            bare = params.get("is_bare", False)
-            immutable = params.get("immutable", True)
-            init_readme = params.get("init_readme", False)
-            init_gitignore = params.get("init_gitignore", False)
-            init_license = params.get("init_license", False)
-            gitignore_template = params.get("gitignore_template", "")
+    # --- 5. Detect newly fetched commits + live diff ---
+    new_commits, diff_data = [], None
 
+    # Only compute diff when a meaningful change occurred
+    def head_value(h):
+        return h[1] if isinstance(h, tuple) else h
 
-            try:
-                if not repo_name:
-                    raise ValueError("repo_name is required")
+    if head_value(old_head) != head_value(new_head) and head_value(new_head) is not None:
+        try:
+            _, new_commits, diff_data = get_new_commits_and_diff(
+                repo_path,
+                head_value(old_head)
+            )
+        except Exception as e:
+            logger.exception(f"[StarBridge] Failed computing commits/diff: {e}")
 
-                print("REPO_BASE:", REPO_BASE, flush=True)
+    # --- 6. Build final response ---
+    task_result.update({
+        "result": {
+            "status": "pulled",
+            "remote": remote,
+            "branch": branch,
+            "old_head": old_head,
+            "old_detached": isinstance(old_head, tuple),
+            "new_head": new_head,
+            "new_detached": isinstance(new_head, tuple),
+            "new_commits": new_commits or [],
+            "diff": diff_data,
+            "pull_output": result.stdout.strip()
+        }
+    })
 
-                STARGIT_WORK_ROOT = os.path.join(REPO_BASE, "_work")
-                os.makedirs(STARGIT_WORK_ROOT, exist_ok=True)
+    logger.info(
+        f"[StarBridge] Pull completed for {repo_path} ({remote}/{branch}): "
+        f"{len(new_commits or [])} new commits."
+    )
 
-                if bare:
-                    repo_path = os.path.join(REPO_BASE, f"{repo_name}.git")
-                else:
-                    repo_path = os.path.join(REPO_BASE, f"{repo_name}")
-                print("repo_path:", repo_path, flush=True)
-
-                # Create repo directory
-                os.makedirs(repo_path, exist_ok=False)
-
-                # Initialize bare repository
-                # Initialize bare or non-bare repo
-                git_init_args = [GIT_EXECUTABLE, "init"]
-                if bare:
-                    git_init_args.insert(1, "--bare")
-                git_init_args.append(repo_path)
-                subprocess.run(git_init_args, check=True)
-
-                # Set repository description (Git uses 'description', not description.txt)
-                if description:
-                    with open(os.path.join(repo_path, "description"), "w", encoding="utf-8") as f:
-                        f.write(description)
-
-                # Create initial commit if needed
-                if init_readme or init_gitignore or init_license:
-                    if bare:
-                        # Use a temporary workdir inside the repo storage
-                        workdir = os.path.join(STARGIT_WORK_ROOT, f"init-{repo_name}-{repo_uuid}")
-                        os.makedirs(workdir, exist_ok=False)
-                    else:
-                        # Non-bare repo: use the repo_path itself
-                        workdir = repo_path
-                    
-                    # Initialize (non-bare) workdir if bare
-                    if bare:
-                        subprocess.run([GIT_EXECUTABLE, "init", workdir], check=True)
-
-                    subprocess.run([GIT_EXECUTABLE, "-C", workdir, "checkout", "-b", default_branch], check=True)
-
-                    if init_readme:
-                        with open(os.path.join(workdir, "README.md"), "w") as f:
-                            f.write(f"# {repo_name}\n\n{description}")
-                    if init_gitignore and gitignore_template:
-                        with open(os.path.join(workdir, ".gitignore"), "w") as f:
-                            f.write(get_gitignore_template(gitignore_template))
-                    if init_license:
-                        with open(os.path.join(workdir, "LICENSE"), "w") as f:
-                            f.write(get_mit_license())
-
-                    subprocess.run([GIT_EXECUTABLE, "-C", workdir, "add", "."], check=True)
-                    subprocess.run([
-                        GIT_EXECUTABLE, "-C", workdir, "commit",
-                        "-m", "Initial commit",
-                        "--author", "StarGit <noreply@stargit.com>"
-                    ], check=True)
-
-                    if bare:
-                        # Push/fetch into bare repo
-                        subprocess.run([
-                            GIT_EXECUTABLE, "-C", repo_path, "fetch", workdir, f"{default_branch}:{default_branch}"
-                        ], check=True)
-                        shutil.rmtree(workdir)  # cleanup temporary workdir
-
-                settings.add_repository(repo_path)
-
-                task_result["result"] = {
-                    "repo_uuid": repo_uuid,
-                    "repo_path": repo_path,
-                    "is_bare": bare
-                }
 
-            except Exception as e:
-                logger.exception("create_repo failed")
-                task_result.update({"error": str(e)})
+@task_registry.task_handler("reset_hard")
+def _task_reset_hard(task, params, repo_name, repo_path, task_result, results):
+    target = params.get('target', 'HEAD')  # e.g. "HEAD~3" or commit SHA
 
-        elif action == "delete_repo":
-            repo_name = params.get("repo_name")
-            logger.info(f"Delete repository request received for: '{repo_name}'")
+    try:
+        # --- 1. Save current state as backup diff (undo safety) ---
+        backup_msg = f"StarGit backup before reset hard ({datetime.now(timezone.utc).isoformat()})"
 
-            repo_path = find_repo_path_by_name(repo_name)
-            
-            if repo_path:
-                logger.debug(f"Resolved repository path: {repo_path}")
+        now_utc = datetime.now(timezone.utc)
+        timestamp = now_utc.strftime("%Y-%m-%d_%H-%M-%S")
 
-                if os.path.exists(repo_path):
-                    try:
-                        shutil.rmtree(repo_path)
-                        settings.remove_repository(repo_path)
-                        task_result["result"] = {"status": "deleted"}
-                        logger.info(f"Successfully deleted repository directory: {repo_path}")
-                    except Exception as e:
-                        task_result.update({"error": str(e)})
-                        logger.error(f"Error deleting repository '{repo_name}' at {repo_path}: {e}", exc_info=True)
-                else:
-                    settings.remove_repository(repo_path)  # clean up settings even if directory missing
-                    task_result["result"] = {"status": "not_found"}
-                    logger.warning(f"Repository directory does not exist: {repo_path}")
-            else:
-                task_result["result"] = {"status": "not_found"}
-                logger.warning(f"Repository '{repo_name}' could not be resolved to a path")
-              
-        elif action == "import_repo":
-            remote_url = params.get("remote_url")
-            repo_uuid = params.get("repo_uuid")
-            repo_name = params.get("repo_name")
-            auth_type = params.get("auth_type", "none")
-            auth_secret = params.get("auth_secret", "")
-            bare = params.get("bare", True)  # default True if not provided
-
-            repo_path = os.path.join(REPO_BASE, repo_name)
+        # --- Create backup folder ---
+        backup_dir = os.path.join(repo_path, ".stargit", "backups", timestamp)
+        os.makedirs(backup_dir, exist_ok=True)
 
-            try:
-                os.makedirs(repo_path, exist_ok=True)
+        # ---  Save backup message to file ---
+        backup_msg_file = os.path.join(backup_dir, f"{timestamp}_backup_commit_message.txt")
+        with open(backup_msg_file, "w", encoding="utf-8") as f:
+            f.write(backup_msg)
+        # --- 4. Save current working tree diff ---
+        try:
+            pre_diff = git_utils.get_diff(repo_path)
+            if pre_diff:
+                diff_file = os.path.join(backup_dir, f"{timestamp}_pre_reset_diff.diff")
+                with open(diff_file, "w", encoding="utf-8") as f:
+                    f.write(json.dumps(pre_diff, indent=2))
 
-                # Adjust clone command based on bare flag
-                clone_cmd = [GIT_EXECUTABLE, "clone"]
-                if bare:
-                    clone_cmd.append("--bare")
+        except Exception as e:
+            logger.warning(f"Failed to get pre-reset diff: {e}")
+            pre_diff = None
 
-                # Handle authentication
-                if auth_type == "token":
-                    # HTTPS with token
-                    url_parts = remote_url.split("://")
-                    if len(url_parts) == 2:
-                        remote_url = f"{url_parts[0]}://{auth_secret}@{url_parts[1]}"
-                elif auth_type == "ssh":
-                    # Assume SSH key is already configured
-                    pass
+        # 2. Get diff before reset (for UI)
+        try:
+            pre_diff = git_utils.get_diff(repo_path)
+        except Exception as e:
+            logger.warning(f"Failed to get pre-reset diff: {e}")
+            pre_diff = None
 
-                clone_cmd += [remote_url, str(repo_path)]
+        # 3. Hard reset
+        cmd = [GIT_EXECUTABLE, "-C", repo_path, "reset", "--hard", target]
+        result = git_executor.run(cmd, capture_output=True, text=True)
 
-                result = subprocess.run(clone_cmd, check=True, capture_output=True, text=True)
+        if result.returncode != 0:
+            error_text = (result.stderr or result.stdout or "Reset failed").strip()
+            logger.error(f"Hard reset failed: {error_text}")
+            results.append({"task_id": task['id'], "error": f"reset_failed: {error_text}"})
+            return results
 
-                settings.add_repository(repo_path)
+        # 4. Fresh status + diff
+        status_cache.invalidate(repo_path)
+        try:
+            fresh_status, _ = get_git_status_data(repo_path)
+        except Exception as e:
+            logger.warning(f"Failed to get repo status after reset: {e}")
+            fresh_status = {}
 
-                task_result["result"] = {
-                    "status": "imported",
-                    "repo_uuid": repo_uuid,
-                    "repo_name": repo_name,
-                    "output": result.stdout
-                }
+        try:
+            post_diff = git_utils.get_diff(repo_path)
+        except Exception as e:
+            logger.warning(f"Failed to get post-reset diff: {e}")
+            post_diff = None
+
+        # --- 5. Append result ---
+        task_result.update({
+            "result": {
+                "status": "reset_hard_complete",
+                "target": target,
+                "backup_message": f"Backup saved at {timestamp}",
+                "backup_path": f".stargit/backups/{timestamp}",
+                "pre_reset_diff": pre_diff,
+                "post_reset_diff": post_diff,
+                "repo_status": fresh_status
+            }
+        })
 
-                logger.info(f"Imported {remote_url} -> {repo_path} (bare={bare})")
+        logger.info(f"[StarBridge] Hard reset to {target} completed with backup commit")
 
-            except subprocess.CalledProcessError as e:
-                task_result.update({"error": f"Clone failed: {e.stderr}"})
-                logger.error(f"Git clone failed: {e.stderr}")
-            except Exception as e:
-                task_result.update({"error": str(e)})
-                logger.exception(f"Unexpected error importing repository: {e}")
-                        
-        elif action == "abort_merge":
+    except Exception as e:
+        logger.exception(f"Exception during reset_hard: {str(e)}")
+        results.append({"task_id": task['id'], "error": str(e)})
 
+
+@task_registry.task_handler("get_status", kind="read", timeout=120)
+def _task_get_status(task, params, repo_name, repo_path, task_result, results):
+    try:
+        logger.info(f"[StarBridge] Getting status for repo: {repo_name}")
+        output = run_git_command(repo_path, [GIT_EXECUTABLE, "-C", repo_path, "status"])
+        output = output.strip()  # Remove leading/trailing newlines
+
+        task_result.update({
+            "result": {
+                "status_output": output
+            }
+        })
+    except Exception as e:
+        logger.exception(f"[StarBridge] Exception while getting status for {repo_name}")
+        results.append({"task_id": task['id'], "error": str(e)})
+
+
+@task_registry.task_handler("sync_remote_heads")
+def _task_sync_remote_heads(task, params, repo_name, repo_path, task_result, results):
+    try:
+        # Another device changed the remote: skip the remote heads cache
+        git_utils.invalidate_remote_heads(repo_path)
+        remote_heads = git_utils.get_remote_heads(repo_path)
+        ahead, behind = git_utils.get_ahead_behind(repo_path)
+        if "result" not in task_result:
+            task_result["result"] = {}
+        task_result.update({
+            "result": {
+                "status": "remote_heads_synced",
+                "remote_heads": remote_heads,
+                "ahead": ahead,
+                "behind": behind
+            }
+        })
+        logger.info(f"Synced remote_heads for {repo_name} from another device")
+    except Exception as e:
+        if "error" not in task_result:
+            task_result["error"] = {}
+        task_result.update({"error": str(e)})
+
+
+@task_registry.task_handler("run_ci")
+def _task_run_ci(task, params, repo_name, repo_path, task_result, results):
+    start_time = time.time()
+    event_name = params.get("event", "manual")
+    runner_id = params.get("runner_id")  # optional: specific runner
+
+    try:
+        logger.info(f"Running CI/CD for {repo_name} -> event: {event_name}")
+
+        # Use your elite CI runner
+        cmd = [
+            "venv/bin/python", "stargit_ci.py",
+            str(repo_path),
+            event_name
+        ]
+
+        result = subprocess.run(
+            cmd,
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+            timeout=1800  # 30 min max
+        )
+
+        commit_sha = git_utils.get_current_commit_sha(repo_path)
+
+        task_result.update({
+            "result": {
+                "status": "success" if result.returncode == 0 else "failed",
+                "args": result.args,
+                "exit_code": result.returncode,
+                "stdout": result.stdout,
+                "stderr": result.stderr,
+                "duration_seconds": time.time() - start_time,
+                "commit_sha": commit_sha
+            }
+        })
+
+        print("runner task result:", json.dumps({
+            "args": result.args,
+            "returncode": result.returncode,
+            "stdout": result.stdout,
+            "stderr": result.stderr
+        }, indent=4), flush=True)
+
+        if result.returncode == 0:
+            logger.info(f"CI/CD succeeded for {repo_name}")
+        else:
+            logger.error(f"CI/CD failed for {repo_name}: {result.stderr[:500]}")
+
+    except subprocess.TimeoutExpired:
+        task_result.update({
+            "error": "CI/CD timed out after 30 minutes"
+        })
+        logger.error(f"CI/CD timeout for {repo_name}")
+    except Exception as e:
+        task_result.update({"error": str(e)})
+        logger.exception(f"CI/CD crashed for {repo_name}")
+
+
+@task_registry.task_handler("create_repo", full_sync=True, needs_repo=False)
+def _task_create_repo(task, params, repo_name, repo_path, task_result, results):
+    print("create_repo action event", flush=True)
+    params = params or {}
+    repo_name = params.get("repo_name")
+    repo_uuid = params.get("repo_uuid")
+    owner = params.get("owner", "user")
+    description = params.get("description", "")
+    default_branch = params.get("default_branch", "main")
+    visibility = params.get("visibility", "private")
+    bare = params.get("is_bare", False)
+    immutable = params.get("immutable", True)
+    init_readme = params.get("init_readme", False)
+    init_gitignore = params.get("init_gitignore", False)
+    init_license = params.get("init_license", False)
+    gitignore_template = params.get("gitignore_template", "")
+
+
+    try:
+        if not repo_name:
+            raise ValueError("repo_name is required")
+
+        print("REPO_BASE:", REPO_BASE, flush=True)
+
+        STARGIT_WORK_ROOT = os.path.join(REPO_BASE, "_work")
+        os.makedirs(STARGIT_WORK_ROOT, exist_ok=True)
+
+        if bare:
+            repo_path = os.path.join(REPO_BASE, f"{repo_name}.git")
+        else:
+            repo_path = os.path.join(REPO_BASE, f"{repo_name}")
+        print("repo_path:", repo_path, flush=True)
+
+        # Create repo directory
+        os.makedirs(repo_path, exist_ok=False)
+
+        # Initialize bare repository
+        # Initialize bare or non-bare repo
+        git_init_args = [GIT_EXECUTABLE, "init"]
+        if bare:
+            git_init_args.insert(1, "--bare")
+        git_init_args.append(repo_path)
+        git_executor.run(git_init_args, check=True)
+
+        # Set repository description (Git uses 'description', not description.txt)
+        if description:
+            with open(os.path.join(repo_path, "description"), "w", encoding="utf-8") as f:
+                f.write(description)
+
+        # Create initial commit if needed
+        if init_readme or init_gitignore or init_license:
+            if bare:
+                # Use a temporary workdir inside the repo storage
+                workdir = os.path.join(STARGIT_WORK_ROOT, f"init-{repo_name}-{repo_uuid}")
+                os.makedirs(workdir, exist_ok=False)
+            else:
+                # Non-bare repo: use the repo_path itself
+                workdir = repo_path
+
+            # Initialize (non-bare) workdir if bare
+            if bare:
+                git_executor.run([GIT_EXECUTABLE, "init", workdir], check=True)
+
+            git_executor.run([GIT_EXECUTABLE, "-C", workdir, "checkout", "-b", default_branch], check=True)
+
+            if init_readme:
+                with open(os.path.join(workdir, "README.md"), "w") as f:
+                    f.write(f"# {repo_name}\n\n{description}")
+            if init_gitignore and gitignore_template:
+                with open(os.path.join(workdir, ".gitignore"), "w") as f:
+                    f.write(get_gitignore_template(gitignore_template))
+            if init_license:
+                with open(os.path.join(workdir, "LICENSE"), "w") as f:
+                    f.write(get_mit_license())
+
+            git_executor.run([GIT_EXECUTABLE, "-C", workdir, "add", "."], check=True)
+            git_executor.run([
+                GIT_EXECUTABLE, "-C", workdir, "commit",
+                "-m", "Initial commit",
+                "--author", "StarGit <noreply@stargit.com>"
+            ], check=True)
+
+            if bare:
+                # Push/fetch into bare repo
+                git_executor.run([
+                    GIT_EXECUTABLE, "-C", repo_path, "fetch", workdir, f"{default_branch}:{default_branch}"
+                ], check=True)
+                shutil.rmtree(workdir)  # cleanup temporary workdir
+
+        settings.add_repository(repo_path)
+        task["resolved_repo_path"] = repo_path
+
+        task_result["result"] = {
+            "repo_uuid": repo_uuid,
+            "repo_path": repo_path,
+            "is_bare": bare
+        }
+
+    except Exception as e:
+        logger.exception("create_repo failed")
+        task_result.update({"error": str(e)})
+
+
+@task_registry.task_handler("delete_repo")
+def _task_delete_repo(task, params, repo_name, repo_path, task_result, results):
+    repo_name = params.get("repo_name")
+    logger.info(f"Delete repository request received for: '{repo_name}'")
+
+    repo_path = find_repo_path_by_name(repo_name)
+
+    if repo_path:
+        logger.debug(f"Resolved repository path: {repo_path}")
+
+        if os.path.exists(repo_path):
             try:
-                result = subprocess.run(
-                    [GIT_EXECUTABLE, "-C", str(repo_path), "merge", "--abort"],
-                    capture_output=True, text=True
-                )
-
-                if result.returncode == 0:
-                    task_result["result"] = {"status": "aborted"}
-                    logger.info(f"Merge aborted in {repo_name}")
-                else:
-                    task_result.update({"error": result.stderr.strip() or "Merge abort failed"})
-            except Exception as e:
-                task_result.update({"error": str(e)})
-        
-        elif action == "list_all_untracked":
-            
-            try:
-                result = subprocess.run(
-                    [GIT_EXECUTABLE, "-C", str(repo_path), "ls-files", "--others", "--exclude-standard"],
-                    capture_output=True, text=True, check=True
-                )
-                untracked = [line.strip() for line in result.stdout.splitlines() if line.strip()]
-                task_result["result"] = {"untracked": untracked}
+                shutil.rmtree(repo_path)
+                settings.remove_repository(repo_path)
+                task_result["result"] = {"status": "deleted"}
+                logger.info(f"Successfully deleted repository directory: {repo_path}")
             except Exception as e:
                 task_result.update({"error": str(e)})
+                logger.error(f"Error deleting repository '{repo_name}' at {repo_path}: {e}", exc_info=True)
+        else:
+            settings.remove_repository(repo_path)  # clean up settings even if directory missing
+            task_result["result"] = {"status": "not_found"}
+            logger.warning(f"Repository directory does not exist: {repo_path}")
+    else:
+        task_result["result"] = {"status": "not_found"}
+        logger.warning(f"Repository '{repo_name}' could not be resolved to a path")
 
-        elif action == "update_starbridge":
-            repo_path = os.getcwd()  # The directory where StarBridge is running
 
-            try:
-                # 1. Perform git pull
-                result = subprocess.run(
-                    ["git", "-C", repo_path, "pull", "--ff-only"],
-                    capture_output=True,
-                    text=True,
-                    check=False
-                )
-
-                if result.returncode == 0:
-                    output = result.stdout.strip()
-                    logger.info(f"Git pull successful in {repo_path}: {output}")
-
-                    task_result["result"] = {
-                        "status": "updated",
-                        "output": output,
-                        "new_commit": git_utils.get_current_commit_sha(repo_path)
-                    }
+@task_registry.task_handler("import_repo", full_sync=True, needs_repo=False)
+def _task_import_repo(task, params, repo_name, repo_path, task_result, results):
+    remote_url = params.get("remote_url")
+    repo_uuid = params.get("repo_uuid")
+    repo_name = params.get("repo_name")
+    auth_type = params.get("auth_type", "none")
+    auth_secret = params.get("auth_secret", "")
+    bare = params.get("bare", True)  # default True if not provided
 
+    repo_path = os.path.join(REPO_BASE, repo_name)
 
-                    # === Delayed exit in background thread ===
-                    def delayed_exit():
-                        logger.info("Update complete — scheduling graceful restart...")
-                        time.sleep(3)  # 3 seconds — enough for response to flush + nginx to close connection
-                        logger.info("Restarting StarBridge now...")
-                        os._exit(0)  # Hard exit — bypass atexit and cleanup
+    try:
+        os.makedirs(repo_path, exist_ok=True)
+
+        # Adjust clone command based on bare flag
+        clone_cmd = [GIT_EXECUTABLE, "clone"]
+        if bare:
+            clone_cmd.append("--bare")
+
+        # Handle authentication
+        if auth_type == "token":
+            # HTTPS with token
+            url_parts = remote_url.split("://")
+            if len(url_parts) == 2:
+                remote_url = f"{url_parts[0]}://{auth_secret}@{url_parts[1]}"
+        elif auth_type == "ssh":
+            # Assume SSH key is already configured
+            pass
+
+        clone_cmd += [remote_url, str(repo_path)]
+
+        result = git_executor.run(clone_cmd, check=True, capture_output=True, text=True)
+
+        settings.add_repository(repo_path)
+        task["resolved_repo_path"] = repo_path
+
+        task_result["result"] = {
+            "status": "imported",
+            "repo_uuid": repo_uuid,
+            "repo_name": repo_name,
+            "output": result.stdout
+        }
 
-                    threading.Thread(target=delayed_exit, daemon=True).start()
-    
-                else:
-                    error_msg = result.stderr.strip() or "Git pull failed"
-                    logger.error(f"Git pull failed in {repo_path}: {error_msg}")
-                    task_result.update({"error": error_msg})
+        logger.info(f"Imported {remote_url} -> {repo_path} (bare={bare})")
 
-            except Exception as e:
-                logger.exception(f"Update failed in {repo_path}")
-                task_result.update({"error": str(e)})
-            
+    except subprocess.CalledProcessError as e:
+        task_result.update({"error": f"Clone failed: {e.stderr}"})
+        logger.error(f"Git clone failed: {e.stderr}")
+    except Exception as e:
+        task_result.update({"error": str(e)})
+        logger.exception(f"Unexpected error importing repository: {e}")
+
+
+@task_registry.task_handler("abort_merge", changes_status=True)
+def _task_abort_merge(task, params, repo_name, repo_path, task_result, results):
+    try:
+        result = git_executor.run(
+            [GIT_EXECUTABLE, "-C", str(repo_path), "merge", "--abort"],
+            capture_output=True, text=True
+        )
+
+        if result.returncode == 0:
+            task_result["result"] = {"status": "aborted"}
+            logger.info(f"Merge aborted in {repo_name}")
         else:
-            logger.warning(f"Unknown action: {action}")
-            results.append({"task_id": task['id'], "result": None, "error": f"Unknown action: {action}"})
-            continue
+            task_result.update({"error": result.stderr.strip() or "Merge abort failed"})
+    except Exception as e:
+        task_result.update({"error": str(e)})
+
+
+@task_registry.task_handler("list_all_untracked", kind="read", timeout=120)
+def _task_list_all_untracked(task, params, repo_name, repo_path, task_result, results):
+    try:
+        result = git_executor.run(
+            [GIT_EXECUTABLE, "-C", str(repo_path), "ls-files", "--others", "--exclude-standard"],
+            capture_output=True, text=True, check=True
+        )
+        untracked = [line.strip() for line in result.stdout.splitlines() if line.strip()]
+        task_result["result"] = {"untracked": untracked}
+    except Exception as e:
+        task_result.update({"error": str(e)})
+
+
+@task_registry.task_handler("update_starbridge", concurrency="barrier", needs_repo=False)
+def _task_update_starbridge(task, params, repo_name, repo_path, task_result, results):
+    repo_path = os.getcwd()  # The directory where StarBridge is running
+
+    try:
+        # 1. Perform git pull
+        result = git_executor.run(
+            [GIT_EXECUTABLE, "-C", repo_path, "pull", "--ff-only"],
+            capture_output=True,
+            text=True,
+            check=False
+        )
+
+        if result.returncode == 0:
+            output = result.stdout.strip()
+            logger.info(f"Git pull successful in {repo_path}: {output}")
+
+            task_result["result"] = {
+                "status": "updated",
+                "output": output,
+                "new_commit": git_utils.get_current_commit_sha(repo_path)
+            }
+
+
+            # === Delayed exit in background thread ===
+            def delayed_exit():
+                logger.info("Update complete — scheduling graceful restart...")
+                time.sleep(3)  # 3 seconds — enough for response to flush + nginx to close connection
+                logger.info("Restarting StarBridge now...")
+                os._exit(0)  # Hard exit — bypass atexit and cleanup
+
+            threading.Thread(target=delayed_exit, daemon=True).start()
+
+        else:
+            error_msg = result.stderr.strip() or "Git pull failed"
+            logger.error(f"Git pull failed in {repo_path}: {error_msg}")
+            task_result.update({"error": error_msg})
+
+    except Exception as e:
+        logger.exception(f"Update failed in {repo_path}")
+        task_result.update({"error": str(e)})
+
+
+# Process one task from a poll response
+def process_task(task):
+    """
+    Run a single task through its registered handler and return its result
+    entries: normally one, an error entry when a handler bails out early,
+    none if it drops the task. Identical read tasks are coalesced (see
+    task_coalescer.py).
+    """
+    handler = task_registry.get(task.get('action'))
+    if handler is None or not handler.is_read:
+        return _execute_task(task)
+
+    repo_path = find_repo_path_by_name((task.get('params') or {}).get('repo_name'))
+    fingerprint = heartbeat_fingerprint(repo_path) if repo_path else None
+    return task_coalescer.run(task, fingerprint, _execute_task)
+
+def _execute_task(task):
+    results = []
+
+    logger.debug(f"Task details: {task}")
+    action = task.get('action')
+    params = task.get('params', {})
+    repo_name = params.get('repo_name')
+
+    handler = task_registry.get(action)
+    if handler is None:
+        logger.warning(f"Unknown action: {action}")
+        results.append({"task_id": task['id'], "result": None, "error": f"Unknown action: {action}"})
+        return results
+
+    if handler.needs_repo:
+        repo_path = find_repo_path_by_name(repo_name)
+
+        if not repo_path:
+            logger.warning(f"Repo {repo_name} not found")
+            results.append({"task_id": task['id'], "result": None, "error": f"Repo {repo_name} not found"})
+            return results
+    else:
+        repo_path = None
+
+    task_result = {"task_id": task['id'], 'repo_name': repo_name}
+    needs_status_refresh = handler.changes_status
+    needs_heads_refresh = handler.changes_heads
+    needs_full_sync = handler.full_sync
+
+    # Capture old/previous remote heads
+    if needs_heads_refresh:
+        task["previous_remote_heads"] = git_utils.get_remote_heads(repo_path) or {}
+
+    start = time.monotonic()
+    try:
+        with git_executor.deadline(handler.timeout):
+            finished = handler(task, params, repo_name, repo_path, task_result, results)
+    except Exception:
+        task_registry.record(action, time.monotonic() - start, ok=False)
+        raise
+    task_registry.record(action, time.monotonic() - start, ok=finished is None and not task_result.get("error"))
+    if finished is not None:
+        return finished
+
+    # Handlers that create the repository report where it ended up
+    repo_path = task.get("resolved_repo_path", repo_path)
 
-        # === AUTO-REFRESH AHEADS AND BEHIND ON HEADS-CHANGING ACTIONS: Check if remote_heads changed ===
+    # === AUTO-REFRESH AHEADS AND BEHIND ON HEADS-CHANGING ACTIONS: Check if remote_heads changed ===
 
-        if needs_heads_refresh or needs_status_refresh:
-            remote_heads_details = git_utils.get_remote_heads_details(repo_path)
-            remote_heads = remote_heads_details.get("canonical_heads", {})
+    if needs_status_refresh:
+        status_cache.invalidate(repo_path)
 
-        if needs_heads_refresh:
-            ahead, behind = git_utils.get_ahead_behind(repo_path)
+    if action in ("push", "pull"):
+        # We just changed (or fetched from) the remote: cached heads are stale
+        git_utils.invalidate_remote_heads(repo_path)
+
+    if needs_heads_refresh or needs_status_refresh:
+        remote_heads_details = git_utils.get_remote_heads_details(repo_path)
+        remote_heads = remote_heads_details.get("canonical_heads", {})
+
+    if needs_heads_refresh:
+        lastmod_index.update(repo_path)
+        ahead, behind = git_utils.get_ahead_behind(repo_path)
+        if "result" not in task_result:
+            task_result["result"] = {}
+        task_result["result"]["ahead"] = ahead
+        task_result["result"]["behind"] = behind
+        task_result["result"]["remote_heads_meta"] = remote_heads_details
+
+        # Compare with what we had before this task
+        old_remote_heads = task.get("previous_remote_heads") or {}
+
+        if remote_heads != old_remote_heads:
+            logger.info(f"Remote heads changed for {repo_name} -> broadcasting to other devices")
+
+            # Attach to result — this triggers broadcast on Stargit
+            task_result["result"]["broadcast_remote_heads"] = {
+                "repo_name": repo_name,
+                "remote_heads": remote_heads
+            }
+
+    # === AUTO-REFRESH STATUS ON STATUS-CHANGING ACTIONS ===
+    if needs_status_refresh:
+        fresh_status, status_error = get_git_status_data(repo_path)
+
+        if status_error:
+            logger.warning(f"Failed to refresh status after {action}: {status_error}")
+        else:
+            # Attach fresh status — Stargit will update DB instantly
             if "result" not in task_result:
                 task_result["result"] = {}
-            task_result["result"]["ahead"] = ahead
-            task_result["result"]["behind"] = behind
+            task_result["result"]["repo_status"] = fresh_status
+            task_result["result"]["remote_heads"] = remote_heads  # ← This is gold
             task_result["result"]["remote_heads_meta"] = remote_heads_details
+            logger.debug(f"Fresh status attached after {action}")
 
-            # Compare with what we had before this task
-            old_remote_heads = task.get("previous_remote_heads") or {}
+    if needs_full_sync:
+        sync_result = full_sync(repo_path, repo_name)
 
-            if remote_heads != old_remote_heads:
-                logger.info(f"Remote heads changed for {repo_name} -> broadcasting to other devices")
+        task_result["result"]["repo_status"] = sync_result["status"]
+        task_result["result"]["remote_heads"] = sync_result["remote_heads"]
+        task_result["result"]["remote_heads_meta"] = sync_result.get("remote_heads_meta", {})
 
-                # Attach to result — this triggers broadcast on Stargit
-                task_result["result"]["broadcast_remote_heads"] = {
-                    "repo_name": repo_name,
-                    "remote_heads": remote_heads
-                }
+        task_result["result"]["branches"] = sync_result["branches"]
+        task_result["result"]["remotes"] = sync_result["remotes"]
+        task_result["result"]["description"] = sync_result["description"]
+        task_result["result"]["new_commits"] = sync_result["commits"]
+        task_result["result"]["files"] = sync_result["files"]
+        task_result["result"]["storage_size"] = sync_result["storage_size"]
+        task_result["result"]["readme"] = sync_result["readme"]
 
-        # === AUTO-REFRESH STATUS ON STATUS-CHANGING ACTIONS ===
-        if needs_status_refresh:
-            fresh_status, status_error = get_git_status_data(repo_path)
-            
-            if status_error:
-                logger.warning(f"Failed to refresh status after {action}: {status_error}")
-            else:
-                # Attach fresh status — Stargit will update DB instantly
-                if "result" not in task_result:
-                    task_result["result"] = {}
-                task_result["result"]["repo_status"] = fresh_status
-                task_result["result"]["remote_heads"] = remote_heads  # ← This is gold
-                task_result["result"]["remote_heads_meta"] = remote_heads_details
-                logger.debug(f"Fresh status attached after {action}")
-
-        if needs_full_sync:
-            sync_result = full_sync(repo_path, repo_name)
-    
-            task_result["result"]["repo_status"] = sync_result["status"]
-            task_result["result"]["remote_heads"] = sync_result["remote_heads"]
-            task_result["result"]["remote_heads_meta"] = sync_result.get("remote_heads_meta", {})
-
-            task_result["result"]["branches"] = sync_result["branches"]
-            task_result["result"]["remotes"] = sync_result["remotes"]
-            task_result["result"]["description"] = sync_result["description"]
-            task_result["result"]["new_commits"] = sync_result["commits"]
-            task_result["result"]["files"] = sync_result["files"]
-            task_result["result"]["storage_size"] = sync_result["storage_size"]
-            task_result["result"]["readme"] = sync_result["readme"]
-            
 
 
-        results.append(task_result)
-    
+    results.append(task_result)
+    return results
+
+# Process tasks from poll response: different repos in parallel, same repo in order
+def process_tasks(tasks, on_results=None):
+    logger.debug(f"Processing {len(tasks)} tasks")
+    results = task_executor.run_tasks(tasks, process_task, on_results)
     logger.debug(f"Processed results: {results}")
     return results
 
@@ -4087,22 +4361,33 @@ def process_tasks(tasks):
 #
 
 # Poll function (reuses your access_token logic)
-def poll_for_tasks(results=None):
+def poll_for_tasks(results=None, wait_seconds=0):
+    tasks, _ = poll_for_tasks_ex(results, wait_seconds)
+    return tasks
+
+def _poll_request(results=None, wait_seconds=0):
+    """
+    One poll request. With wait_seconds the server may hold it open
+    (long poll) until tasks arrive. Returns (tasks, held): held is True
+    if the server honoured the wait. Raises on failure; see
+    http_client.not_sent() for whether it is safe to send again.
+    """
     verbose = True
     if verbose:
         logger.debug("Polling for tasks")
-    if not STARGIT_API_KEY:
-        return []
-    access_token = get_access_token()
+    access_token = get_access_token() if STARGIT_API_KEY else None
     if not access_token or not SERVER_UUID:
-        logger.error("No valid access token or server UUID for poll")
-        return []
+        raise http_client.NotSent("No valid access token or server UUID for poll")
     payload = {
         "server_uuid": SERVER_UUID,
         "event_type": "poll",
         "timestamp": time.time(),
         "results": results or []
     }
+    timeout = None
+    if wait_seconds:
+        payload["wait_seconds"] = wait_seconds
+        timeout = wait_seconds + 15
     
     if verbose:
         logger.debug(f"Sending payload: {payload}")
@@ -4111,35 +4396,48 @@ def poll_for_tasks(results=None):
         "Content-Type": "application/json"
     }
     endpoint = POLL_ENDPOINT
-    try:
-        response = requests.post(endpoint, json=payload, headers=headers)
-        
+    response = http_client.post(endpoint, endpoint="poll", json=payload, headers=headers, timeout=timeout,
+                                compress=bool(results), payload_type="poll_results" if results else "poll")
+    
+    if verbose:
+        logger.debug(f"Response status: {response.status_code}, body: {response.text}")
+    if response.status_code == 200:
+        data = response.json()
+        tasks = data.get('tasks', [])
         if verbose:
-            logger.debug(f"Response status: {response.status_code}, body: {response.text}")
-        if response.status_code == 200:
-            data = response.json()
-            tasks = data.get('tasks', [])
-            if verbose:
-                logger.debug(f"Received {len(tasks)} tasks: {tasks}")
-            return tasks
-        elif response.status_code == 401:
-            logger.warning("Token invalid; refreshing")
-            tokens['access_token'] = None
-            access_token = get_access_token()
-            if access_token:
-                headers["Authorization"] = f"Bearer {access_token}"
-                response = requests.post(endpoint, json=payload, headers=headers)
-                logger.debug(f"Retry status: {response.status_code}, body: {response.text}")
-                if response.status_code == 200:
-                    data = response.json()
-                    tasks = data.get('tasks', [])
-                    logger.debug(f"Received {len(tasks)} tasks after retry: {tasks}")
-                    return tasks
-        logger.error(f"Poll failed: {response.text} (status: {response.status_code})")
-        return []
+            logger.debug(f"Received {len(tasks)} tasks: {tasks}")
+        return tasks, bool(data.get('long_poll'))
+    elif response.status_code == 401:
+        # Rejected before processing: safe to send again with a fresh token
+        logger.warning("Token invalid; refreshing")
+        tokens['access_token'] = None
+        access_token = get_access_token()
+        if access_token:
+            headers["Authorization"] = f"Bearer {access_token}"
+            response = http_client.post(endpoint, endpoint="poll", json=payload, headers=headers, timeout=timeout,
+                                        compress=bool(results), payload_type="poll_results" if results else "poll")
+            logger.debug(f"Retry status: {response.status_code}, body: {response.text}")
+            if response.status_code == 200:
+                data = response.json()
+                tasks = data.get('tasks', [])
+                logger.debug(f"Received {len(tasks)} tasks after retry: {tasks}")
+                return tasks, bool(data.get('long_poll'))
+        if response.status_code == 401:
+            raise http_client.NotSent(f"Poll unauthorized: {response.text}")
+    raise RuntimeError(f"Poll failed: {response.text} (status: {response.status_code})")
+
+def poll_for_tasks_ex(results=None, wait_seconds=0):
+    """
+    One poll request (see _poll_request). Returns (tasks, held): held is
+    True if the server honoured the wait, False if not, None on failure.
+    """
+    if not STARGIT_API_KEY:
+        return [], None
+    try:
+        return _poll_request(results, wait_seconds)
     except Exception as e:
         logger.error(f"Error during poll: {str(e)}")
-        return []
+        return [], None
 
 def pull_tasks():
     refresh_runtime_settings()
@@ -4164,28 +4462,40 @@ def poll_thread():
 
 # === GLOBAL POLLING CONTROL ===
 poll_thread = None
-poll_thread_active = threading.Event()  # Set when polling should run
+poll_thread_active = threading.Event()  # Set when polling should run (one Event per polling thread)
 last_successful_poll = None  # Heartbeat timestamp
 POLL_HEARTBEAT_TIMEOUT = 45  # seconds — if no poll > this, consider stalled
+poll_channel = None  # TaskChannel of the current polling thread
 
-def polling_loop():
-    global last_successful_poll
-    poll_thread_active.set()
-    logger.info("Polling loop started")
+def _poll_stall_timeout():
+    """Stall threshold: the stream's advertised keep-alives if any, else POLL_HEARTBEAT_TIMEOUT."""
+    channel = poll_channel
+    return channel.liveness_timeout(POLL_HEARTBEAT_TIMEOUT) if channel else POLL_HEARTBEAT_TIMEOUT
 
-    while poll_thread_active.is_set():
-        try:
-            pull_tasks()  # Your existing poll function
-            last_successful_poll = time.time()
-            logger.debug("Successful poll cycle")
-            logger.info("Successful poll cycle")
-        except Exception as e:
-            logger.exception("Polling loop error — will retry")
-            logger.info("Polling loop error — will retry")
-            time.sleep(5)  # backoff
+def _mark_poll_alive():
+    global last_successful_poll
+    last_successful_poll = time.time()
 
-        time.sleep(10)  # Poll interval
+def _queue_polled_tasks(tasks):
+    """Queue received tasks on their repo lanes; each result is shipped by the outbox as soon as its task finishes."""
+    logger.debug(f"Queueing {len(tasks)} tasks")
+    refresh_runtime_settings()
+    task_executor.submit(tasks, process_task, result_outbox.put)
 
+def polling_loop(active):
+    """Receive tasks over the task channel (stream / long poll / poll) while `active` is set."""
+    global poll_channel
+    logger.info("Polling loop started")
+    result_outbox.start(send=_poll_request, on_tasks=_queue_polled_tasks, on_sent=_mark_poll_alive)
+    channel = task_channel.TaskChannel(
+        poll=poll_for_tasks_ex,
+        process=_queue_polled_tasks,
+        token_getter=get_access_token,
+        stream_url=TASK_STREAM_ENDPOINT,
+        on_alive=_mark_poll_alive
+    )
+    poll_channel = channel
+    channel.run(active)
     logger.info("Polling loop stopped")
 
 def start_polling_thread():
@@ -4193,13 +4503,17 @@ def start_polling_thread():
 
     logging.info("Starting/restarting polling thread")
 
+    global poll_thread_active
+
     if poll_thread and poll_thread.is_alive():
         logger.warning("Polling thread already running — restarting")
         poll_thread_active.clear()
         poll_thread.join(timeout=5.0)
 
+    # Fresh Event: a stalled old thread that wakes up later still sees its own one cleared
+    poll_thread_active = threading.Event()
     poll_thread_active.set()
-    poll_thread = threading.Thread(target=polling_loop, daemon=True, name="StarBridge-Polling")
+    poll_thread = threading.Thread(target=polling_loop, args=(poll_thread_active,), daemon=True, name="StarBridge-Polling")
     poll_thread.start()
     logger.info("Polling thread started/restarted")
 
@@ -4215,17 +4529,22 @@ def monitor_polling_health():
         logging.debug(f"Last successful poll at: {last_successful_poll}")
         logging.debug(f"Current time: {time.time()}")
         logging.debug(f"Time since last poll: {time.time() - last_successful_poll if last_successful_poll else 'N/A'}")
-        logging.debug(f"POLL_HEARTBEAT_TIMEOUT: {POLL_HEARTBEAT_TIMEOUT}")
+        stall_timeout = _poll_stall_timeout()
+        logging.debug(f"Stall timeout: {stall_timeout}")
 
-        if last_successful_poll and (time.time() - last_successful_poll > POLL_HEARTBEAT_TIMEOUT):
-            logger.critical(f"Polling stalled for >{POLL_HEARTBEAT_TIMEOUT}s — restarting thread")
+        if last_successful_poll and (time.time() - last_successful_poll > stall_timeout):
+            logger.critical(f"Polling stalled for >{stall_timeout}s — restarting thread")
             start_polling_thread()
         time.sleep(10)  # Check every 10s
 
+# Background metrics sampler (heartbeats and /internal/stats read from it)
+metrics_sampler.start()
+
 # Start registration thread
 if STARGIT_API_KEY:
     logger.info("Loaded STARBRIDGE_SERVER_UUID: %s", SERVER_UUID)
 
+    local_ip.start_refresher()
     threading.Thread(target=registration_thread, daemon=True).start()
     
     # threading.Thread(target=poll_thread, daemon=True).start()
@@ -4243,15 +4562,35 @@ def internal_stats():
     uptime = time.time() - psutil.Process(os.getpid()).create_time()
     # Server hostname
     host_name = socket.gethostname()
+    sample = metrics_sampler.latest()
     metrics = {
         'host_name': host_name,
         'uptime_seconds': uptime,
-        'cpu_percent': psutil.cpu_percent(),
-        'memory_percent': psutil.virtual_memory().percent,
+        'cpu_percent': sample['cpu_percent'],
+        'memory_percent': sample['memory_percent'],
+        'sample': sample,
+        'git': git_executor.get_stats(),
+        'git_cache': git_cache.get_stats(),
+        'status_cache': status_cache.get_stats(),
+        'http': http_client.get_stats(),
+        'delta_upload': delta_chunks.get_stats(),
+        'tasks': task_registry.get_stats(),
+        'task_coalescing': task_coalescer.get_stats(),
+        'results': result_outbox.get_stats(),
+        'task_executor': task_executor.get_stats(),
         # Add more from your collect_server_metrics
     }
     return jsonify(metrics)
 
+@app.route('/internal/stats/history', methods=['GET'])
+def internal_stats_history():
+    """Ring buffer of background metric samples, oldest first (?seconds= limits the window)."""
+    seconds = request.args.get('seconds', type=float)
+    return jsonify({
+        'interval_seconds': metrics_sampler.INTERVAL_SECONDS,
+        'samples': metrics_sampler.history(seconds)
+    })
+
 # TODO : Secure these endpoints with authentication if exposed publicly
 @app.route('/internal/logs', methods=['GET'])
 def internal_logs():
@@ -4271,7 +4610,7 @@ def health():
     frontend_url = f"http://127.0.0.1:{frontend_port}"
 
     now = time.time()
-    polling_healthy = last_successful_poll and (now - last_successful_poll <= POLL_HEARTBEAT_TIMEOUT)
+    polling_healthy = last_successful_poll and (now - last_successful_poll <= _poll_stall_timeout())
     status = "healthy" if polling_healthy else "degraded"
 
     result = jsonify({
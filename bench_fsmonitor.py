@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# bench_fsmonitor.py
+"""
+Compare `git status` latency with and without the StarBridge fsmonitor hook.
+
+    python bench_fsmonitor.py /path/to/repo [--runs 20] [--touch]
+
+Runs its own watchdog observer + journal for the repository (StarBridge
+does not need to be running) and passes core.fsmonitor with -c, so the
+repository config is left untouched. --touch updates the mtime of one
+tracked file before every run to exercise the "something changed" path.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+import git_utils
+import fsmonitor
+
+
+class _JournalHandler(FileSystemEventHandler):
+    def __init__(self, journal):
+        self.journal = journal
+
+    def on_any_event(self, event):
+        self.journal.on_event(event)
+
+
+def _time_status(repo, config, runs, touch_path):
+    command = [git_utils.GIT_EXECUTABLE, "-C", repo]
+    for item in config:
+        command += ["-c", item]
+    command += ["status", "--porcelain"]
+
+    samples = []
+    for _ in range(runs):
+        if touch_path:
+            os.utime(touch_path)
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _report(label, samples):
+    print(f"{label:<22} median {statistics.median(samples):8.1f} ms   "
+          f"min {min(samples):8.1f} ms   max {max(samples):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("repo")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--touch", action="store_true", help="touch one tracked file before every run")
+    args = parser.parse_args()
+
+    repo = os.path.realpath(args.repo)
+    touch_path = None
+    if args.touch:
+        first = subprocess.run(
+            [git_utils.GIT_EXECUTABLE, "-C", repo, "ls-files", "-z"],
+            capture_output=True, text=True, check=True
+        ).stdout.split("\0")[0]
+        touch_path = os.path.join(repo, first) if first else None
+
+    journal = fsmonitor.FsMonitorJournal(repo)
+    observer = Observer()
+    observer.schedule(_JournalHandler(journal), repo, recursive=True)
+    observer.start()
+
+    hook_config = [f"core.fsmonitor={fsmonitor.hook_command()}", "core.fsmonitorHookVersion=2"]
+    try:
+        # Warm up: page cache for the baseline, fsmonitor token in the index for the hook
+        _time_status(repo, ["core.fsmonitor=false"], 2, None)
+        _time_status(repo, hook_config, 2, None)
+
+        baseline = _time_status(repo, ["core.fsmonitor=false"], args.runs, touch_path)
+        hooked = _time_status(repo, hook_config, args.runs, touch_path)
+    finally:
+        observer.stop()
+        observer.join()
+        journal.close()
+
+    files = subprocess.run(
+        [git_utils.GIT_EXECUTABLE, "-C", repo, "ls-files", "-z"],
+        capture_output=True, check=True
+    ).stdout.count(b"\0")
+    print(f"{repo}: {files} tracked files, {args.runs} runs{' (touching one file per run)' if touch_path else ''}")
+    _report("without fsmonitor", baseline)
+    _report("with fsmonitor hook", hooked)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+# delta_chunks.py
+"""
+Size-budgeted, resumable delta uploads for the heartbeat.
+
+A delta ({repo: {branch: {field: value}}}) whose JSON encoding fits in
+"delta_upload.chunk_bytes" is sent as a single "update", as before.
+Larger deltas are split into ordered fragments, if the server advertised
+"accept_delta_chunks" in its probe answer (see set_server_support();
+otherwise they go out whole as one "update"), and sent as:
+
+    {"mode": "update_chunk", "delta_id": ..., "seq": 0..total-1,
+     "total": n, "deltas": <fragment>}
+
+The server rebuilds the delta by deep-merging the fragments in seq
+order: dicts merge by key, lists are extended, strings are concatenated.
+Fields are packed whole while they fit; a field too large for one chunk
+is split (file and commit lists by item, diff and README text by
+character). A single list item larger than the budget is sent alone.
+
+A chunk answer may carry "next_seq" (the first seq the server is still
+missing). Undelivered chunks stay in an in-memory outbox keyed by repo.
+The next cycle resumes from the first undelivered seq, provided the
+server still asks for the same delta and the repository did not change
+since it was computed (see basis()), instead of recomputing it.
+"""
+import json
+import time
+import uuid
+import logging
+import threading
+
+import settings
+
+logger = logging.getLogger('StarBridge')
+
+CHUNK_BYTES = settings.get_nested("delta_upload", "chunk_bytes", 1024 * 1024)
+OUTBOX_TTL_SECONDS = settings.get_nested("delta_upload", "outbox_ttl_seconds", 3600)
+
+_lock = threading.Lock()
+_outbox = {}   # repo_name -> upload
+_stats = {"uploads": 0, "chunked_uploads": 0, "chunks_sent": 0, "chunks_failed": 0, "resumed": 0, "bytes": 0}
+_server_accepts_chunks = False
+
+
+def _size(value):
+    return len(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+# === Splitting ===
+def _split_text(text, budget):
+    start = 0
+    step = max(1, budget)
+    while start < len(text):
+        piece = text[start:start + step]
+        size = _size(piece)
+        while size > budget and len(piece) > 1:
+            # Escapes and multi-byte characters: shrink proportionally
+            piece = piece[:max(1, len(piece) * budget // size - 1)]
+            size = _size(piece)
+        yield piece
+        start += len(piece)
+
+
+def _split_list(items, budget):
+    current, used = [], 2
+    for item in items:
+        item_size = _size(item) + 1
+        if current and used + item_size > budget:
+            yield current
+            current, used = [], 2
+        current.append(item)
+        used += item_size
+    if current:
+        yield current
+
+
+def _split_dict(value, budget):
+    current, used = {}, 2
+    for key, item in value.items():
+        wrapper = _size({key: None}) - 4   # '{"key":}' around the value
+        item_size = _size(item) + wrapper + 1
+        if used + item_size <= budget:
+            current[key] = item
+            used += item_size
+            continue
+        if current:
+            yield current
+            current, used = {}, 2
+        if item_size <= budget:
+            current[key] = item
+            used += item_size
+            continue
+        for piece in split(item, budget - wrapper):
+            yield {key: piece}
+    if current:
+        yield current
+
+
+def split(value, budget):
+    """
+    Yield fragments of `value` that each encode to about `budget` bytes
+    or less and whose in-order deep merge (see merge()) is `value`.
+    """
+    if _size(value) <= budget:
+        yield value
+    elif isinstance(value, dict):
+        yield from _split_dict(value, budget)
+    elif isinstance(value, list):
+        yield from _split_list(value, budget)
+    elif isinstance(value, str):
+        yield from _split_text(value, budget)
+    else:
+        yield value
+
+
+def merge(base, fragment):
+    """Deep merge used by the receiver to reassemble chunks."""
+    if isinstance(base, dict) and isinstance(fragment, dict):
+        for key, item in fragment.items():
+            base[key] = merge(base[key], item) if key in base else item
+        return base
+    if isinstance(base, list) and isinstance(fragment, list):
+        return base + fragment
+    if isinstance(base, str) and isinstance(fragment, str):
+        return base + fragment
+    return fragment
+
+
+# === Uploads and outbox ===
+def set_server_support(accepts_chunks):
+    """Capability flag from the heartbeat probe answer ("accept_delta_chunks")."""
+    global _server_accepts_chunks
+    _server_accepts_chunks = bool(accepts_chunks)
+
+
+def server_accepts_chunks():
+    return _server_accepts_chunks
+
+
+def basis(branch_deltas, heads, state):
+    """
+    Identifies what a delta was computed for: the server's heads, ours and
+    the repository `state` (a change fingerprint). None when the state is
+    unknown: such uploads are never resumed.
+    """
+    if state is None:
+        return None
+    return json.dumps(
+        {"from": branch_deltas, "to": {branch: heads.get(branch) for branch in branch_deltas}, "state": state},
+        sort_keys=True,
+        default=str
+    )
+
+
+def plan(repo_name, deltas, basis=None, chunk_bytes=None):
+    """Split `deltas` into an upload: {"delta_id", "repo", "basis", "chunks", "total", "next_seq"}."""
+    if _server_accepts_chunks:
+        chunks = list(split(deltas, chunk_bytes or CHUNK_BYTES))
+    else:
+        chunks = [deltas]   # older servers only understand a single "update"
+    return {
+        "delta_id": uuid.uuid4().hex,
+        "repo": repo_name,
+        "basis": basis,
+        "chunks": chunks,
+        "total": len(chunks),
+        "next_seq": 0,
+        "created": time.monotonic()
+    }
+
+
+def pending(repo_name, basis):
+    """Undelivered upload for the same basis, or None (stale entries are dropped)."""
+    if basis is None:
+        return None
+    with _lock:
+        upload = _outbox.get(repo_name)
+        if upload is None:
+            return None
+        if upload["basis"] != basis or time.monotonic() - upload["created"] > OUTBOX_TTL_SECONDS:
+            del _outbox[repo_name]
+            return None
+        _stats["resumed"] += 1
+        return upload
+
+
+def send(upload, post_chunk):
+    """
+    Send the remaining chunks of `upload` in order with post_chunk(fields)
+    -> response. Returns (ok, last_response). On failure the upload stays
+    in the outbox (when it has a basis) so the next cycle can resume it.
+    """
+    with _lock:
+        _stats["uploads"] += 1
+        if upload["total"] > 1:
+            _stats["chunked_uploads"] += 1
+
+    response = None
+    sends_left = 2 * upload["total"]   # bounds re-sends requested through next_seq
+    while upload["next_seq"] < upload["total"]:
+        sends_left -= 1
+        if sends_left < 0:
+            logger.warning("[%s] Delta upload %s is not converging; dropping it", upload["repo"], upload["delta_id"])
+            with _lock:
+                _outbox.pop(upload["repo"], None)
+            return False, response
+        seq = upload["next_seq"]
+        chunk = upload["chunks"][seq]
+        if upload["total"] == 1:
+            fields = {"mode": "update", "deltas": chunk}
+        else:
+            fields = {
+                "mode": "update_chunk",
+                "delta_id": upload["delta_id"],
+                "seq": seq,
+                "total": upload["total"],
+                "deltas": chunk
+            }
+
+        try:
+            response = post_chunk(fields)
+        except Exception as e:
+            logger.warning("[%s] Delta chunk %d/%d failed: %s", upload["repo"], seq + 1, upload["total"], e)
+            response = None
+
+        if response is None or response.status_code != 200:
+            with _lock:
+                _stats["chunks_failed"] += 1
+                if upload["basis"] is not None:
+                    _outbox[upload["repo"]] = upload
+            return False, response
+
+        with _lock:
+            _stats["chunks_sent"] += 1
+            _stats["bytes"] += _size(chunk)
+
+        next_seq = seq + 1
+        if upload["total"] > 1:
+            try:
+                next_seq = int(response.json().get("next_seq", next_seq))
+            except (ValueError, TypeError, AttributeError):
+                pass
+        upload["next_seq"] = max(0, min(next_seq, upload["total"]))
+
+    with _lock:
+        if _outbox.get(upload["repo"]) is upload:
+            del _outbox[upload["repo"]]
+    return True, response
+
+
+def get_stats():
+    with _lock:
+        return {**_stats, "server_accepts_chunks": _server_accepts_chunks, "outbox": {
+            repo: {"delta_id": u["delta_id"], "next_seq": u["next_seq"], "total": u["total"]}
+            for repo, u in _outbox.items()
+        }}
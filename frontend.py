@@ -417,6 +417,13 @@ def stats():
     except Exception:
         logs = 'Log endpoint unreachable'
 
+    # Fetch sampled history for the charts
+    try:
+        history_payload, history_error = backend_request('/internal/stats/history', method='GET', timeout=5)
+        history = (history_payload or {}).get('samples', []) if not history_error else []
+    except Exception:
+        history = []
+
     uptime_h = int(metrics.get('uptime_seconds', 0) // 3600)
     uptime_m = int((metrics.get('uptime_seconds', 0) % 3600) // 60)
 
@@ -426,6 +433,7 @@ def stats():
         uptime_m=uptime_m,
         cpu_percent=metrics.get('cpu_percent', 'N/A'),
         memory_percent=metrics.get('memory_percent', 'N/A'),
+        history=history,
         logs=logs,
         nav=NAV
     )
@@ -0,0 +1,191 @@
+# fsmonitor.py
+"""
+Feed the watchdog observer's filesystem events to git as a
+core.fsmonitor hook (hook protocol version 2), so `git status` and
+`git diff` only lstat paths that actually changed.
+
+StarBridge side (this module), per enabled repository:
+  .git/starbridge/fsmonitor/state.json      {"epoch", "pid", "cookie_timeout_ms"}
+  .git/starbridge/fsmonitor/journal-<epoch> "<seq> <path>\\0" records
+  .git/starbridge/fsmonitor/cookies/        sync files created by the hook
+
+Git side: fsmonitor_hook.py, invoked by git as `<hook> 2 <token>`.
+Tokens are "<epoch>:<seq>". Before answering, the hook drops a cookie file
+and waits for the watcher to journal and delete it, so every event that
+happened before the git command started is included. When StarBridge is
+not running, the epoch changed, or the cookie times out, the hook answers
+"everything changed" and git falls back to a full scan.
+
+Enable per repository with "fsmonitor.repositories" in settings.json.
+"""
+import os
+import sys
+import json
+import uuid
+import shlex
+import logging
+import threading
+from pathlib import Path
+
+import settings
+import git_utils
+import git_backend
+import git_executor
+
+logger = logging.getLogger('StarBridge')
+
+HOOK_SCRIPT = Path(__file__).resolve().parent / "fsmonitor_hook.py"
+STATE_DIR = os.path.join("starbridge", "fsmonitor")
+
+COOKIE_TIMEOUT_MS = settings.get_nested("fsmonitor", "cookie_timeout_ms", 500)
+JOURNAL_MAX_BYTES = settings.get_nested("fsmonitor", "journal_max_bytes", 8 * 1024 * 1024)
+
+
+def hook_command():
+    """Value for core.fsmonitor (git runs it through the shell)."""
+    if os.name == "nt":
+        return f'"{sys.executable}" "{HOOK_SCRIPT}"'
+    return f"{shlex.quote(sys.executable)} {shlex.quote(str(HOOK_SCRIPT))}"
+
+
+def is_enabled_for(repo_path):
+    configured = settings.get_nested("fsmonitor", "repositories", []) or []
+    real = os.path.realpath(repo_path)
+    return any(
+        entry == "*" or os.path.realpath(entry) == real or entry == os.path.basename(real)
+        for entry in configured
+    )
+
+
+class FsMonitorJournal:
+    """Append-only change journal for one work tree, written by the watchdog thread."""
+
+    def __init__(self, repo_path):
+        self.root = Path(repo_path).resolve()
+        git_dir, _ = git_backend.resolve_git_dirs(self.root)
+        git_dir = Path(git_dir).resolve()
+        if not git_dir.is_relative_to(self.root):
+            # Cookies must be created where the observer can see them
+            raise ValueError("fsmonitor needs the git directory inside the work tree")
+
+        self.state_dir = git_dir / STATE_DIR
+        self.cookie_dir = self.state_dir / "cookies"
+        self.cookie_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._file = None
+        self._rotate()
+
+    # === Journal ===
+    def _rotate(self):
+        """Start a new epoch: every token issued before it becomes invalid."""
+        old_journal = getattr(self, "journal_path", None)
+        if self._file:
+            self._file.close()
+
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.journal_path = self.state_dir / f"journal-{self.epoch}"
+        self._file = open(self.journal_path, "ab")
+
+        state = {"epoch": self.epoch, "pid": os.getpid(), "cookie_timeout_ms": COOKIE_TIMEOUT_MS}
+        tmp = self.state_dir / "state.json.tmp"
+        tmp.write_text(json.dumps(state), encoding="utf-8")
+        os.replace(tmp, self.state_dir / "state.json")
+
+        for stale in self.state_dir.glob("journal-*"):
+            if stale != self.journal_path:
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+        if old_journal:
+            logger.info("fsmonitor journal rotated for %s", self.root)
+
+    def record(self, rel_path):
+        with self._lock:
+            self.seq += 1
+            self._file.write(f"{self.seq} ".encode("utf-8") + rel_path.encode("utf-8", errors="surrogateescape") + b"\0")
+            self._file.flush()
+            if self._file.tell() > JOURNAL_MAX_BYTES:
+                self._rotate()
+
+    # === Watchdog events ===
+    def on_event(self, event):
+        for src in (event.src_path, getattr(event, "dest_path", None)):
+            if src:
+                self._on_path(Path(src), event.is_directory)
+
+    def _on_path(self, path, is_directory):
+        if path.parent == self.cookie_dir:
+            # The hook is waiting for this cookie: everything before it is journaled
+            if path.exists():
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            return
+
+        try:
+            rel = path.relative_to(self.root)
+        except ValueError:
+            return
+        if rel.parts and rel.parts[0] == ".git":
+            return
+
+        rel_path = rel.as_posix()
+        if is_directory:
+            rel_path += "/"
+        self.record(rel_path)
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+        try:
+            (self.state_dir / "state.json").unlink()
+        except OSError:
+            pass
+
+
+# === Repository configuration ===
+def _git_config(repo_path, *args):
+    return git_executor.run(
+        [git_utils.GIT_EXECUTABLE, "-C", str(repo_path), "config", *args],
+        capture_output=True,
+        text=True
+    )
+
+
+def configure(repo_path, enabled):
+    """Point core.fsmonitor at our hook, or remove it if we had set it."""
+    current = _git_config(repo_path, "--local", "--get", "core.fsmonitor").stdout.strip()
+    if enabled:
+        if current != hook_command():
+            _git_config(repo_path, "--local", "core.fsmonitor", hook_command())
+            _git_config(repo_path, "--local", "core.fsmonitorHookVersion", "2")
+            logger.info("fsmonitor hook enabled for %s", repo_path)
+    elif current and HOOK_SCRIPT.name in current:
+        _git_config(repo_path, "--local", "--unset", "core.fsmonitor")
+        _git_config(repo_path, "--local", "--unset", "core.fsmonitorHookVersion")
+        logger.info("fsmonitor hook disabled for %s", repo_path)
+
+
+def attach(repo_path):
+    """
+    Set up the journal and git config for a watched repository.
+    Returns a FsMonitorJournal, or None if fsmonitor is disabled or unsupported.
+    """
+    enabled = is_enabled_for(repo_path)
+    journal = None
+    if enabled:
+        try:
+            journal = FsMonitorJournal(repo_path)
+        except (ValueError, OSError) as e:
+            logger.warning("fsmonitor not available for %s: %s", repo_path, e)
+            enabled = False
+    try:
+        configure(repo_path, enabled)
+    except Exception as e:
+        logger.warning("Failed to configure core.fsmonitor for %s: %s", repo_path, e)
+    return journal
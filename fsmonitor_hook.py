@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# fsmonitor_hook.py
+"""
+core.fsmonitor hook (protocol version 2) backed by StarBridge's watchdog
+journal. Invoked by git from the top of the work tree as:
+
+    fsmonitor_hook.py 2 <token>
+
+Writes "<new token>\\0" followed by NUL-terminated paths changed since
+<token>, or "<new token>\\0/\\0" when it cannot tell (everything changed).
+Kept dependency-free so it starts fast; see fsmonitor.py for the writer side.
+"""
+import os
+import sys
+import json
+import time
+
+STATE_DIR = os.path.join(".git", "starbridge", "fsmonitor")
+
+
+def _process_alive(pid):
+    if os.name == "nt":
+        # os.kill() would terminate the process on Windows; rely on the cookie
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _sync_cookie(timeout_ms):
+    """Create a cookie and wait for StarBridge to journal and delete it."""
+    cookie = os.path.join(STATE_DIR, "cookies", f"{os.getpid()}-{time.monotonic_ns()}")
+    with open(cookie, "w"):
+        pass
+    deadline = time.monotonic() + timeout_ms / 1000.0
+    while time.monotonic() < deadline:
+        if not os.path.exists(cookie):
+            return True
+        time.sleep(0.002)
+    try:
+        os.unlink(cookie)
+    except OSError:
+        pass
+    return False
+
+
+def _read_journal(epoch):
+    """Return [(seq, path), ...] for the current epoch, or None if it was rotated away."""
+    try:
+        with open(os.path.join(STATE_DIR, f"journal-{epoch}"), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    records = []
+    for record in data.split(b"\0"):
+        seq, sep, path = record.partition(b" ")
+        if sep and seq.isdigit():
+            records.append((int(seq), path))
+    return records
+
+
+def _respond(token, paths):
+    out = sys.stdout.buffer
+    out.write(token.encode("utf-8") + b"\0")
+    for path in paths:
+        out.write(path + b"\0")
+    out.flush()
+    return 0
+
+
+def main(argv):
+    if len(argv) < 3 or argv[1] != "2":
+        return 1
+    last_token = argv[2]
+
+    try:
+        with open(os.path.join(STATE_DIR, "state.json"), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        epoch = state["epoch"]
+    except (OSError, ValueError, KeyError):
+        return 1  # StarBridge never ran here: git falls back to a full scan
+
+    if not _process_alive(int(state.get("pid", 0))) or not _sync_cookie(state.get("cookie_timeout_ms", 500)):
+        return _respond(f"{epoch}:0", [b"/"])
+
+    records = _read_journal(epoch)
+    if records is None:
+        return _respond(f"{epoch}:0", [b"/"])
+
+    last_seq = records[-1][0] if records else 0
+    new_token = f"{epoch}:{last_seq}"
+
+    token_epoch, _, token_seq = last_token.partition(":")
+    if token_epoch != epoch or not token_seq.isdigit() or int(token_seq) > last_seq:
+        return _respond(new_token, [b"/"])
+
+    since = int(token_seq)
+    changed = list(dict.fromkeys(path for seq, path in records if seq > since))
+    return _respond(new_token, changed)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,458 @@
+# git_backend.py
+"""
+Pluggable backends for cheap read-only repository metadata queries
+(refs, HEAD, branches, remotes).
+
+- "subprocess": runs git for every query (reference behaviour)
+- "native":     reads HEAD, loose refs, packed-refs and config in-process,
+                falling back to subprocess for anything it does not understand
+                (revision expressions, reftable, config includes, url rewrites,
+                including rewrites and remotes set in global or system config)
+
+Selected with "git_backend" in settings.json.
+"""
+import os
+import re
+import logging
+import threading
+from pathlib import Path
+
+import settings
+import git_utils
+import git_executor
+import git_cache
+
+logger = logging.getLogger('StarBridge')
+
+HEX_RE = re.compile(r"^[0-9a-f]{4,64}$")
+OID_RE = re.compile(r"^[0-9a-f]{40}([0-9a-f]{24})?$")
+
+# Same order git uses to expand a short ref name (refs.c: ref_rev_parse_rules)
+REV_PARSE_RULES = [
+    "{}",
+    "refs/{}",
+    "refs/tags/{}",
+    "refs/heads/{}",
+    "refs/remotes/{}",
+    "refs/remotes/{}/HEAD",
+]
+# %(refname:short) never shortens to the "<remote>/HEAD" form
+SHORTEN_RULES = REV_PARSE_RULES[:-1]
+
+
+def resolve_git_dirs(repo_path):
+    """
+    Return (git_dir, common_dir) for a work tree, linked worktree or bare repo
+    without running git. Raises ValueError if the layout is not recognized.
+    """
+    root = Path(repo_path)
+    dotgit = root / ".git"
+    if dotgit.is_dir():
+        git_dir = dotgit
+    elif dotgit.is_file():
+        content = dotgit.read_text(encoding="utf-8").strip()
+        if not content.startswith("gitdir:"):
+            raise ValueError("unrecognized .git file")
+        git_dir = (root / content[len("gitdir:"):].strip()).resolve()
+    elif (root / "HEAD").is_file() and (root / "objects").is_dir():
+        git_dir = root
+    else:
+        raise ValueError("not a git repository")
+
+    common_dir = git_dir
+    commondir_file = git_dir / "commondir"
+    if commondir_file.is_file():
+        common_dir = (git_dir / commondir_file.read_text(encoding="utf-8").strip()).resolve()
+    return git_dir, common_dir
+
+
+class SubprocessBackend:
+    name = "subprocess"
+
+    def _git(self, repo_path, *args):
+        # Every query here is ref/config-derived, so results stay valid
+        # until the repository fingerprint changes.
+        return git_cache.get_or_compute(repo_path, ("backend",) + args, lambda: self._run(repo_path, *args))
+
+    def _run(self, repo_path, *args):
+        result = git_executor.run(
+            [git_utils.GIT_EXECUTABLE, "-C", str(repo_path), *args],
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="replace"
+        )
+        return result.returncode, result.stdout
+
+    def show_ref(self, repo_path):
+        """Return [(sha, refname), ...] for all refs, like `git show-ref`."""
+        code, out = self._git(repo_path, "show-ref")
+        refs = []
+        if code != 0:
+            return refs
+        for line in out.splitlines():
+            if " " in line:
+                sha, name = line.split(" ", 1)
+                refs.append((sha, name))
+        return refs
+
+    def rev_parse(self, repo_path, ref):
+        """Resolve `ref` to an object id like `git rev-parse --verify`, or None."""
+        code, out = self._git(repo_path, "rev-parse", "--verify", "--quiet", ref)
+        out = out.strip()
+        return out if code == 0 and out else None
+
+    def symbolic_ref(self, repo_path):
+        """Return the full ref HEAD points to (e.g. "refs/heads/main"), or None when detached."""
+        code, out = self._git(repo_path, "symbolic-ref", "-q", "HEAD")
+        out = out.strip()
+        return out if code == 0 and out else None
+
+    def branches(self, repo_path, remote=False):
+        """Return short branch names like `git branch [-r] --format %(refname:short)`."""
+        args = ["branch", "--format", "%(refname:short)"]
+        if remote:
+            args.insert(1, "-r")
+        code, out = self._git(repo_path, *args)
+        if code != 0:
+            return []
+        return [b.strip() for b in out.splitlines() if b.strip()]
+
+    def remotes(self, repo_path):
+        """Return [(name, url, "fetch"|"push"), ...] like `git remote -v`."""
+        code, out = self._git(repo_path, "remote", "-v")
+        entries = []
+        if code != 0:
+            return entries
+        for line in out.splitlines():
+            # "<name>\t<url> (fetch)" - urls may contain spaces
+            if "\t" not in line or " " not in line:
+                continue
+            name, rest = line.split("\t", 1)
+            url, typ = rest.rsplit(" ", 1)
+            entries.append((name, url, typ.strip("()")))
+        return entries
+
+
+class _Unsupported(Exception):
+    """Repository layout or query the native reader does not handle."""
+
+
+class NativeBackend(SubprocessBackend):
+    name = "native"
+
+    # Global/system settings that change what `git remote -v` reports
+    OUTER_CONFIG_RE = r"^(url\..*\.(push)?insteadof|remote\..*|include\..*|includeif\..*)$"
+
+    def __init__(self):
+        self._outer = None   # (config files key, reason to fall back or None)
+        self._outer_lock = threading.Lock()
+
+    # === Repository layout ===
+    def _git_dirs(self, repo_path):
+        """Return (git_dir, common_dir) for a work tree, linked worktree or bare repo."""
+        try:
+            git_dir, common_dir = resolve_git_dirs(repo_path)
+        except ValueError as e:
+            raise _Unsupported(str(e))
+
+        if (common_dir / "reftable").exists():
+            raise _Unsupported("reftable ref storage")
+        return git_dir, common_dir
+
+    # === Refs ===
+    def _packed_refs(self, common_dir):
+        refs = {}
+        try:
+            with open(common_dir / "packed-refs", "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line or line[0] in "#^":
+                        continue
+                    parts = line.rstrip("\n").split(" ", 1)
+                    if len(parts) == 2:
+                        refs[parts[1]] = parts[0]
+        except FileNotFoundError:
+            pass
+        return refs
+
+    def _loose_refs(self, common_dir):
+        refs = {}
+        refs_dir = common_dir / "refs"
+        for root, _, files in os.walk(refs_dir):
+            for name in files:
+                if name.endswith(".lock"):
+                    continue
+                full = os.path.join(root, name)
+                refname = "refs/" + os.path.relpath(full, refs_dir).replace(os.sep, "/")
+                value = self._read_ref_file(full)
+                if value is not None:
+                    refs[refname] = value
+        return refs
+
+    def _read_ref_file(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.readline().strip()
+        except (OSError, UnicodeDecodeError):
+            return None
+        if value.startswith("ref: ") or OID_RE.match(value):
+            return value
+        return None
+
+    def _all_refs(self, common_dir):
+        """Return {refname: raw value} with loose refs overriding packed ones."""
+        refs = self._packed_refs(common_dir)
+        refs.update(self._loose_refs(common_dir))
+        return refs
+
+    def _resolve(self, git_dir, common_dir, refname, refs=None, depth=0):
+        """Follow a (possibly symbolic) ref to an object id, or None."""
+        if depth > 5:
+            return None
+        if refname.startswith("refs/"):
+            if refs is not None:
+                value = refs.get(refname)
+            else:
+                value = self._read_ref_file(common_dir / refname)
+                if value is None:
+                    value = self._packed_refs(common_dir).get(refname)
+        else:
+            value = self._read_ref_file(git_dir / refname)
+        if value is None:
+            return None
+        if value.startswith("ref: "):
+            return self._resolve(git_dir, common_dir, value[5:].strip(), refs, depth + 1)
+        return value
+
+    def show_ref(self, repo_path):
+        try:
+            git_dir, common_dir = self._git_dirs(repo_path)
+        except _Unsupported:
+            return super().show_ref(repo_path)
+        refs = self._all_refs(common_dir)
+        resolved = []
+        for name in sorted(refs):
+            sha = self._resolve(git_dir, common_dir, name, refs)
+            if sha:
+                resolved.append((sha, name))
+        return resolved
+
+    def rev_parse(self, repo_path, ref):
+        if not ref or not re.match(r"^[A-Za-z0-9._/-]+$", ref) or ".." in ref or OID_RE.match(ref):
+            return super().rev_parse(repo_path, ref)
+        try:
+            git_dir, common_dir = self._git_dirs(repo_path)
+        except _Unsupported:
+            return super().rev_parse(repo_path, ref)
+
+        if ref == "HEAD":
+            return self._resolve(git_dir, common_dir, "HEAD")
+        if ref.isupper() or ref.startswith("refs/"):
+            # Pseudo refs (FETCH_HEAD, ORIG_HEAD, ...) and full names are left to git
+            return super().rev_parse(repo_path, ref)
+
+        refs = self._all_refs(common_dir)
+        for rule in REV_PARSE_RULES[1:]:
+            candidate = rule.format(ref)
+            if candidate in refs:
+                return self._resolve(git_dir, common_dir, candidate, refs)
+
+        if HEX_RE.match(ref):
+            # Abbreviated object id: needs the object database
+            return super().rev_parse(repo_path, ref)
+        return None
+
+    def symbolic_ref(self, repo_path):
+        try:
+            git_dir, _ = self._git_dirs(repo_path)
+        except _Unsupported:
+            return super().symbolic_ref(repo_path)
+        value = self._read_ref_file(git_dir / "HEAD")
+        if value and value.startswith("ref: "):
+            return value[5:].strip()
+        return None
+
+    def _shorten(self, git_dir, refname, names):
+        """Port of git's shorten_unambiguous_ref (non-strict)."""
+        for i in range(len(SHORTEN_RULES) - 1, 0, -1):
+            prefix, suffix = SHORTEN_RULES[i].split("{}")
+            if not (refname.startswith(prefix) and refname.endswith(suffix)):
+                continue
+            short = refname[len(prefix):len(refname) - len(suffix)]
+            if not short:
+                continue
+            ambiguous = False
+            for j in range(i):
+                other = SHORTEN_RULES[j].format(short)
+                if j == 0:
+                    ambiguous = (git_dir / other).is_file()
+                else:
+                    ambiguous = other in names
+                if ambiguous:
+                    break
+            if not ambiguous:
+                return short
+        return refname
+
+    def branches(self, repo_path, remote=False):
+        try:
+            git_dir, common_dir = self._git_dirs(repo_path)
+        except _Unsupported:
+            return super().branches(repo_path, remote)
+        refs = self._all_refs(common_dir)
+        prefix = "refs/remotes/" if remote else "refs/heads/"
+        names = set(refs)
+        return [
+            self._shorten(git_dir, name, names)
+            for name in sorted(refs)
+            if name.startswith(prefix) and self._resolve(git_dir, common_dir, name, refs)
+        ]
+
+    # === Config ===
+    def _read_config_remotes(self, common_dir):
+        """Parse remote.<name>.url / pushurl from the repository config."""
+        try:
+            with open(common_dir / "config", "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return {}
+
+        remotes = {}
+        section = None
+        subsection = None
+        for raw in lines:
+            line = raw.strip()
+            if not line or line[0] in "#;":
+                continue
+            if line.startswith("["):
+                m = re.match(r'^\[\s*([A-Za-z0-9.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]', line)
+                if not m:
+                    raise _Unsupported("unparsed config section")
+                section = m.group(1).lower()
+                subsection = re.sub(r"\\(.)", r"\1", m.group(2)) if m.group(2) is not None else None
+                if section in ("include", "includeif") or (section.startswith("remote.")):
+                    raise _Unsupported("config includes / legacy remote sections")
+                if section == "remote" and subsection is not None:
+                    remotes.setdefault(subsection, {"url": [], "pushurl": []})
+                line = line[m.end():].strip()
+                if not line or line[0] in "#;":
+                    continue
+
+            if "=" in line:
+                key, value = line.split("=", 1)
+            else:
+                key, value = line, "true"
+            key = key.strip().lower()
+            if line.endswith("\\"):
+                raise _Unsupported("continued config value")
+            if key in ("insteadof", "pushinsteadof"):
+                raise _Unsupported("url rewrites")
+            if section == "remote" and subsection is not None and key in ("url", "pushurl"):
+                remotes[subsection][key].append(self._config_value(value))
+        return remotes
+
+    def _config_value(self, value):
+        out = []
+        quoted = False
+        i = 0
+        value = value.strip()
+        while i < len(value):
+            c = value[i]
+            if c == '"':
+                quoted = not quoted
+            elif c == "\\" and i + 1 < len(value):
+                i += 1
+                out.append({"n": "\n", "t": "\t", "b": "\b"}.get(value[i], value[i]))
+            elif c in "#;" and not quoted:
+                break
+            else:
+                out.append(c)
+            i += 1
+        return "".join(out).strip()
+
+    def _outer_config_key(self):
+        home = Path.home()
+        xdg = os.environ.get("XDG_CONFIG_HOME") or str(home / ".config")
+        files = [
+            os.environ.get("GIT_CONFIG_GLOBAL") or str(home / ".gitconfig"),
+            os.path.join(xdg, "git", "config"),
+            os.environ.get("GIT_CONFIG_SYSTEM") or "/etc/gitconfig",
+        ]
+        stats = []
+        for path in files:
+            try:
+                st = os.stat(path)
+                stats.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stats.append((path, None, None))
+        return git_utils.GIT_EXECUTABLE, os.environ.get("GIT_CONFIG_NOSYSTEM"), tuple(stats)
+
+    def _scan_outer_config(self):
+        """Why global/system config rules out the native reader, or None."""
+        for scope in ("--system", "--global"):
+            result = git_executor.run(
+                [git_utils.GIT_EXECUTABLE, "config", scope, "--name-only", "--get-regexp", self.OUTER_CONFIG_RE],
+                capture_output=True,
+                text=True,
+                encoding="utf-8",
+                errors="replace"
+            )
+            if result.returncode == 0:
+                return f"{scope[2:]} config sets {result.stdout.split()[0]}"
+            if result.returncode != 1:
+                return f"unreadable {scope[2:]} config"
+        return None
+
+    def _check_outer_config(self):
+        """
+        Raise _Unsupported if global or system config (or config passed in
+        the environment) may rewrite remote URLs or add remotes. Rescanned
+        whenever the global config files or the system config change.
+        """
+        if os.environ.get("GIT_CONFIG_COUNT") or os.environ.get("GIT_CONFIG_PARAMETERS"):
+            raise _Unsupported("config from the environment")
+        key = self._outer_config_key()
+        with self._outer_lock:
+            if self._outer is None or self._outer[0] != key:
+                self._outer = (key, self._scan_outer_config())
+            reason = self._outer[1]
+        if reason:
+            raise _Unsupported(reason)
+
+    def remotes(self, repo_path):
+        try:
+            self._check_outer_config()
+            _, common_dir = self._git_dirs(repo_path)
+            if any((common_dir / legacy).is_dir() and os.listdir(common_dir / legacy)
+                   for legacy in ("remotes", "branches")):
+                raise _Unsupported("legacy remotes/branches files")
+            config = self._read_config_remotes(common_dir)
+        except _Unsupported as e:
+            logger.debug("native remotes fallback for %s: %s", repo_path, e)
+            return super().remotes(repo_path)
+
+        entries = []
+        for name in sorted(config):
+            urls = config[name]["url"]
+            if not urls:
+                continue
+            entries.append((name, urls[0], "fetch"))
+            for url in config[name]["pushurl"] or urls:
+                entries.append((name, url, "push"))
+        return entries
+
+
+_BACKENDS = {
+    "subprocess": SubprocessBackend(),
+    "native": NativeBackend(),
+}
+
+
+def get_backend():
+    """Return the backend selected by settings.json ("git_backend")."""
+    name = settings.get("git_backend", "native")
+    backend = _BACKENDS.get(name)
+    if backend is None:
+        logger.warning("Unknown git_backend '%s'; using subprocess", name)
+        backend = _BACKENDS["subprocess"]
+    return backend
@@ -0,0 +1,182 @@
+# git_cache.py
+"""
+In-memory cache for read-only git query results.
+
+Entries are keyed by (repo, argv) and stamped with a repository fingerprint
+built from stat() of HEAD, index, config, packed-refs and every directory
+under refs/. Git updates refs through lockfile + rename, so any ref, HEAD,
+index or config change moves at least one of those mtimes and the stale
+entry is recomputed on the next lookup. Nothing is invalidated by time.
+
+The cache is bounded by an LRU byte budget ("git_cache.max_bytes").
+Callers get their own copy of a cached value, so mutating a result never
+changes what later lookups see.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+import settings
+import git_backend
+
+logger = logging.getLogger('StarBridge')
+
+ENABLED = settings.get_nested("git_cache", "enabled", True)
+MAX_BYTES = settings.get_nested("git_cache", "max_bytes", 64 * 1024 * 1024)
+
+_lock = threading.Lock()
+_entries = OrderedDict()   # (repo, key) -> (fingerprint, value, size)
+_bytes = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "uncacheable": 0}
+
+# Like git's "racily clean" index entries: a file modified within this window
+# may change again without its mtime moving on coarse-grained filesystems.
+RACY_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def fingerprint(repo_path):
+    """
+    Cheap snapshot of everything a ref-derived query depends on.
+    Returns None if the repository layout cannot be resolved (never cached).
+    """
+    try:
+        git_dir, common_dir = git_backend.resolve_git_dirs(repo_path)
+    except (ValueError, OSError):
+        return None
+
+    paths = [
+        os.path.join(git_dir, "HEAD"),
+        os.path.join(git_dir, "index"),
+        os.path.join(common_dir, "config"),
+        os.path.join(common_dir, "packed-refs"),
+        os.path.join(common_dir, "reftable", "tables.list"),
+    ]
+    for root, dirs, _ in os.walk(os.path.join(common_dir, "refs")):
+        dirs.sort()
+        paths.append(root)
+    parts = [(path, _stat(path)) for path in paths]
+    return tuple(parts)
+
+
+def _is_racy(fp):
+    now = time.time_ns()
+    for _, st in fp:
+        if st and now - st[0] < RACY_WINDOW_NS:
+            return True
+    return False
+
+
+def _sizeof(value):
+    """Approximate memory held by a cached value, containers included."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    elif isinstance(value, (tuple, list, set, frozenset)):
+        size += sum(_sizeof(v) for v in value)
+    return size
+
+
+def _copy(value):
+    """
+    Copy the mutable containers of a cached value (dicts, lists, sets);
+    immutable leaves are shared. Cheaper than copy.deepcopy for the
+    plain data the cache holds.
+    """
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    if isinstance(value, set):
+        return {_copy(v) for v in value}
+    return value
+
+
+def _evict_locked():
+    global _bytes
+    while _bytes > MAX_BYTES and _entries:
+        _, (_, _, size) = _entries.popitem(last=False)
+        _bytes -= size
+        _stats["evictions"] += 1
+
+
+def get_or_compute(repo_path, key, compute, cacheable=None):
+    """
+    Return the cached result of `compute()` for (repo_path, key) if the
+    repository fingerprint has not changed, otherwise compute and store it.
+    `cacheable(value)` may veto storing a result (e.g. errors).
+    The caller owns the returned value; the cache keeps a separate copy.
+    """
+    if not ENABLED:
+        return compute()
+
+    global _bytes
+    repo = os.path.abspath(str(repo_path))
+    cache_key = (repo, tuple(str(k) for k in key))
+    fp = fingerprint(repo)
+
+    if fp is not None:
+        with _lock:
+            entry = _entries.get(cache_key)
+            if entry is not None and entry[0] == fp:
+                _entries.move_to_end(cache_key)
+                _stats["hits"] += 1
+            else:
+                entry = None
+                _stats["misses"] += 1
+        if entry is not None:
+            # Copied outside the lock: the stored value itself is never mutated
+            return _copy(entry[1])
+
+    # Fingerprint is taken before computing: a change racing the query
+    # leaves a stale stamp and forces a recompute next time.
+    value = compute()
+
+    if fp is None or _is_racy(fp) or (cacheable is not None and not cacheable(value)):
+        with _lock:
+            _stats["uncacheable"] += 1
+        return value
+
+    size = _sizeof(value)
+    if size > MAX_BYTES:
+        return value
+
+    with _lock:
+        old = _entries.pop(cache_key, None)
+        if old is not None:
+            _bytes -= old[2]
+        _entries[cache_key] = (fp, _copy(value), size)
+        _bytes += size
+        _evict_locked()
+    return value
+
+
+def invalidate(repo_path=None):
+    """Drop entries for one repo, or everything."""
+    global _bytes
+    repo = os.path.abspath(str(repo_path)) if repo_path else None
+    with _lock:
+        for cache_key in [k for k in _entries if repo is None or k[0] == repo]:
+            _bytes -= _entries.pop(cache_key)[2]
+
+
+def get_stats():
+    with _lock:
+        return {
+            **_stats,
+            "entries": len(_entries),
+            "bytes": _bytes,
+            "max_bytes": MAX_BYTES
+        }
@@ -0,0 +1,310 @@
+# git_cat_file.py
+import atexit
+import logging
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+import settings
+import git_utils
+import git_executor
+
+logger = logging.getLogger('StarBridge')
+
+OBJECT_TYPES = {"blob", "tree", "commit", "tag"}
+
+
+class CatFileError(Exception):
+    """Raised when a cat-file worker cannot serve a request (even after a restart)."""
+
+
+class CatFileTimeout(CatFileError):
+    """Raised when a cat-file worker does not answer within the read timeout or deadline."""
+
+
+class _CatFileProcess:
+    """
+    One long-lived `git cat-file --batch` (or `--batch-check`) process.
+    Requests are written as "<spec>\\n" on stdin and answered on stdout, so
+    a read is a pipe round-trip instead of a fork+exec.
+    """
+
+    def __init__(self, repo_path, mode):
+        self.repo_path = repo_path
+        self.mode = mode
+        self.git = git_utils.GIT_EXECUTABLE
+        self.last_used = time.monotonic()
+        self.timed_out = False   # set by the pool's watchdog when it kills the process
+        self.proc = subprocess.Popen(
+            [self.git, "-C", repo_path, "cat-file", mode],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def request(self, spec):
+        """
+        Returns (sha, obj_type, size, content) or None if the object is missing.
+        content is None in --batch-check mode.
+        """
+        self.last_used = time.monotonic()
+        self.proc.stdin.write(spec.encode("utf-8") + b"\n")
+        self.proc.stdin.flush()
+
+        header = self.proc.stdout.readline()
+        if not header:
+            raise CatFileError(f"cat-file {self.mode} exited for {self.repo_path}")
+
+        header = header.decode("utf-8", errors="replace").rstrip("\n")
+        parts = header.split(" ")
+        if len(parts) != 3 or parts[1] not in OBJECT_TYPES or not parts[2].isdigit():
+            # "<spec> missing" / "<spec> ambiguous"
+            return None
+
+        sha, obj_type, size = parts[0], parts[1], int(parts[2])
+        content = None
+        if self.mode == "--batch":
+            content = self._read_exact(size)
+            self._read_exact(1)  # trailing LF
+        return sha, obj_type, size, content
+
+    def _read_exact(self, size):
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            chunk = self.proc.stdout.read(remaining)
+            if not chunk:
+                raise CatFileError(f"cat-file {self.mode} closed mid-object for {self.repo_path}")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        try:
+            if self.proc.stdin:
+                self.proc.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.proc.kill()
+
+
+class CatFilePool:
+    """
+    Per-repository pool of cat-file workers.
+    - up to `workers_per_repo` processes per (repo, mode)
+    - dead workers are replaced and the request retried once
+    - workers idle for longer than `idle_timeout` are reaped in the background
+    - a request not answered within `read_timeout` (or what is left of the
+      thread's git_executor.deadline() block) is killed by a watchdog
+      thread; the worker is discarded and CatFileTimeout raised, no retry
+    """
+
+    def __init__(self, workers_per_repo=2, idle_timeout=300, read_timeout=30):
+        self.workers_per_repo = max(1, int(workers_per_repo))
+        self.idle_timeout = idle_timeout
+        self.read_timeout = read_timeout
+        self._cond = threading.Condition()
+        self._idle = {}     # (repo, mode) -> [workers]
+        self._counts = {}   # (repo, mode) -> live worker count
+        self._reaper = None
+        self._closed = False
+        self._watch_cond = threading.Condition()
+        self._busy = {}     # worker -> monotonic time its request expires
+        self._wake_at = None
+        self._watchdog = None
+
+    def _checkout(self, key):
+        with self._cond:
+            self._start_reaper()
+            while True:
+                idle = self._idle.get(key)
+                while idle:
+                    worker = idle.pop()
+                    if worker.alive() and worker.git == git_utils.GIT_EXECUTABLE:
+                        return worker
+                    # Crashed or stale executable: drop and replace
+                    self._counts[key] -= 1
+                    worker.close()
+                if self._counts.get(key, 0) < self.workers_per_repo:
+                    self._counts[key] = self._counts.get(key, 0) + 1
+                    break
+                self._cond.wait()
+
+        try:
+            return _CatFileProcess(key[0], key[1])
+        except Exception:
+            self._discard(key, None)
+            raise
+
+    def _checkin(self, key, worker):
+        with self._cond:
+            self._idle.setdefault(key, []).append(worker)
+            self._cond.notify()
+
+    def _discard(self, key, worker):
+        if worker:
+            worker.close()
+        with self._cond:
+            self._counts[key] = max(0, self._counts.get(key, 0) - 1)
+            self._cond.notify()
+
+    def request(self, repo_path, spec, mode="--batch"):
+        if "\n" in spec:
+            raise CatFileError("cat-file batch specs cannot contain newlines")
+
+        key = (str(Path(repo_path).resolve()), mode)
+        last_error = None
+        for attempt in (1, 2):
+            timeout = self._timeout(spec)
+            worker = self._checkout(key)
+            self._watch(worker, timeout)
+            try:
+                result = worker.request(spec)
+            except (OSError, ValueError, CatFileError) as e:
+                self._unwatch(worker)
+                self._discard(key, worker)
+                if worker.timed_out:
+                    logger.warning("cat-file %s for %s timed out after %ss", spec, repo_path, timeout)
+                    raise CatFileTimeout(f"cat-file {spec} timed out after {timeout}s") from e
+                last_error = e
+                logger.warning("cat-file worker for %s failed (attempt %d): %s", repo_path, attempt, e)
+                continue
+            self._unwatch(worker)
+            if worker.timed_out:
+                # Killed just after answering: the answer stands, the worker does not
+                self._discard(key, worker)
+            else:
+                self._checkin(key, worker)
+            return result
+
+        raise CatFileError(str(last_error))
+
+    # === Read timeouts ===
+    def _timeout(self, spec):
+        try:
+            return git_executor.cap_timeout(self.read_timeout, "cat-file")
+        except subprocess.TimeoutExpired:
+            raise CatFileTimeout(f"cat-file {spec}: deadline already passed") from None
+
+    def _watch(self, worker, timeout):
+        if timeout is None:
+            return
+        expires = time.monotonic() + timeout
+        with self._watch_cond:
+            self._busy[worker] = expires
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(
+                    target=self._watch_loop, daemon=True, name="StarBridge-CatFileWatchdog"
+                )
+                self._watchdog.start()
+            elif self._wake_at is None or expires < self._wake_at:
+                self._watch_cond.notify()
+
+    def _unwatch(self, worker):
+        with self._watch_cond:
+            self._busy.pop(worker, None)
+
+    def _watch_loop(self):
+        with self._watch_cond:
+            while not self._closed:
+                now = time.monotonic()
+                for worker, expires in list(self._busy.items()):
+                    if expires <= now:
+                        del self._busy[worker]
+                        worker.timed_out = True
+                        worker.proc.kill()
+                self._wake_at = min(self._busy.values(), default=None)
+                self._watch_cond.wait(None if self._wake_at is None else self._wake_at - now)
+
+    # === Idle reaping ===
+    def _start_reaper(self):
+        if self._reaper is None and self.idle_timeout:
+            self._reaper = threading.Thread(target=self._reap_loop, daemon=True, name="StarBridge-CatFileReaper")
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1.0, self.idle_timeout / 2)
+        while not self._closed:
+            time.sleep(interval)
+            self.reap_idle()
+
+    def reap_idle(self):
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            for key, idle in self._idle.items():
+                keep = []
+                for worker in idle:
+                    if now - worker.last_used > self.idle_timeout or not worker.alive():
+                        expired.append(worker)
+                        self._counts[key] -= 1
+                    else:
+                        keep.append(worker)
+                self._idle[key] = keep
+            self._cond.notify_all()
+        for worker in expired:
+            worker.close()
+        if expired:
+            logger.debug("Reaped %d idle cat-file workers", len(expired))
+
+    def close_all(self):
+        self._closed = True
+        with self._watch_cond:
+            self._watch_cond.notify()
+        with self._cond:
+            workers = [w for idle in self._idle.values() for w in idle]
+            self._idle.clear()
+            self._counts.clear()
+        for worker in workers:
+            worker.close()
+
+
+_pool = CatFilePool(
+    workers_per_repo=settings.get_nested("cat_file", "workers_per_repo", 2),
+    idle_timeout=settings.get_nested("cat_file", "idle_timeout_seconds", 300),
+    read_timeout=settings.get_nested("cat_file", "read_timeout_seconds", 30)
+)
+atexit.register(_pool.close_all)
+
+
+# === Public API ===
+def read_object(repo_path, spec):
+    """
+    Read an object through the repo's cat-file --batch worker.
+    `spec` is anything cat-file accepts: "<sha>", "HEAD:path/to/file", ...
+    Returns (obj_type, content_bytes), or (None, None) if the object does not exist.
+    Raises CatFileError if no worker could serve the request, CatFileTimeout
+    if it was not answered in time.
+    """
+    result = _pool.request(repo_path, spec, "--batch")
+    if result is None:
+        return None, None
+    _, obj_type, _, content = result
+    return obj_type, content
+
+
+def object_info(repo_path, spec):
+    """
+    Resolve an object through --batch-check without reading its content.
+    Returns {"sha", "type", "size"} or None if the object does not exist.
+    """
+    result = _pool.request(repo_path, spec, "--batch-check")
+    if result is None:
+        return None
+    sha, obj_type, size, _ = result
+    return {"sha": sha, "type": obj_type, "size": size}
+
+
+def read_blob(repo_path, ref, file_path):
+    """Return the bytes of `file_path` at `ref`, or None if it is not a blob there."""
+    obj_type, content = read_object(repo_path, f"{ref}:{file_path}")
+    if obj_type != "blob":
+        return None
+    return content
@@ -0,0 +1,285 @@
+# git_executor.py
+"""
+Single entry point for launching git.
+
+Every git process StarBridge starts goes through run()/popen() (or the
+asyncio front-end run_async()) so that:
+- a global cap bounds the number of concurrent git processes
+- a per-repository cap stops heartbeat, watchdog and poll tasks from
+  piling onto the same repo
+- every call gets a deadline (network subcommands get a longer one),
+  further capped by an enclosing deadline() block
+- the environment never lets git prompt (GIT_TERMINAL_PROMPT=0, ssh BatchMode)
+- duration is recorded per subcommand (see get_stats())
+
+The persistent cat-file workers in git_cat_file.py are long-lived and are
+not counted against the process limits; each request they serve is still
+bounded by its own read timeout and the enclosing deadline() block.
+"""
+import os
+import time
+import asyncio
+import logging
+import functools
+import threading
+import subprocess
+from contextlib import contextmanager
+
+import settings
+import git_utils
+
+logger = logging.getLogger('StarBridge')
+
+NETWORK_SUBCOMMANDS = {"fetch", "pull", "push", "clone", "ls-remote"}
+
+# Global options that take a separate value argument (git -C <path> -c <k=v> ...)
+_OPTIONS_WITH_VALUE = {"-C", "-c", "--git-dir", "--work-tree", "--namespace", "--exec-path"}
+
+MAX_PROCESSES = settings.get_nested("git_executor", "max_processes", 16)
+MAX_PER_REPO = settings.get_nested("git_executor", "max_per_repo", 4)
+TIMEOUT_SECONDS = settings.get_nested("git_executor", "timeout_seconds", 300)
+NETWORK_TIMEOUT_SECONDS = settings.get_nested("git_executor", "network_timeout_seconds", 900)
+SLOW_COMMAND_SECONDS = settings.get_nested("git_executor", "slow_command_seconds", 10)
+
+# Sentinel: "caller did not pass a timeout" (None still means "no deadline")
+DEFAULT_TIMEOUT = object()
+
+_global_slots = threading.BoundedSemaphore(MAX_PROCESSES)
+_repo_slots = {}
+_repo_slots_lock = threading.Lock()
+
+_stats = {}
+_stats_lock = threading.Lock()
+_active = 0
+_waiting = 0
+_deadlines = threading.local()
+
+
+def _normalize(command):
+    """Route hard-coded "git" (or a stale executable) to the configured git."""
+    command = list(command)
+    if command and os.path.basename(str(command[0])).lower() in ("git", "git.exe"):
+        command[0] = git_utils.GIT_EXECUTABLE
+    return command
+
+
+def _parse(command, cwd):
+    """Return (subcommand, repo_key) for a git argv."""
+    repo = cwd
+    subcommand = "git"
+    args = command[1:]
+    i = 0
+    while i < len(args):
+        arg = str(args[i])
+        if arg in _OPTIONS_WITH_VALUE:
+            if arg == "-C" and i + 1 < len(args):
+                repo = os.path.join(repo, str(args[i + 1])) if repo else str(args[i + 1])
+            i += 2
+            continue
+        if arg.startswith("-"):
+            i += 1
+            continue
+        subcommand = arg
+        break
+    return subcommand, (os.path.abspath(str(repo)) if repo else None)
+
+
+def _git_env(env):
+    env = dict(os.environ if env is None else env)
+    env["GIT_TERMINAL_PROMPT"] = "0"
+    if "GIT_SSH_COMMAND" not in env and "GIT_SSH" not in env:
+        env["GIT_SSH_COMMAND"] = "ssh -o BatchMode=yes"
+    return env
+
+
+def _repo_semaphore(repo):
+    with _repo_slots_lock:
+        sem = _repo_slots.get(repo)
+        if sem is None:
+            sem = _repo_slots[repo] = threading.BoundedSemaphore(MAX_PER_REPO)
+        return sem
+
+
+@contextmanager
+def _slot(repo):
+    global _active, _waiting
+    repo_sem = _repo_semaphore(repo) if repo else None
+
+    with _stats_lock:
+        _waiting += 1
+    try:
+        if repo_sem:
+            repo_sem.acquire()
+        _global_slots.acquire()
+    finally:
+        with _stats_lock:
+            _waiting -= 1
+
+    with _stats_lock:
+        _active += 1
+    try:
+        yield
+    finally:
+        with _stats_lock:
+            _active -= 1
+        _global_slots.release()
+        if repo_sem:
+            repo_sem.release()
+
+
+def _record(subcommand, elapsed, failed=False, timed_out=False):
+    with _stats_lock:
+        entry = _stats.setdefault(subcommand, {
+            "count": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "total_seconds": 0.0,
+            "max_seconds": 0.0
+        })
+        entry["count"] += 1
+        entry["total_seconds"] += elapsed
+        entry["max_seconds"] = max(entry["max_seconds"], elapsed)
+        if failed:
+            entry["failures"] += 1
+        if timed_out:
+            entry["timeouts"] += 1
+
+    if elapsed > SLOW_COMMAND_SECONDS:
+        logger.warning("Slow git %s: %.1fs", subcommand, elapsed)
+
+
+def default_timeout(subcommand):
+    return NETWORK_TIMEOUT_SECONDS if subcommand in NETWORK_SUBCOMMANDS else TIMEOUT_SECONDS
+
+
+def cap_timeout(timeout, subcommand):
+    """
+    Shrink `timeout` to what is left of the thread's deadline() block, if any.
+    Raises subprocess.TimeoutExpired when the deadline has already passed.
+    """
+    end = getattr(_deadlines, "end", None)
+    if end is None:
+        return timeout
+    remaining = end - time.monotonic()
+    if remaining <= 0:
+        raise subprocess.TimeoutExpired([subcommand], 0)
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+@contextmanager
+def deadline(seconds):
+    """
+    Cap every git command started by this thread inside the block so the
+    whole block finishes within `seconds` (None: no cap). Nests: the
+    tighter deadline wins.
+    """
+    previous = getattr(_deadlines, "end", None)
+    if seconds is not None:
+        end = time.monotonic() + seconds
+        _deadlines.end = end if previous is None else min(previous, end)
+    try:
+        yield
+    finally:
+        _deadlines.end = previous
+
+
+# === Public API ===
+def run(command, *, timeout=DEFAULT_TIMEOUT, env=None, **kwargs):
+    """
+    Drop-in replacement for subprocess.run() for git commands.
+    Accepts the same keyword arguments; waits for a free slot first.
+    """
+    command = _normalize(command)
+    subcommand, repo = _parse(command, kwargs.get("cwd"))
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = default_timeout(subcommand)
+
+    with _slot(repo):
+        timeout = cap_timeout(timeout, subcommand)
+        start = time.monotonic()
+        try:
+            result = subprocess.run(command, timeout=timeout, env=_git_env(env), **kwargs)
+        except subprocess.TimeoutExpired:
+            _record(subcommand, time.monotonic() - start, failed=True, timed_out=True)
+            logger.warning("git %s timed out after %ss (repo=%s)", subcommand, timeout, repo)
+            raise
+        except Exception:
+            _record(subcommand, time.monotonic() - start, failed=True)
+            raise
+
+    _record(subcommand, time.monotonic() - start, failed=result.returncode != 0)
+    return result
+
+
+async def run_async(command, **kwargs):
+    """asyncio front-end for run(); shares the same limits."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(run, command, **kwargs))
+
+
+@contextmanager
+def popen(command, *, timeout=DEFAULT_TIMEOUT, env=None, **kwargs):
+    """
+    Streaming variant: yields a subprocess.Popen holding a slot until the
+    block exits. The process is killed if still running at that point, or
+    as soon as `timeout` (capped by an enclosing deadline() block) expires;
+    the block then ends in subprocess.TimeoutExpired.
+    Do not call run() for the same repo from inside the block when
+    max_per_repo is 1.
+    """
+    command = _normalize(command)
+    subcommand, repo = _parse(command, kwargs.get("cwd"))
+    if timeout is DEFAULT_TIMEOUT:
+        timeout = default_timeout(subcommand)
+
+    with _slot(repo):
+        timeout = cap_timeout(timeout, subcommand)
+        start = time.monotonic()
+        proc = subprocess.Popen(command, env=_git_env(env), **kwargs)
+        expired = threading.Event()
+        timer = None
+        if timeout is not None:
+            def expire():
+                expired.set()
+                proc.kill()
+            timer = threading.Timer(timeout, expire)
+            timer.daemon = True
+            timer.start()
+        try:
+            yield proc
+        finally:
+            if timer:
+                timer.cancel()
+            killed = proc.poll() is None
+            if killed:
+                proc.kill()
+            proc.wait()
+            timed_out = expired.is_set()
+            _record(subcommand, time.monotonic() - start,
+                    failed=timed_out or (not killed and proc.returncode != 0), timed_out=timed_out)
+            if timed_out:
+                logger.warning("git %s timed out after %ss (repo=%s)", subcommand, timeout, repo)
+                raise subprocess.TimeoutExpired(command, timeout)
+
+
+def git_env(env=None):
+    """Environment used for git processes (for callers that must spawn git themselves)."""
+    return _git_env(env)
+
+
+def get_stats():
+    """Per-subcommand timing plus current concurrency."""
+    with _stats_lock:
+        commands = {}
+        for name, entry in _stats.items():
+            commands[name] = {
+                **entry,
+                "avg_seconds": entry["total_seconds"] / entry["count"] if entry["count"] else 0.0
+            }
+        return {
+            "active": _active,
+            "waiting": _waiting,
+            "max_processes": MAX_PROCESSES,
+            "max_per_repo": MAX_PER_REPO,
+            "commands": commands
+        }
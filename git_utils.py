@@ -1,14 +1,21 @@
 import os
+import time
+import threading
 import subprocess
+import concurrent.futures
 from subprocess import Popen, PIPE
 import logging
 import shutil
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime, timezone
 
 logger = logging.getLogger('StarBridge')
 
 import settings
+import git_backend
+import git_executor
+import git_cache
 
 configured_git = settings.get("git_executable", "git")
 if configured_git and os.path.isabs(configured_git) and os.path.exists(configured_git):
@@ -23,6 +30,17 @@ if GIT_EXECUTABLE != configured_git:
         GIT_EXECUTABLE
     )
 
+REMOTE_PROBE_MAX_CONCURRENCY = settings.get_nested("remote_probe", "max_concurrency", 8)
+REMOTE_PROBE_DEADLINE_SECONDS = settings.get_nested("remote_probe", "cycle_deadline_seconds", 20)
+REMOTE_HEADS_TTL_SECONDS = settings.get_nested("remote_heads_cache", "ttl_seconds", 30)
+REMOTE_HEADS_MAX_STALE_SECONDS = settings.get_nested("remote_heads_cache", "max_stale_seconds", 600)
+
+# Shared by every caller so concurrent heartbeats/tasks cannot multiply ls-remote load
+_remote_probe_pool = concurrent.futures.ThreadPoolExecutor(
+    max_workers=REMOTE_PROBE_MAX_CONCURRENCY,
+    thread_name_prefix="StarBridge-LsRemote"
+)
+
 def is_file_tracked(repo_path: str | Path, file_path: str | Path) -> bool:
     """
     Return True if the file is tracked by Git.
@@ -38,8 +56,8 @@ def is_file_tracked(repo_path: str | Path, file_path: str | Path) -> bool:
     rel_path = file_path.relative_to(repo_path)
 
     # Fast path: use git ls-files (cached, instant)
-    result = subprocess.run(
-        ["git", "-C", str(repo_path), "ls-files", "--error-unmatch", str(rel_path)],
+    result = git_executor.run(
+        [GIT_EXECUTABLE, "-C", str(repo_path), "ls-files", "--error-unmatch", str(rel_path)],
         capture_output=True,
         text=True
     )
@@ -74,7 +92,7 @@ def get_diff(repo_path):
         #print("processing diff for repo", repo_path, flush=True)
         git_command = [GIT_EXECUTABLE, "-C", repo_path, "diff"]
 
-        result = subprocess.run(
+        result = git_executor.run(
             git_command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
@@ -105,130 +123,175 @@ def get_diff(repo_path):
         return {}
 
 
-def get_ahead_behind(repo_path, git="git", timeout=10):
+# (local sha, upstream sha) -> (ahead, behind); commits are immutable so entries never go stale
+_ahead_behind_memo = OrderedDict()
+_ahead_behind_memo_lock = threading.Lock()
+AHEAD_BEHIND_MEMO_SIZE = 4096
+
+
+def _memo_ahead_behind(local_sha, upstream_sha, value=None):
+    key = (local_sha, upstream_sha)
+    with _ahead_behind_memo_lock:
+        if value is None:
+            value = _ahead_behind_memo.get(key)
+            if value is not None:
+                _ahead_behind_memo.move_to_end(key)
+            return value
+        _ahead_behind_memo[key] = value
+        while len(_ahead_behind_memo) > AHEAD_BEHIND_MEMO_SIZE:
+            _ahead_behind_memo.popitem(last=False)
+        return value
+
+
+def _count_ahead_behind(repo_path, local_sha, upstream_sha, timeout):
+    cached = _memo_ahead_behind(local_sha, upstream_sha)
+    if cached is not None:
+        return cached
+    rr = git_executor.run(
+        [GIT_EXECUTABLE, "-C", repo_path, "rev-list", "--left-right", "--count", f"{upstream_sha}...{local_sha}"],
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        timeout=timeout
+    )
+    if rr.returncode != 0:
+        logger.warning("[ahead/behind] rev-list failed -> return (0,0)")
+        return 0, 0
+    behind, ahead = map(int, rr.stdout.strip().split("\t"))
+    return _memo_ahead_behind(local_sha, upstream_sha, (ahead, behind))
+
+
+def _resolve_upstreams(snapshot):
+    """
+    Map each local branch to its upstream ref name: the configured upstream
+    if it still exists, else origin/<branch>, else <remote>/<branch> for
+    the first configured remote that has it.
+    Derived from the cached ref snapshot, so it follows config/ref changes.
+    """
+    refs_by_name = {ref["name"]: ref for ref in snapshot["refs"]}
+    upstreams = {}
+    for ref in snapshot["refs"]:
+        if not ref["name"].startswith("refs/heads/"):
+            continue
+        branch = ref["short"]
+        upstream = ref["upstream"]
+        if upstream and not ref["gone"] and upstream in refs_by_name:
+            upstreams[branch] = (upstream, True)
+            continue
+
+        candidates = [f"refs/remotes/origin/{branch}"] + [
+            f"refs/remotes/{remote}/{branch}" for remote in snapshot.get("remotes", [])
+        ]
+        for candidate in candidates:
+            if candidate in refs_by_name:
+                upstreams[branch] = (candidate, False)
+                break
+    return upstreams
+
+
+def get_ahead_behind_all(repo_path, timeout=10):
+    """
+    Ahead/behind for every local branch in one pass:
+    {branch: {"upstream": "origin/main", "ahead": 1, "behind": 0}}.
+    Configured upstreams come straight from for-each-ref's upstream:track;
+    fallback upstreams are counted once per (local sha, upstream sha).
+    Does not fetch.
+    """
+    snapshot = get_ref_snapshot(repo_path)
+    if not snapshot:
+        return {}
+
+    refs_by_name = {ref["name"]: ref for ref in snapshot["refs"]}
+    result = {}
+    for branch, (upstream, configured) in _resolve_upstreams(snapshot).items():
+        local = refs_by_name[f"refs/heads/{branch}"]
+        upstream_sha = refs_by_name[upstream]["sha"]
+        if configured:
+            ahead, behind = _memo_ahead_behind(
+                local["sha"], upstream_sha, (local["ahead"], local["behind"])
+            )
+        else:
+            ahead, behind = _count_ahead_behind(repo_path, local["sha"], upstream_sha, timeout)
+        result[branch] = {"upstream": _short_ref_name(upstream), "ahead": ahead, "behind": behind}
+    return result
+
+
+def _split_remote_ref(repo_path, upstream):
+    """refs/remotes/<remote>/<branch> -> (remote, branch); remote names may contain '/'."""
+    rest = upstream[len("refs/remotes/"):]
+    names = {name for name, _, _ in git_backend.get_backend().remotes(repo_path)}
+    for name in sorted(names, key=len, reverse=True):
+        if rest.startswith(name + "/"):
+            return name, rest[len(name) + 1:]
+    remote, _, branch = rest.partition("/")
+    return remote, branch
+
+
+def get_ahead_behind(repo_path, git=None, timeout=10):
     """
-    Fully failsafe ahead/behind resolver.
+    Fully failsafe ahead/behind resolver for the current branch.
     Handles: no upstream, mismatched names, no remotes, detached HEAD.
+
+    The upstream's remote is fetched only when its (cached) ls-remote heads
+    show the branch moved; an unreachable remote is not fetched at all.
+    `git` is accepted for compatibility; git_executor picks the executable.
     """
     logger.debug(f"[ahead/behind] repo={repo_path}")
 
     try:
-        # STEP 1 - Find current branch (may be detached)
-        r = subprocess.run(
-            [git, "-C", repo_path, "symbolic-ref", "--short", "HEAD"],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            timeout=timeout
-        )
-        if r.returncode != 0:
+        snapshot = get_ref_snapshot(repo_path)
+        head = snapshot["head"] if snapshot else None
+        if not head or not head.startswith("refs/heads/"):
             logger.info("[ahead/behind] Detached HEAD -> return (0,0)")
             return 0, 0
+        branch = head[len("refs/heads/"):]
 
-        branch = r.stdout.strip()
-        logger.debug(f"[ahead/behind] branch={branch}")
-
-        # STEP 2 - Try explicit upstream
-        upstream_r = subprocess.run(
-            [git, "-C", repo_path, "rev-parse", "--abbrev-ref", f"{branch}@{{u}}"],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            timeout=timeout
-        )
-
-        if upstream_r.returncode == 0:
-            upstream = upstream_r.stdout.strip()
-            logger.debug(f"[ahead/behind] upstream={upstream} (explicit)")
-        else:
-            logger.info(f"[ahead/behind] No upstream for '{branch}' -> falling back")
-
-            # STEP 3 - Fallback to origin/<branch>
-            upstream = f"origin/{branch}"
-
-            test = subprocess.run(
-                [git, "-C", repo_path, "rev-parse", "--verify", "--quiet", upstream],
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                timeout=timeout
-            )
-            if test.returncode != 0:
-                logger.info(f"[ahead/behind] '{upstream}' does not exist -> scanning remotes")
-
-                # STEP 4 - Try any remote that has this branch
-                remotes = subprocess.run(
-                    [git, "-C", repo_path, "remote"],
-                    capture_output=True,
-                    text=True,
-                    encoding="utf-8",
-                    errors="replace",
-                    timeout=timeout
-                ).stdout.split()
-
-                found = False
-                for remote in remotes:
-                    candidate = f"{remote}/{branch}"
-                    chk = subprocess.run(
-                        [git, "-C", repo_path, "rev-parse", "--verify", "--quiet", candidate],
+        upstream_info = _resolve_upstreams(snapshot).get(branch)
+        if not upstream_info:
+            logger.info(f"[ahead/behind] No remote branch found for '{branch}' -> (0,0)")
+            return 0, 0
+        upstream = upstream_info[0]
+        logger.debug(f"[ahead/behind] branch={branch} upstream={upstream}")
+
+        # Fetch only if the remote actually moved
+        if upstream.startswith("refs/remotes/"):
+            remote, remote_branch = _split_remote_ref(repo_path, upstream)
+            tracking_sha = next(r["sha"] for r in snapshot["refs"] if r["name"] == upstream)
+            details = get_remote_heads_details(repo_path, timeout=min(timeout, 3))
+            remote_info = details["remotes"].get(remote) or {}
+            remote_sha = (remote_info.get("heads") or {}).get(remote_branch)
+
+            if remote_info.get("error"):
+                logger.debug(f"[ahead/behind] remote '{remote}' unreachable ({remote_info['error']}) -> no fetch")
+            elif remote_sha and remote_sha != tracking_sha:
+                try:
+                    git_executor.run(
+                        [GIT_EXECUTABLE, "-C", repo_path, "fetch", remote, "--quiet", "--no-tags", "--prune"],
                         capture_output=True,
                         text=True,
                         encoding="utf-8",
                         errors="replace",
                         timeout=timeout
                     )
-                    if chk.returncode == 0:
-                        upstream = candidate
-                        found = True
-                        logger.debug(f"[ahead/behind] Using fallback remote branch: {upstream}")
-                        break
-
-                if not found:
-                    logger.info(f"[ahead/behind] No remote branch found for '{branch}' -> (0,0)")
-                    return 0, 0
-
-        # STEP 5 - Fetch only the needed remote
-        remote = upstream.split("/")[0]
-        # Safe fetch - never allowed to crash
-        try:
-            subprocess.run(
-                [git, "-C", repo_path, "fetch", remote, "--quiet", "--no-tags", "--prune"],
-                capture_output=True,
-                text=True,
-                encoding="utf-8",
-                errors="replace",
-                timeout=timeout
-            )
-            logger.debug(f"[ahead/behind] fetch '{remote}' OK")
-        except subprocess.TimeoutExpired:
-            logger.warning(f"[ahead/behind] fetch '{remote}' TIMED OUT -> continuing without fetch")
-        except Exception as e:
-            logger.warning(f"[ahead/behind] fetch '{remote}' failed ({type(e).__name__}) -> {e}")
-
-        # STEP 6 - Calculate ahead/behind (final robust step)
-        rr = subprocess.run(
-            [git, "-C", repo_path, "rev-list", "--left-right", "--count", f"{upstream}...HEAD"],
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            errors="replace",
-            timeout=timeout
-        )
-
-        if rr.returncode != 0:
-            logger.warning("[ahead/behind] rev-list failed -> return (0,0)")
+                    logger.debug(f"[ahead/behind] fetch '{remote}' OK")
+                    snapshot = get_ref_snapshot(repo_path) or snapshot
+                except subprocess.TimeoutExpired:
+                    logger.warning(f"[ahead/behind] fetch '{remote}' TIMED OUT -> continuing without fetch")
+                except Exception as e:
+                    logger.warning(f"[ahead/behind] fetch '{remote}' failed ({type(e).__name__}) -> {e}")
+
+        refs_by_name = {ref["name"]: ref for ref in snapshot["refs"]}
+        local = refs_by_name.get(head)
+        upstream_ref = refs_by_name.get(upstream)
+        if not local or not upstream_ref:
             return 0, 0
-
-        behind, ahead = map(int, rr.stdout.strip().split("\t"))
-        return ahead, behind
+        return _count_ahead_behind(repo_path, local["sha"], upstream_ref["sha"], timeout)
 
     except Exception as e:
         logger.exception(f"[ahead/behind] Unexpected error: {e}")
-        return 0, 0
-
+        return 0, 0
+
 def get_remote_heads(repo_path, timeout=3):
     """
     Safely return dict of remote refs:
@@ -288,9 +351,60 @@ def _pick_canonical_remote(remotes):
     return next(iter(remotes), None)
 
 
-def get_remote_heads_details(repo_path, timeout=3):
+def _discover_remotes(repo_path):
+    remotes = {}
+    for name, url, typ in git_backend.get_backend().remotes(repo_path):
+        if name not in remotes:
+            remotes[name] = {
+                "heads": {},
+                "error": None,
+                "url_fetch": None,
+                "url_push": None,
+                "duration_ms": None,
+                "timed_out": False
+            }
+        if typ == "fetch":
+            remotes[name]["url_fetch"] = url
+        elif typ == "push":
+            remotes[name]["url_push"] = url
+    return remotes
+
+
+def _probe_remote(repo_path, remote_name, timeout):
+    """ls-remote one remote. Returns (heads, error, timed_out, duration_ms)."""
+    start = time.monotonic()
+    try:
+        result = git_executor.run(
+            [GIT_EXECUTABLE, "-C", repo_path, "ls-remote", remote_name],
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+        duration_ms = int((time.monotonic() - start) * 1000)
+        if result.returncode != 0:
+            return {}, result.stderr.strip() or "ls-remote failed", False, duration_ms
+        return _parse_heads_from_ls_remote(result.stdout), None, False, duration_ms
+    except subprocess.TimeoutExpired:
+        return {}, "timeout", True, int((time.monotonic() - start) * 1000)
+    except Exception as e:
+        return {}, str(e), False, int((time.monotonic() - start) * 1000)
+
+
+def _build_remote_details(remotes):
+    canonical_remote = _pick_canonical_remote(remotes)
+    canonical_heads = remotes.get(canonical_remote, {}).get("heads", {}) if canonical_remote else {}
+    return {
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+        "canonical_remote": canonical_remote,
+        "canonical_heads": canonical_heads,
+        "remotes": remotes
+    }
+
+
+def get_remote_heads_details(repo_path, timeout=3, deadline=None, use_cache=True):
     """
     Collect remote heads per remote without failing the whole result if one remote is bad.
+    Remotes are probed concurrently (see get_remote_heads_details_many).
 
     Returns:
     {
@@ -298,83 +412,522 @@ def get_remote_heads_details(repo_path, timeout=3):
       "canonical_remote": "origin",
       "canonical_heads": {"main": "..."},
       "remotes": {
-         "origin": {"heads": {...}, "error": "...", "url_fetch": "...", "url_push": "..."},
+         "origin": {"heads": {...}, "error": "...", "url_fetch": "...", "url_push": "...",
+                    "duration_ms": 120, "timed_out": False},
          "github": {"heads": {...}, "error": None, ...}
       }
     }
     """
-    env = os.environ.copy()
-    env["GIT_TERMINAL_PROMPT"] = "0"
-    env["GIT_SSH_COMMAND"] = "ssh -o BatchMode=yes"
+    return get_remote_heads_details_many(
+        [repo_path], timeout=timeout, deadline=deadline, use_cache=use_cache
+    )[repo_path]
+
+
+# === Remote heads cache ===
+# (repo, remote) -> {"url", "result", "stored_at", "refreshing"}
+_remote_heads_cache = {}
+_remote_heads_versions = {}   # repo -> change counter
+_remote_heads_cache_lock = threading.Lock()
+
+
+def _remote_cache_key(repo_path, remote_name):
+    return os.path.realpath(str(repo_path)), remote_name
+
+
+def _remote_cache_get(repo_path, remote_name, url):
+    """Return (result, age_seconds) or (None, None) if nothing usable is cached."""
+    key = _remote_cache_key(repo_path, remote_name)
+    with _remote_heads_cache_lock:
+        cached = _remote_heads_cache.get(key)
+        if cached is None or cached["url"] != url:
+            return None, None
+        age = time.monotonic() - cached["stored_at"]
+        if age >= REMOTE_HEADS_MAX_STALE_SECONDS:
+            return None, None
+        return cached["result"], age
+
+
+def _remote_cache_put(repo_path, remote_name, url, result):
+    key = _remote_cache_key(repo_path, remote_name)
+    with _remote_heads_cache_lock:
+        previous = _remote_heads_cache.get(key)
+        # heads + error only; duration/timed_out changes are not a remote change
+        if previous is None or previous["result"][:2] != result[:2]:
+            _remote_heads_versions[key[0]] = _remote_heads_versions.get(key[0], 0) + 1
+        _remote_heads_cache[key] = {
+            "url": url,
+            "result": result,
+            "stored_at": time.monotonic(),
+            "refreshing": False
+        }
 
-    # Discover remotes and urls first.
-    remotes_result = subprocess.run(
-        [GIT_EXECUTABLE, "-C", repo_path, "remote", "-v"],
-        capture_output=True,
-        text=True
-    )
 
-    remotes = {}
-    if remotes_result.returncode == 0:
-        for line in remotes_result.stdout.splitlines():
-            parts = line.split()
-            if len(parts) < 3:
-                continue
-            name, url, typ = parts[0], parts[1], parts[2].strip("()")
-            if name not in remotes:
-                remotes[name] = {"heads": {}, "error": None, "url_fetch": None, "url_push": None}
-            if typ == "fetch":
-                remotes[name]["url_fetch"] = url
-            elif typ == "push":
-                remotes[name]["url_push"] = url
-
-    # If no remotes discovered, return empty stable structure.
-    if not remotes:
-        return {
-            "fetched_at": datetime.now(timezone.utc).isoformat(),
-            "canonical_remote": None,
-            "canonical_heads": {},
-            "remotes": {}
-        }
+def _revalidate_in_background(repo_path, remote_name, url, timeout):
+    key = _remote_cache_key(repo_path, remote_name)
+    with _remote_heads_cache_lock:
+        cached = _remote_heads_cache.get(key)
+        if cached is None or cached["refreshing"]:
+            return
+        cached["refreshing"] = True
 
-    # Query each remote independently to avoid one failure poisoning all.
-    for remote_name in remotes.keys():
+    def refresh():
         try:
-            result = subprocess.run(
-                [GIT_EXECUTABLE, "-C", repo_path, "ls-remote", remote_name],
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                env=env,
-            )
-            if result.returncode != 0:
-                remotes[remote_name]["error"] = result.stderr.strip() or "ls-remote failed"
-                remotes[remote_name]["heads"] = {}
-                continue
+            _remote_cache_put(repo_path, remote_name, url, _probe_remote(repo_path, remote_name, timeout))
+        finally:
+            with _remote_heads_cache_lock:
+                cached = _remote_heads_cache.get(key)
+                if cached is not None:
+                    cached["refreshing"] = False
+
+    _remote_probe_pool.submit(refresh)
+
+
+def remote_heads_version(repo_path):
+    """Counter bumped whenever a cached remote of this repo reports different heads."""
+    with _remote_heads_cache_lock:
+        return _remote_heads_versions.get(os.path.realpath(str(repo_path)), 0)
+
+
+def invalidate_remote_heads(repo_path, remote_name=None):
+    """Forget cached remote heads after we changed the remote (push) or must re-read it."""
+    repo = os.path.realpath(str(repo_path))
+    with _remote_heads_cache_lock:
+        for key in [k for k in _remote_heads_cache if k[0] == repo and remote_name in (None, k[1])]:
+            del _remote_heads_cache[key]
 
-            remotes[remote_name]["heads"] = _parse_heads_from_ls_remote(result.stdout)
-            remotes[remote_name]["error"] = None
-        except subprocess.TimeoutExpired:
-            remotes[remote_name]["error"] = "timeout"
-            remotes[remote_name]["heads"] = {}
+
+def get_remote_heads_details_many(repo_paths, timeout=3, deadline=None, use_cache=True):
+    """
+    Probe every remote of every repository concurrently on a shared pool
+    ("remote_probe.max_concurrency"), each ls-remote bounded by `timeout`
+    and the whole cycle by `deadline` (monotonic time; defaults to now +
+    "remote_probe.cycle_deadline_seconds"). Remotes still pending at the
+    deadline are reported with error "deadline exceeded" and timed_out=True.
+
+    Results are cached per (repo, remote): younger than
+    "remote_heads_cache.ttl_seconds" they are served as is, older ones
+    (up to "max_stale_seconds") are served immediately while a background
+    probe refreshes them. use_cache=False always probes.
+
+    Returns {repo_path: details} in the get_remote_heads_details() format.
+    """
+    if deadline is None:
+        deadline = time.monotonic() + REMOTE_PROBE_DEADLINE_SECONDS
+
+    discovered = {}
+    futures = {}
+    for repo_path in repo_paths:
+        try:
+            discovered[repo_path] = _discover_remotes(repo_path)
         except Exception as e:
-            remotes[remote_name]["error"] = str(e)
-            remotes[remote_name]["heads"] = {}
+            logger.warning("Failed to list remotes for %s: %s", repo_path, e)
+            discovered[repo_path] = {}
+
+        for remote_name, entry in discovered[repo_path].items():
+            url = entry["url_fetch"]
+            cached, age = _remote_cache_get(repo_path, remote_name, url) if use_cache else (None, None)
+            if cached is not None:
+                heads, entry["error"], entry["timed_out"], entry["duration_ms"] = cached
+                entry["heads"] = dict(heads)
+                entry["cached"] = True
+                if age >= REMOTE_HEADS_TTL_SECONDS:
+                    _revalidate_in_background(repo_path, remote_name, url, timeout)
+                continue
 
-    canonical_remote = _pick_canonical_remote(remotes)
-    canonical_heads = remotes.get(canonical_remote, {}).get("heads", {}) if canonical_remote else {}
+            future = _remote_probe_pool.submit(_probe_remote, repo_path, remote_name, timeout)
+            futures[future] = (repo_path, remote_name)
 
-    return {
-        "fetched_at": datetime.now(timezone.utc).isoformat(),
-        "canonical_remote": canonical_remote,
-        "canonical_heads": canonical_heads,
-        "remotes": remotes
+    if futures:
+        concurrent.futures.wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+
+    for future, (repo_path, remote_name) in futures.items():
+        entry = discovered[repo_path][remote_name]
+        entry["cached"] = False
+        if future.done() and not future.cancelled():
+            result = future.result()
+            _remote_cache_put(repo_path, remote_name, entry["url_fetch"], result)
+            heads, entry["error"], entry["timed_out"], entry["duration_ms"] = result
+            entry["heads"] = dict(heads)
+        else:
+            # Not started yet: drop it. Already running: its own timeout ends it.
+            future.cancel()
+            entry["heads"] = {}
+            entry["error"] = "deadline exceeded"
+            entry["timed_out"] = True
+
+    return {repo_path: _build_remote_details(remotes) for repo_path, remotes in discovered.items()}
+
+# One record per ref, fields separated by NUL (refnames cannot contain NUL or LF)
+REF_SNAPSHOT_FORMAT = "%00".join([
+    "%(refname)",
+    "%(objectname)",
+    "%(*objectname)",
+    "%(upstream)",
+    "%(upstream:track)",
+    "%(committerdate:unix)",
+])
+
+
+def _parse_upstream_track(track):
+    """Parse "[ahead 2, behind 1]" / "[gone]" into (ahead, behind, gone)."""
+    ahead = behind = 0
+    gone = track.strip() == "[gone]"
+    for part in track.strip("[] ").split(","):
+        part = part.strip()
+        if part.startswith("ahead "):
+            ahead = int(part[len("ahead "):])
+        elif part.startswith("behind "):
+            behind = int(part[len("behind "):])
+    return ahead, behind, gone
+
+
+def _short_ref_name(refname):
+    for prefix in ("refs/heads/", "refs/remotes/", "refs/tags/"):
+        if refname.startswith(prefix):
+            return refname[len(prefix):]
+    return refname
+
+
+def get_ref_snapshot(repo_path):
+    """
+    Resolve every ref of a repository with a single `git for-each-ref`.
+
+    Returns:
+    {
+      "head": "refs/heads/main" | None (detached),
+      "remotes": ["origin", ...],
+      "refs": [{"name", "short", "sha", "peeled", "upstream",
+                "ahead", "behind", "gone", "committer_date"}, ...],
+      "local_heads": {"main": "<sha>", ...},
+      "remote_heads": {"origin/main": "<sha>", ...},
+      "tags": {"v1.0": "<sha>", ...}
     }
+    or None if for-each-ref failed. Results are cached until refs change.
+    """
+    def compute():
+        result = git_executor.run(
+            [GIT_EXECUTABLE, "-C", str(repo_path), "for-each-ref", f"--format={REF_SNAPSHOT_FORMAT}"],
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="replace"
+        )
+        if result.returncode != 0:
+            logger.warning("for-each-ref failed in %s: %s", repo_path, result.stderr.strip())
+            return None
+
+        backend = git_backend.get_backend()
+        snapshot = {
+            "head": backend.symbolic_ref(repo_path),
+            "remotes": sorted({name for name, _, _ in backend.remotes(repo_path)}),
+            "refs": [],
+            "local_heads": {},
+            "remote_heads": {},
+            "tags": {}
+        }
+        for line in result.stdout.splitlines():
+            fields = line.split("\0")
+            if len(fields) != 6:
+                continue
+            name, sha, peeled, upstream, track, committer_date = fields
+            ahead, behind, gone = _parse_upstream_track(track)
+            ref = {
+                "name": name,
+                "short": _short_ref_name(name),
+                "sha": sha,
+                "peeled": peeled or None,
+                "upstream": upstream or None,
+                "ahead": ahead,
+                "behind": behind,
+                "gone": gone,
+                "committer_date": int(committer_date) if committer_date.isdigit() else None
+            }
+            snapshot["refs"].append(ref)
+
+            if name.startswith("refs/heads/"):
+                snapshot["local_heads"][ref["short"]] = sha
+            elif name.startswith("refs/remotes/"):
+                snapshot["remote_heads"][ref["short"]] = sha
+            elif name.startswith("refs/tags/"):
+                snapshot["tags"][ref["short"]] = peeled or sha
+        return snapshot
+
+    return git_cache.get_or_compute(
+        repo_path, ("for-each-ref", REF_SNAPSHOT_FORMAT), compute,
+        cacheable=lambda snapshot: snapshot is not None
+    )
+
+
+# git log stream used by the last-commit walks: one "\x01<sha> <parents>"
+# header per commit, then the paths changed (against the first parent for merges)
+LAST_COMMIT_LOG_ARGS = ["--name-only", "-z", "--diff-merges=first-parent", "--no-renames", "--format=%x01%H %P"]
+
+
+def _iter_log_commits(stream, chunk_size=65536):
+    """Yield (sha, parents, changed_paths) from a LAST_COMMIT_LOG_ARGS stream."""
+    sha, parents, changed = None, [], []
+    buffer = b""
+    while True:
+        chunk = stream.read1(chunk_size)
+        if chunk:
+            tokens = (buffer + chunk).split(b"\0")
+            buffer = tokens.pop()  # incomplete tail
+        else:
+            tokens, buffer = [buffer], b""
+        for token in tokens:
+            token = token.lstrip(b"\n")
+            if not token:
+                continue
+            if token.startswith(b"\x01"):
+                if sha is not None:
+                    yield sha, parents, changed
+                fields = token[1:].decode("ascii", errors="replace").split()
+                sha, parents, changed = fields[0], fields[1:], []
+            elif sha is not None:
+                changed.append(token.decode("utf-8", errors="replace"))
+        if not chunk:
+            break
+    if sha is not None:
+        yield sha, parents, changed
+
+
+class _LastCommitWalk:
+    """
+    "Latest commit touching path" for many paths in one history walk,
+    following git's default history simplification (what
+    `git log -1 -- <path>` reports): at a merge, a path follows the first
+    parent it is identical to, and the merge is only credited when the
+    path differs from every parent.
+
+    Each unresolved path sits on exactly one commit of the walk. With
+    paths=None every path is followed ("rest", kept on the first-parent
+    chain) and the walk reports each path touched before it stops.
+    """
+
+    def __init__(self, repo_path, paths=None):
+        self.repo_path = repo_path
+        self.found = {}
+        self.interest = {}      # sha -> set of paths whose chain is at that commit
+        self.rest = None        # sha the "every other path" chain is at
+        self.diverted = set()   # paths=None: paths currently on a side chain
+        self.late = set()       # chain reached an already-walked commit (clock skew)
+        self.rest_late = False
+        self.seen = set()
+        self.follow_all = paths is None
+        self._start = (set(paths) if paths is not None else None, self.follow_all)
+
+    def done(self):
+        return self._start is None and not self.interest and self.rest is None
+
+    def _forward(self, parent, paths):
+        if not paths:
+            return
+        if parent in self.seen:
+            self.late |= paths
+        elif parent in self.interest:
+            self.interest[parent] |= paths
+        else:
+            self.interest[parent] = paths
+
+    def _same_blob(self, a, b, path):
+        import git_cat_file
+        left = git_cat_file.object_info(self.repo_path, f"{a}:{path}")
+        right = git_cat_file.object_info(self.repo_path, f"{b}:{path}")
+        return (left and left["sha"]) == (right and right["sha"])
+
+    def visit(self, sha, parents, changed):
+        if self._start is not None:
+            # The first commit of the walk is the starting point
+            paths, has_rest = self._start
+            self._start = None
+            if paths:
+                self.interest[sha] = paths
+            if has_rest:
+                self.rest = sha
+
+        self.seen.add(sha)
+        paths = self.interest.pop(sha, None) or set()
+        has_rest = self.rest == sha
+        if has_rest:
+            self.rest = None
+            self.diverted -= paths  # side chains rejoining the main one
+            paths = set()
+        if not paths and not has_rest:
+            return
+
+        touched = {path for path in changed if path in paths}
+        paths.difference_update(touched)
+        if has_rest:
+            touched.update(path for path in changed if path not in self.found and path not in self.diverted)
+
+        if len(parents) > 1 and touched:
+            for parent in parents[1:]:
+                same = {path for path in touched if self._same_blob(sha, parent, path)}
+                if same:
+                    touched -= same
+                    if self.follow_all:
+                        self.diverted |= same
+                    self._forward(parent, same)
+
+        for path in touched:
+            self.found[path] = sha
+        self.diverted -= touched
+
+        if parents:
+            self._forward(parents[0], paths)
+            if has_rest:
+                if parents[0] in self.seen:
+                    self.rest_late = True
+                else:
+                    self.rest = parents[0]
+
+
+def _walk_last_commits(repo_path, revisions, walk, chunk_size=65536):
+    """Feed `git log <revisions>` to `walk` until it is done; the process is killed early."""
+    command = [GIT_EXECUTABLE, "-C", str(repo_path), "log", *revisions, *LAST_COMMIT_LOG_ARGS]
+    with git_executor.popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as proc:
+        for sha, parents, changed in _iter_log_commits(proc.stdout, chunk_size):
+            walk.visit(sha, parents, changed)
+            if walk.done():
+                break
+        else:
+            proc.wait()
+            if proc.returncode:
+                raise RuntimeError(f"git log {' '.join(revisions)} failed ({proc.returncode})")
+
+
+def get_last_commit(repo_path, path, ref="HEAD"):
+    """`git log -1 -- <path>` from `ref`: the sha, or None."""
+    result = git_executor.run(
+        [GIT_EXECUTABLE, "-C", str(repo_path), "log", "-1", "--format=%H", ref, "--", path],
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def get_last_commits(repo_path, paths, ref="HEAD", chunk_size=65536):
+    """
+    Return {path: sha of the latest commit touching path} for all `paths`
+    with a single streaming `git log` walk from `ref`, giving the same
+    answer as `git log -1 -- <path>` (see _LastCommitWalk).
+
+    The walk is killed as soon as every path is resolved, so recently
+    touched trees finish early. Paths never seen map to None.
+    """
+    found = dict.fromkeys(paths)
+    if not found:
+        return found
+
+    walk = _LastCommitWalk(repo_path, found.keys())
+    try:
+        _walk_last_commits(repo_path, [ref], walk, chunk_size)
+    except Exception as e:
+        logger.error("get_last_commits(): failed for %s: %s", repo_path, e)
+    found.update(walk.found)
+
+    # Commits listed out of order (committer clock skew): ask git per path
+    for path in walk.late:
+        found[path] = get_last_commit(repo_path, path, ref)
+
+    unresolved = sum(1 for sha in found.values() if sha is None)
+    if unresolved:
+        logger.debug("get_last_commits(): %d paths unresolved in %s", unresolved, repo_path)
+    return found
+
+
+def get_last_commits_since(repo_path, old, new):
+    """
+    Return {path: sha} for every path whose latest commit as seen from
+    `new` (see get_last_commits) lies in old..new; paths not listed keep
+    their answer at `old`. Returns None when that does not hold for the
+    range (`old` not on the first-parent chain of `new`, a merge that
+    brings back an older version, clock skew): recompute from scratch.
+    """
+    walk = _LastCommitWalk(repo_path)
+    _walk_last_commits(repo_path, [f"{old}..{new}"], walk)
+    exits = set(walk.interest)
+    if walk.rest is not None:
+        exits.add(walk.rest)
+    if walk.late or walk.rest_late or not exits <= {old}:
+        return None
+    return walk.found
+
+
+def _is_listed(mode):
+    """File lists (ls-tree based) carry blobs and symlinks, not submodule commits or trees."""
+    return mode.startswith("100") or mode == "120000"
+
+
+def get_file_delta(repo_path, base, head):
+    """
+    File-level changes between two commits from `diff-tree -r -M`:
+    {"base", "head", "added", "modified", "renamed", "deleted"} where the
+    first three hold {"name", "blob_sha", "size", "latest_sha"} entries
+    (renamed ones also "from") and "deleted" holds names. Only paths a
+    file list would show count: a blob replaced by a submodule is
+    "deleted", a submodule replaced by a blob "added".
+    Returns None if the diff cannot be computed (e.g. base is unknown here).
+    """
+    import git_cat_file
+    import lastmod_index
+
+    command = [GIT_EXECUTABLE, "-C", str(repo_path), "diff-tree", "-r", "-z", "-M", "--no-commit-id", base, head]
+    result = git_executor.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        logger.info("diff-tree %s..%s failed for %s: %s", base[:8], head[:8], repo_path,
+                    result.stderr.decode("utf-8", errors="replace").strip())
+        return None
+
+    delta = {"base": base, "head": head, "added": [], "modified": [], "renamed": [], "deleted": []}
+    # ":old_mode new_mode old_sha new_sha status\0path\0" (+ "new_path\0" for renames/copies)
+    tokens = result.stdout.decode("utf-8", errors="replace").split("\0")
+    i = 0
+    while i < len(tokens):
+        meta = tokens[i]
+        if not meta.startswith(":"):
+            i += 1
+            continue
+        old_mode, new_mode, _, new_sha, status = meta[1:].split(" ", 4)
+        kind = status[0]
+        if kind in "RC":
+            old_path, path = tokens[i + 1], tokens[i + 2]
+            i += 3
+        else:
+            old_path = path = tokens[i + 1]
+            i += 2
+
+        was_listed = kind not in "AC" and _is_listed(old_mode)
+        listed = kind != "D" and _is_listed(new_mode)
+        if not listed:
+            if was_listed:
+                delta["deleted"].append(old_path)
+            continue
+
+        entry = {"name": path, "blob_sha": new_sha}
+        if kind == "R" and was_listed:
+            delta["renamed"].append({**entry, "from": old_path})
+        elif was_listed:
+            delta["modified"].append(entry)
+        else:
+            delta["added"].append(entry)
+
+    changed = delta["added"] + delta["modified"] + delta["renamed"]
+    for entry in changed:
+        info = git_cat_file.object_info(repo_path, entry["blob_sha"])
+        entry["size"] = info["size"] if info else 0
+    latest = lastmod_index.get_last_commits(repo_path, [e["name"] for e in changed], head=head)
+    for entry in changed:
+        entry["latest_sha"] = latest.get(entry["name"])
+    return delta
+
 
 def get_current_commit_sha(repo_path: Path) -> str:
     try:
-        result = subprocess.run(
-            ["git", "-C", str(repo_path), "rev-parse", "HEAD"],
+        result = git_executor.run(
+            [GIT_EXECUTABLE, "-C", str(repo_path), "rev-parse", "HEAD"],
             capture_output=True,
             text=True,
             check=True
@@ -0,0 +1,92 @@
+# heartbeat_manifest.py
+"""
+Compact heartbeat for idle repositories.
+
+A repository whose change fingerprint (see app.heartbeat_fingerprint)
+has not moved since its last successful send is not collected again.
+All such repos are listed in one probe:
+
+    {"mode": "probe", "unchanged_repos": [name, ...]}
+
+and the server answers with the names it cannot vouch for
+("unknown_repos", e.g. after a restart); those are collected and sent in
+full. A failed or unparseable answer resends every listed repo.
+
+The manifest is only used once the server advertised
+"accept_unchanged_manifest" in its probe answer (see set_server_support());
+without it every repo is collected each cycle, as before. Every
+"heartbeat.full_cycle_every" cycles all repos are sent in full anyway.
+"""
+import os
+import logging
+
+import settings
+
+logger = logging.getLogger('StarBridge')
+
+_sent = {}    # repo_path -> fingerprint at the last successful send
+_cycle = 0
+_server_accepts_manifest = False
+
+
+def set_server_support(accepts_manifest):
+    """Capability flag from the heartbeat probe answer ("accept_unchanged_manifest")."""
+    global _server_accepts_manifest
+    _server_accepts_manifest = bool(accepts_manifest)
+
+
+def server_accepts_manifest():
+    return _server_accepts_manifest
+
+
+def record_sent(repo_path, fingerprint):
+    """The repo was sent in full while at `fingerprint`."""
+    _sent[repo_path] = fingerprint
+
+
+def forget(repo_path):
+    """The server may be out of sync with the repo: collect it in full next cycle."""
+    _sent.pop(repo_path, None)
+
+
+def start_cycle():
+    """Count a heartbeat cycle; True when this one must send every repo in full."""
+    global _cycle
+    _cycle += 1
+    full_cycle_every = settings.get_nested("heartbeat", "full_cycle_every", 12)
+    return bool(full_cycle_every) and _cycle % full_cycle_every == 0
+
+
+def unchanged(repo_paths, fingerprints, force_full=False):
+    """The repos that can go into the manifest instead of being collected."""
+    if force_full or not _server_accepts_manifest:
+        return []
+    return [
+        repo_path for repo_path in repo_paths
+        if fingerprints.get(repo_path) is not None
+        and repo_path in _sent
+        and _sent[repo_path] == fingerprints[repo_path]
+    ]
+
+
+def exchange(repo_paths, post):
+    """
+    Send the manifest for `repo_paths` with post(fields) -> response and
+    return the repos that must be collected and sent in full after all.
+    """
+    names = [os.path.basename(repo_path) for repo_path in repo_paths]
+    try:
+        response = post({"mode": "probe", "unchanged_repos": names})
+        if response is None or response.status_code != 200:
+            raise RuntimeError(response.text if response is not None else "no response")
+        # Server does not know some of them (e.g. it restarted): send them in full
+        unknown = set(response.json().get("unknown_repos") or [])
+    except Exception as e:
+        # No usable answer: treat it as a server without the manifest
+        logger.error(f"Unchanged manifest failed, sending full summaries: {e}")
+        unknown = set(names)
+
+    resend = [repo_path for repo_path in repo_paths if os.path.basename(repo_path) in unknown]
+    for repo_path in resend:
+        forget(repo_path)
+    return resend
@@ -0,0 +1,317 @@
+# http_client.py
+"""
+Shared HTTP client for all outbound StarGit traffic.
+
+One requests.Session for the whole process: its HTTPAdapter keeps a pool
+of keep-alive connections per host, so heartbeats, polls and live
+updates reuse TCP+TLS connections instead of handshaking on every call.
+The session is shared by all threads (the connection pool is thread-safe
+and nothing here relies on cookies).
+
+Every call names its endpoint ("heartbeat", "poll", ...), which selects
+the default timeout and retry policy and the bucket its stats go into:
+
+- failures to connect are always retried (the request never reached
+  the server, see not_sent()),
+- 429 and 5xx answers and read timeouts are retried only for endpoints
+  that are safe to repeat,
+- retries back off exponentially with jitter and honour Retry-After.
+
+JSON bodies sent with compress=True are gzip/zstd encoded (with
+Content-Encoding) once the server has listed the encoding in the
+"accept_encoding" capability of a probe response; see
+set_server_encodings(). A server that rejects the encoded body with
+400/415 gets it again uncompressed and is not sent compressed bodies
+afterwards.
+"""
+import gzip
+import json
+import time
+import random
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+
+import settings
+
+try:
+    import zstandard
+    HAS_ZSTD = True
+except ImportError:
+    HAS_ZSTD = False
+
+logger = logging.getLogger('StarBridge')
+
+POOL_MAXSIZE = settings.get_nested("http_client", "pool_maxsize", 16)
+CONNECT_TIMEOUT = settings.get_nested("http_client", "connect_timeout_seconds", 5)
+BACKOFF_SECONDS = settings.get_nested("http_client", "backoff_seconds", 0.5)
+BACKOFF_MAX_SECONDS = settings.get_nested("http_client", "backoff_max_seconds", 10)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# endpoint -> (read timeout seconds, max retries, safe to repeat after the server saw it)
+ENDPOINT_POLICIES = {
+    "auth": (15, 2, True),
+    "register": (15, 2, True),
+    "heartbeat": (30, 2, True),
+    "poll": (30, 1, False),       # a repeated poll could deliver task results twice
+    "live_update": (8, 0, True),  # superseded by the next update anyway
+    "token_check": (10, 1, True),
+    "ip_lookup": (5, 1, True),
+    "task_stream": (90, 0, True),
+}
+DEFAULT_POLICY = (10, 1, False)
+
+COMPRESSION = settings.get_nested("http_client", "compression", "auto")  # "auto", "gzip" or "off"
+COMPRESS_MIN_BYTES = settings.get_nested("http_client", "compress_min_bytes", 1024)
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {}
+_payload_stats = {}     # payload type -> {"payloads", "raw_bytes", "sent_bytes", "encodings"}
+_server_encodings = {}  # scheme://host -> encodings the server accepts for request bodies
+
+
+def _policy(endpoint):
+    read_timeout, retries, idempotent = ENDPOINT_POLICIES.get(endpoint, DEFAULT_POLICY)
+    overrides = settings.get_nested("http_client", "timeouts", {}) or {}
+    return overrides.get(endpoint, read_timeout), retries, idempotent
+
+
+def get_session():
+    """Process-wide session, created on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                # Retries are handled in request() so they can follow the endpoint policy
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _record(endpoint, seconds, status=None, error=None, retries=0):
+    with _stats_lock:
+        entry = _stats.setdefault(endpoint, {
+            "requests": 0, "errors": 0, "retries": 0, "status": {},
+            "total_ms": 0.0, "max_ms": 0.0
+        })
+        entry["requests"] += 1
+        entry["retries"] += retries
+        ms = seconds * 1000
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+        if error is not None:
+            entry["errors"] += 1
+            entry["last_error"] = error
+        else:
+            entry["status"][str(status)] = entry["status"].get(str(status), 0) + 1
+
+
+def _backoff(attempt, response=None):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return min(int(retry_after), BACKOFF_MAX_SECONDS)
+    delay = min(BACKOFF_SECONDS * (2 ** attempt), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1.0)
+
+
+# === Request body compression ===
+def supported_encodings():
+    """Request body encodings this process can produce, best first."""
+    if COMPRESSION == "off":
+        return []
+    if COMPRESSION == "gzip" or not HAS_ZSTD:
+        return ["gzip"]
+    return ["zstd", "gzip"]
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def set_server_encodings(url, encodings):
+    """Record the "accept_encoding" capability a StarGit response advertised."""
+    accepted = [e for e in supported_encodings() if e in (encodings or [])]
+    with _stats_lock:
+        if accepted:
+            _server_encodings[_origin(url)] = accepted
+        else:
+            _server_encodings.pop(_origin(url), None)
+
+
+def _negotiated_encoding(url):
+    with _stats_lock:
+        accepted = _server_encodings.get(_origin(url))
+    return accepted[0] if accepted else None
+
+
+def _encode(body, encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+
+def _record_payload(payload_type, raw_bytes, sent_bytes, encoding):
+    with _stats_lock:
+        entry = _payload_stats.setdefault(payload_type, {
+            "payloads": 0, "raw_bytes": 0, "sent_bytes": 0, "encodings": {}
+        })
+        entry["payloads"] += 1
+        entry["raw_bytes"] += raw_bytes
+        entry["sent_bytes"] += sent_bytes
+        entry["encodings"][encoding] = entry["encodings"].get(encoding, 0) + 1
+
+
+def request(method, url, *, endpoint, timeout=None, retries=None, compress=False, payload_type=None, **kwargs):
+    """
+    Send a request through the shared session.
+
+    `timeout` (read timeout, or a requests (connect, read) tuple) and
+    `retries` override the endpoint policy. With compress=True the
+    `json` body is encoded as negotiated with the server; byte counts
+    are kept per `payload_type` (default: the endpoint name). Returns
+    the last response (which may still be a 429/5xx after the retries
+    ran out) and raises the last requests exception if no response was
+    obtained.
+    """
+    if "json" not in kwargs:
+        return _send(method, url, endpoint, timeout, retries, **kwargs)
+
+    payload_type = payload_type or endpoint
+    body = json.dumps(kwargs.pop("json")).encode("utf-8")
+    headers = {**(kwargs.pop("headers", None) or {}), "Content-Type": "application/json"}
+
+    encoding = _negotiated_encoding(url) if compress and len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        encoded = _encode(body, encoding)
+        _record_payload(payload_type, len(body), len(encoded), encoding)
+        response = _send(method, url, endpoint, timeout, retries, data=encoded,
+                         headers={**headers, "Content-Encoding": encoding}, **kwargs)
+        if response.status_code not in (400, 415):
+            return response
+
+        # Could be the encoding: send it plain once and stop compressing if that works
+        response.close()
+        response = _send(method, url, endpoint, timeout, retries, data=body, headers=headers, **kwargs)
+        if response.status_code not in (400, 415):
+            logger.warning("%s rejected %s request bodies; sending uncompressed from now on", _origin(url), encoding)
+            set_server_encodings(url, [])
+        _record_payload(payload_type, len(body), len(body), "identity")
+        return response
+
+    _record_payload(payload_type, len(body), len(body), "identity")
+    return _send(method, url, endpoint, timeout, retries, data=body, headers=headers, **kwargs)
+
+
+def _send(method, url, endpoint, timeout, retries, **kwargs):
+    read_timeout, policy_retries, idempotent = _policy(endpoint)
+    if timeout is None:
+        timeout = read_timeout
+    if not isinstance(timeout, tuple):
+        timeout = (min(CONNECT_TIMEOUT, timeout), timeout)
+    retries = policy_retries if retries is None else retries
+
+    session = get_session()
+    start = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            if attempt < retries and (not_sent(e) or idempotent):
+                logger.warning("%s %s failed (attempt %d): %s", method, endpoint, attempt + 1, e)
+                time.sleep(_backoff(attempt))
+                attempt += 1
+                continue
+            _record(endpoint, time.monotonic() - start, error=str(e), retries=attempt)
+            raise
+
+        if response.status_code in RETRY_STATUSES and idempotent and attempt < retries:
+            logger.warning("%s %s returned %d (attempt %d); retrying", method, endpoint, response.status_code, attempt + 1)
+            time.sleep(_backoff(attempt, response))
+            response.close()
+            attempt += 1
+            continue
+
+        _record(endpoint, time.monotonic() - start, status=response.status_code, retries=attempt)
+        return response
+
+
+class NotSent(Exception):
+    """A request was not attempted (e.g. no credentials yet); safe to try again."""
+
+
+def not_sent(error):
+    """
+    True if `error` happened before the request reached the server (DNS,
+    refused or timed-out connect), so resending cannot duplicate it. Read
+    timeouts and connections dropped mid-request are not: the server may
+    already have processed the request.
+    """
+    if isinstance(error, (NotSent, requests.exceptions.ConnectTimeout)):
+        return True
+    if isinstance(error, requests.exceptions.ConnectionError) and error.args:
+        reason = getattr(error.args[0], "reason", error.args[0])
+        return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+    return False
+
+
+def post(url, *, endpoint, **kwargs):
+    return request("POST", url, endpoint=endpoint, **kwargs)
+
+
+def get(url, *, endpoint, **kwargs):
+    return request("GET", url, endpoint=endpoint, **kwargs)
+
+
+def _pool_stats():
+    """Connection reuse per host from the adapter's urllib3 pools."""
+    pools = {}
+    session = _session
+    if session is None:
+        return pools
+    for adapter in {id(a): a for a in session.adapters.values()}.values():
+        manager = getattr(adapter, "poolmanager", None)
+        if manager is None:
+            continue
+        for key in list(manager.pools.keys()):
+            pool = manager.pools.get(key)
+            if pool is None:
+                continue
+            pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests": pool.num_requests,
+                "idle": pool.pool.qsize() if pool.pool is not None else 0,
+                "maxsize": pool.pool.maxsize if pool.pool is not None else POOL_MAXSIZE
+            }
+    return pools
+
+
+def get_stats():
+    with _stats_lock:
+        endpoints = {
+            name: {**entry, "status": dict(entry["status"]),
+                   "avg_ms": round(entry["total_ms"] / entry["requests"], 1) if entry["requests"] else 0.0}
+            for name, entry in _stats.items()
+        }
+        payloads = {
+            name: {**entry, "encodings": dict(entry["encodings"]),
+                   "ratio": round(entry["sent_bytes"] / entry["raw_bytes"], 3) if entry["raw_bytes"] else 1.0}
+            for name, entry in _payload_stats.items()
+        }
+        negotiated = {origin: list(encodings) for origin, encodings in _server_encodings.items()}
+    try:
+        pools = _pool_stats()
+    except Exception as e:
+        pools = {"error": str(e)}
+    return {"endpoints": endpoints, "pools": pools, "payloads": payloads, "negotiated_encodings": negotiated}
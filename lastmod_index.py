@@ -0,0 +1,178 @@
+# lastmod_index.py
+"""
+Persistent "last commit per path" index, one SQLite file per repository
+at <git_dir>/starbridge/lastmod.sqlite.
+
+The index is stamped with the HEAD commit it describes. When HEAD moves
+forward it is brought up to date by walking only old_head..new_head;
+when HEAD moves anywhere else (reset, rebase, forced update), or the
+range alone cannot tell (see git_utils.get_last_commits_since), it is
+rebuilt from a full history walk. Attributions match
+`git log -1 -- <path>`.
+"""
+import os
+import sqlite3
+import logging
+import threading
+import subprocess
+
+import git_utils
+import git_backend
+import git_executor
+
+logger = logging.getLogger('StarBridge')
+
+INDEX_DIR = "starbridge"
+INDEX_FILE = "lastmod.sqlite"
+SCHEMA_VERSION = "2"   # 2: history-simplified attributions
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _repo_lock(db_path):
+    with _locks_guard:
+        return _locks.setdefault(db_path, threading.Lock())
+
+
+def _index_path(repo_path):
+    git_dir, _ = git_backend.resolve_git_dirs(repo_path)
+    return os.path.join(git_dir, INDEX_DIR, INDEX_FILE)
+
+
+def _connect(db_path):
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, sha TEXT NOT NULL)")
+    row = conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+    if row is None or row[0] != SCHEMA_VERSION:
+        with conn:
+            conn.execute("DELETE FROM files")
+            conn.execute("DELETE FROM meta")
+            conn.execute("INSERT INTO meta VALUES ('schema', ?)", (SCHEMA_VERSION,))
+    return conn
+
+
+def _stamp(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key = 'head'").fetchone()
+    return row[0] if row else None
+
+
+def _set_stamp(conn, head):
+    conn.execute("INSERT OR REPLACE INTO meta VALUES ('head', ?)", (head,))
+
+
+def _is_ancestor(repo_path, old, new):
+    result = git_executor.run(
+        [git_utils.GIT_EXECUTABLE, "-C", str(repo_path), "merge-base", "--is-ancestor", old, new],
+        capture_output=True
+    )
+    return result.returncode == 0
+
+
+def _advance(conn, repo_path, stamp, head):
+    """Bring the index from `stamp` to `head`. Returns False if a rebuild is needed."""
+    if stamp == head:
+        return True
+    if not stamp or not _is_ancestor(repo_path, stamp, head):
+        return False
+
+    touched = git_utils.get_last_commits_since(repo_path, stamp, head)
+    if touched is None:
+        return False
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?)", touched.items())
+        _set_stamp(conn, head)
+    logger.debug("lastmod index for %s advanced %s..%s (%d paths)", repo_path, stamp[:8], head[:8], len(touched))
+    return True
+
+
+def _rebuild(conn, repo_path, head, paths):
+    found = git_utils.get_last_commits(repo_path, paths, ref=head)
+    with conn:
+        conn.execute("DELETE FROM files")
+        conn.executemany(
+            "INSERT INTO files VALUES (?, ?)",
+            ((path, sha) for path, sha in found.items() if sha)
+        )
+        _set_stamp(conn, head)
+    logger.info("lastmod index for %s rebuilt at %s (%d paths)", repo_path, head[:8], len(found))
+    return found
+
+
+def get_last_commits(repo_path, paths, head=None):
+    """
+    Return {path: sha of the latest commit touching path} at `head`
+    (default: current HEAD) for all `paths`, from the on-disk index.
+    The index only describes the current HEAD: other heads (e.g. other
+    branches in a heartbeat) and an unusable index walk history directly.
+    """
+    paths = list(paths)
+    current = git_backend.get_backend().rev_parse(repo_path, "HEAD")
+    head = head or current
+    if not head or not paths:
+        return dict.fromkeys(paths)
+    if head != current:
+        # Rebuilding for another head would restamp the index away from HEAD
+        return git_utils.get_last_commits(repo_path, paths, ref=head)
+
+    try:
+        db_path = _index_path(repo_path)
+        with _repo_lock(db_path):
+            conn = _connect(db_path)
+            try:
+                if not _advance(conn, repo_path, _stamp(conn), head):
+                    return _rebuild(conn, repo_path, head, paths)
+
+                found = {}
+                missing = []
+                for path in paths:
+                    row = conn.execute("SELECT sha FROM files WHERE path = ?", (path,)).fetchone()
+                    if row:
+                        found[path] = row[0]
+                    else:
+                        missing.append(path)
+
+                if missing:
+                    # Paths the index never saw (e.g. built from a partial list)
+                    extra = git_utils.get_last_commits(repo_path, missing, ref=head)
+                    found.update(extra)
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO files VALUES (?, ?)",
+                            ((path, sha) for path, sha in extra.items() if sha)
+                        )
+                return found
+            finally:
+                conn.close()
+    except subprocess.TimeoutExpired:
+        raise   # out of time: walking the history again would not finish either
+    except Exception as e:
+        logger.warning("lastmod index unavailable for %s (%s); walking history", repo_path, e)
+        return git_utils.get_last_commits(repo_path, paths, ref=head)
+
+
+def update(repo_path):
+    """
+    Advance the index to the current HEAD after commit/pull/ref updates.
+    If HEAD did not move forward the index is dropped and rebuilt lazily
+    on the next read.
+    """
+    try:
+        db_path = _index_path(repo_path)
+        if not os.path.exists(db_path):
+            return
+        head = git_backend.get_backend().rev_parse(repo_path, "HEAD")
+        with _repo_lock(db_path):
+            conn = _connect(db_path)
+            try:
+                if head and _advance(conn, repo_path, _stamp(conn), head):
+                    return
+                with conn:
+                    conn.execute("DELETE FROM files")
+                    conn.execute("DELETE FROM meta WHERE key = 'head'")
+            finally:
+                conn.close()
+    except Exception as e:
+        logger.warning("lastmod index update failed for %s: %s", repo_path, e)
@@ -1,14 +1,30 @@
 import socket
 import json
+import time
+import logging
 import platform
+import threading
 from datetime import datetime, timezone
 
+import settings
+
 try:
     import netifaces
     HAS_NETIFACES = True
 except ImportError:
     HAS_NETIFACES = False
 
+logger = logging.getLogger('StarBridge')
+
+CHECK_INTERVAL_SECONDS = settings.get_nested("ip_discovery", "check_interval_seconds", 30)
+PUBLIC_REFRESH_SECONDS = settings.get_nested("ip_discovery", "public_refresh_seconds", 3600)
+PUBLIC_IP_URL = settings.get_nested("ip_discovery", "public_ip_url", "https://api.ipify.org")
+
+_lock = threading.Lock()
+_cache = {"local": None, "public": None, "public_checked_at": 0.0, "signature": None}
+_public_ready = threading.Event()
+_refresher = None
+
 def get_local_ip_addresses() -> dict:
     """
     Returns clean, flat local IP structure:
@@ -112,6 +128,100 @@ def get_local_ip_addresses() -> dict:
 
     return result
 
+# === Cached discovery (background refresher) ===
+def _interface_signature():
+    """Cheap snapshot of the network interfaces; a change triggers a full refresh."""
+    try:
+        if HAS_NETIFACES:
+            return tuple(sorted(
+                (iface, tuple(sorted(
+                    addr.get("addr", "")
+                    for family in (netifaces.AF_INET, netifaces.AF_INET6)
+                    for addr in netifaces.ifaddresses(iface).get(family, [])
+                )))
+                for iface in netifaces.interfaces()
+            ))
+        return tuple(sorted(name for _, name in socket.if_nameindex()))
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _lookup_public_ip():
+    import http_client  # requests is only needed once the refresher runs
+    try:
+        response = http_client.get(PUBLIC_IP_URL, endpoint="ip_lookup", timeout=5)
+        if response.status_code == 200:
+            return response.text.strip() or None
+    except Exception as e:
+        logger.debug("Public IP lookup failed: %s", e)
+    return None
+
+
+def refresh(force_public=False):
+    """Re-read local addresses (and the public one when due or forced)."""
+    signature = _interface_signature()
+    with _lock:
+        changed = signature is None or signature != _cache["signature"] or _cache["local"] is None
+        public_due = time.monotonic() - _cache["public_checked_at"] > PUBLIC_REFRESH_SECONDS
+
+    if changed:
+        local = get_local_ip_addresses()
+        with _lock:
+            if _cache["signature"] is not None:
+                logger.info("Network interfaces changed; refreshing addresses")
+            _cache["local"] = local
+            _cache["signature"] = signature
+
+    if PUBLIC_IP_URL and (changed or public_due or force_public):
+        public = _lookup_public_ip()
+        with _lock:
+            if public or _cache["public_checked_at"] == 0.0 or changed:
+                _cache["public"] = public
+            _cache["public_checked_at"] = time.monotonic()
+    _public_ready.set()
+
+
+def _refresh_loop():
+    while True:
+        try:
+            refresh()
+        except Exception as e:
+            logger.warning("IP discovery refresh failed: %s", e)
+        time.sleep(CHECK_INTERVAL_SECONDS)
+
+
+def start_refresher():
+    """Start the background refresher once; safe to call repeatedly."""
+    global _refresher
+    with _lock:
+        if _refresher is not None:
+            return
+        _refresher = threading.Thread(target=_refresh_loop, daemon=True, name="StarBridge-IPDiscovery")
+    _refresher.start()
+
+
+def get_cached_local_ip_addresses() -> dict:
+    """Local addresses from the refresher (computed inline only before its first run)."""
+    with _lock:
+        local = _cache["local"]
+    if local is None:
+        local = get_local_ip_addresses()
+        with _lock:
+            _cache["local"] = _cache["local"] or local
+    return local
+
+
+def get_public_ip(wait_seconds=0):
+    """
+    Last known public IP, or None. Never performs the lookup itself;
+    `wait_seconds` bounds how long to wait for the refresher's first one.
+    """
+    if wait_seconds:
+        _public_ready.wait(wait_seconds)
+    with _lock:
+        return _cache["public"]
+
+
 if __name__ == "__main__":
     ret = get_local_ip_addresses()
     print("local ip addresses", json.dumps(ret, indent=4))
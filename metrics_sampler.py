@@ -0,0 +1,133 @@
+# metrics_sampler.py
+"""
+Background sampler for server metrics.
+
+A daemon thread records one sample every "metrics_sampler.interval_seconds"
+into a fixed-size ring buffer ("metrics_sampler.history_size" samples).
+Heartbeats and /internal/stats read the latest sample instead of
+measuring inline, and /internal/stats/history serves the buffer to the
+admin stats page.
+
+CPU is measured with psutil.cpu_percent(interval=None), i.e. over the
+time since the previous sample, so sampling never sleeps.
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+import psutil
+
+import settings
+
+logger = logging.getLogger('StarBridge')
+
+INTERVAL_SECONDS = settings.get_nested("metrics_sampler", "interval_seconds", 5)
+HISTORY_SIZE = settings.get_nested("metrics_sampler", "history_size", 720)
+
+_lock = threading.Lock()
+_history = deque(maxlen=HISTORY_SIZE)
+_thread = None
+_process = psutil.Process(os.getpid())
+_last_disk = None   # (monotonic, read_bytes, write_bytes)
+
+
+def _open_files():
+    try:
+        return _process.num_fds() if hasattr(_process, "num_fds") else _process.num_handles()
+    except (psutil.Error, OSError):
+        return None
+
+
+def _git_processes():
+    count = 0
+    try:
+        for child in _process.children(recursive=True):
+            try:
+                if child.name().lower().startswith("git"):
+                    count += 1
+            except psutil.Error:
+                continue
+    except psutil.Error:
+        return None
+    return count
+
+
+def _disk_rates():
+    """Bytes/s read and written by the whole system since the previous sample."""
+    global _last_disk
+    try:
+        counters = psutil.disk_io_counters()
+    except (OSError, RuntimeError):
+        counters = None
+    if counters is None:
+        return None, None
+
+    now = time.monotonic()
+    previous, _last_disk = _last_disk, (now, counters.read_bytes, counters.write_bytes)
+    if previous is None or now <= previous[0]:
+        return None, None
+    elapsed = now - previous[0]
+    return (
+        round((counters.read_bytes - previous[1]) / elapsed),
+        round((counters.write_bytes - previous[2]) / elapsed)
+    )
+
+
+def sample():
+    """Take one sample now (non-blocking) and append it to the history."""
+    memory = psutil.virtual_memory()
+    read_rate, write_rate = _disk_rates()
+    entry = {
+        "timestamp": time.time(),
+        "cpu_percent": psutil.cpu_percent(interval=None),
+        "memory_percent": memory.percent,
+        "process_rss_bytes": _process.memory_info().rss,
+        "disk_read_bytes_per_s": read_rate,
+        "disk_write_bytes_per_s": write_rate,
+        "open_files": _open_files(),
+        "threads": _process.num_threads(),
+        "git_processes": _git_processes()
+    }
+    with _lock:
+        _history.append(entry)
+    return entry
+
+
+def _loop():
+    while True:
+        try:
+            sample()
+        except Exception as e:
+            logger.warning("Metrics sample failed: %s", e)
+        time.sleep(INTERVAL_SECONDS)
+
+
+def start():
+    """Start the sampler thread once; safe to call repeatedly."""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        _thread = threading.Thread(target=_loop, daemon=True, name="StarBridge-Metrics")
+    psutil.cpu_percent(interval=None)  # prime: the first call has no reference point
+    _thread.start()
+
+
+def latest():
+    """Most recent sample; takes one inline if the sampler has not run yet."""
+    with _lock:
+        if _history:
+            return dict(_history[-1])
+    return sample()
+
+
+def history(seconds=None):
+    """Samples from the ring buffer, oldest first, optionally only the last `seconds`."""
+    with _lock:
+        samples = list(_history)
+    if seconds:
+        cutoff = time.time() - seconds
+        samples = [s for s in samples if s["timestamp"] >= cutoff]
+    return samples
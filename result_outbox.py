@@ -0,0 +1,120 @@
+# result_outbox.py
+"""
+Outbox for task results.
+
+Tasks report their results here as soon as each one finishes (see
+task_executor.run_tasks(on_results=...)). A dedicated sender thread
+ships them through the poll endpoint, independently of fetching the next
+task batch, so a fast get_file is not held back by a slow run_ci in the
+same batch.
+
+Results arriving within "result_outbox.batch_window_ms" of each other are
+sent together (at most "max_batch" per request). A send that failed before
+the request reached the server (http_client.not_sent()) is retried every
+"retry_seconds", up to "max_attempts" times. Any other failure (read
+timeout, dropped connection, error status) may have been processed by the
+server, and the poll endpoint is not safe to repeat, so those results are
+dropped rather than risk delivering them twice. Tasks returned with a
+results poll are handed to on_tasks().
+"""
+import time
+import logging
+import threading
+from collections import deque
+
+import settings
+import http_client
+
+logger = logging.getLogger('StarBridge')
+
+BATCH_WINDOW_MS = settings.get_nested("result_outbox", "batch_window_ms", 5)
+MAX_BATCH = settings.get_nested("result_outbox", "max_batch", 50)
+RETRY_SECONDS = settings.get_nested("result_outbox", "retry_seconds", 2)
+MAX_ATTEMPTS = settings.get_nested("result_outbox", "max_attempts", 5)
+
+_cond = threading.Condition()
+_queue = deque()   # (result, attempts, queued_at)
+_sender = None
+_stats = {"queued": 0, "sent": 0, "requests": 0, "failed_requests": 0, "dropped": 0, "max_latency_seconds": 0.0}
+
+
+def put(results):
+    """Queue result entries for sending; returns immediately."""
+    if not results:
+        return
+    now = time.monotonic()
+    with _cond:
+        for result in results:
+            _queue.append((result, 0, now))
+        _stats["queued"] += len(results)
+        _cond.notify()
+
+
+def _take_batch():
+    with _cond:
+        while not _queue:
+            _cond.wait()
+    # Let results finishing at about the same time share one request
+    time.sleep(BATCH_WINDOW_MS / 1000.0)
+    with _cond:
+        count = min(len(_queue), max(1, MAX_BATCH))
+        return [_queue.popleft() for _ in range(count)]
+
+
+def _send_loop(send, on_tasks, on_sent):
+    while True:
+        batch = _take_batch()
+        try:
+            tasks, _ = send([result for result, _, _ in batch], 0)
+        except Exception as e:
+            unsent = http_client.not_sent(e)
+            retry = [(result, attempts + 1, queued_at) for result, attempts, queued_at in batch
+                     if unsent and attempts + 1 < MAX_ATTEMPTS]
+            with _cond:
+                _stats["failed_requests"] += 1
+                _stats["dropped"] += len(batch) - len(retry)
+                _queue.extendleft(reversed(retry))
+            if retry:
+                logger.warning("Sending task results failed before reaching the server (%s); retrying", e)
+                time.sleep(RETRY_SECONDS)
+            elif unsent:
+                logger.error("Dropped %d task result(s) after %d attempts: %s", len(batch), MAX_ATTEMPTS, e)
+            else:
+                logger.error("Sending %d task result(s) failed and may have been received; not resending: %s",
+                             len(batch), e)
+            continue
+
+        now = time.monotonic()
+        with _cond:
+            _stats["requests"] += 1
+            _stats["sent"] += len(batch)
+            _stats["max_latency_seconds"] = max(
+                _stats["max_latency_seconds"], max(now - queued_at for _, _, queued_at in batch)
+            )
+        if on_sent:
+            on_sent()
+        if tasks:
+            try:
+                on_tasks(tasks)
+            except Exception:
+                logger.exception("Handing over tasks from a results poll failed")
+
+
+def start(send, on_tasks, on_sent=None):
+    """
+    Start the sender thread once; safe to call repeatedly.
+    send(results, wait_seconds) -> (tasks, held), raising on failure.
+    """
+    global _sender
+    with _cond:
+        if _sender is not None:
+            return
+        _sender = threading.Thread(
+            target=_send_loop, args=(send, on_tasks, on_sent), daemon=True, name="StarBridge-Results"
+        )
+    _sender.start()
+
+
+def get_stats():
+    with _cond:
+        return {**_stats, "pending": len(_queue)}
@@ -1,5 +1,6 @@
 # settings.py
 import os
+import copy
 import json
 from pathlib import Path
 from typing import Any, Dict
@@ -28,13 +29,14 @@ DEFAULT_SETTINGS = {
 }
 
 _settings: Dict[str, Any] = {}
+_user_settings: Dict[str, Any] = {}  # As read from settings.json: the only keys saved back
 
 def reload():
     return load_settings(reload=True)
 
 def load_settings(reload: bool = False) -> Dict[str, Any]:
     """Load settings.json with defaults and validation"""
-    global _settings
+    global _settings, _user_settings
 
     if _settings and not reload:
         return _settings  # Already loaded
@@ -46,20 +48,22 @@ def load_settings(reload: bool = False) -> Dict[str, Any]:
             with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
                 user_settings = json.load(f)
             # Merge: user overrides defaults
-            _settings = {**DEFAULT_SETTINGS, **user_settings}
+            _settings = {**copy.deepcopy(DEFAULT_SETTINGS), **user_settings}
             print(f"Settings loaded from {SETTINGS_FILE}")
         except Exception as e:
             print(f"Failed to load settings.json: {e} — using defaults")
-            _settings = DEFAULT_SETTINGS.copy()
+            user_settings = {}
+            _settings = copy.deepcopy(DEFAULT_SETTINGS)  # add_repository must not grow the defaults
     else:
         print(f"settings.json not found — using defaults")
-        _settings = DEFAULT_SETTINGS.copy()
+        _settings = copy.deepcopy(DEFAULT_SETTINGS)
 
     # Deep merge for nested dicts (like live_sync)
     for key, default_val in DEFAULT_SETTINGS.items():
         if isinstance(default_val, dict) and key in user_settings:
             _settings[key] = {**default_val, **user_settings.get(key, {})}
 
+    _user_settings = user_settings
     return _settings
 
 # === PUBLIC ACCESSORS ===
@@ -96,10 +100,10 @@ def remove_repository(repo_path: str, reload_settings: bool = True) -> None:
 
 
 def _save_settings() -> None:
-    """Save current _settings dict to settings.json"""
+    """Save the user's settings and repository list to settings.json (defaults stay in code)"""
     try:
         with open(SETTINGS_FILE, "w", encoding="utf-8") as f:
-            json.dump(_settings, f, indent=2)
+            json.dump({**_user_settings, "repositories": _settings.get("repositories", [])}, f, indent=2)
         print(f"Settings saved to {SETTINGS_FILE}")
     except Exception as e:
         print(f"Failed to save settings.json: {e}")
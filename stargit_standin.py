@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# stargit_standin.py
+"""
+Minimal local stand-in for the StarGit server API, for trying the task
+channel (stream / long poll / poll) and the heartbeat without stargit.com.
+
+    python stargit_standin.py --port 8088 [--no-stream] [--no-long-poll]
+
+Start StarBridge with STARGIT_API_URL=http://127.0.0.1:8088 and any
+STARGIT_API_KEY, then queue tasks:
+
+    curl -X POST http://127.0.0.1:8088/enqueue \\
+         -d '{"action": "get_status", "params": {"repo_name": "myrepo"}}'
+
+Task results sent back by StarBridge are printed. Stdlib only.
+"""
+import sys
+import gzip
+import json
+import time
+import uuid
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+KEEPALIVE_SECONDS = 15
+
+_tasks = deque()
+_cond = threading.Condition()
+
+
+def _take_tasks():
+    with _cond:
+        tasks = list(_tasks)
+        _tasks.clear()
+    return tasks
+
+
+def _wait_for_tasks(timeout):
+    deadline = time.monotonic() + timeout
+    with _cond:
+        while not _tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _cond.wait(remaining)
+    return _take_tasks()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None
+
+    def log_message(self, fmt, *args):
+        sys.stderr.write("[standin] " + (fmt % args) + "\n")
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Encoding") == "gzip":
+            data = gzip.decompress(data)
+        elif self.headers.get("Content-Encoding"):
+            return None
+        try:
+            return json.loads(data or b"{}")
+        except ValueError:
+            return None
+
+    def _json(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        payload = self._body()
+        if payload is None:
+            return self._json(415, {"error": "unsupported body encoding"})
+
+        if self.path in ("/api/auth/token", "/api/auth/refresh"):
+            return self._json(200, {"access_token": "standin-token", "refresh_token": "standin-refresh"})
+        if self.path == "/api/servers/register":
+            return self._json(200, {"ok": True})
+        if self.path == "/api/servers/heartbeat":
+            return self._json(200, {"ok": True, "accept_encoding": ["gzip"], "needed_deltas": {}})
+        if self.path == "/enqueue":
+            tasks = payload if isinstance(payload, list) else [payload]
+            with _cond:
+                for task in tasks:
+                    task.setdefault("id", uuid.uuid4().hex[:8])
+                    _tasks.append(task)
+                _cond.notify_all()
+            return self._json(200, {"queued": [t["id"] for t in tasks]})
+        if self.path == "/api/servers/poll":
+            for result in payload.get("results") or []:
+                print("[standin] result:", json.dumps(result)[:2000], flush=True)
+            wait = payload.get("wait_seconds") or 0
+            if wait and not self.options.no_long_poll:
+                return self._json(200, {"tasks": _wait_for_tasks(min(wait, 60)), "long_poll": True})
+            return self._json(200, {"tasks": _take_tasks()})
+        return self._json(404, {"error": "not found"})
+
+    def do_GET(self):
+        if self.path != "/api/servers/tasks/stream" or self.options.no_stream:
+            return self._json(404, {"error": "not found"})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Keepalive-Interval", str(KEEPALIVE_SECONDS))
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        tasks = []
+        try:
+            self.wfile.write(b": connected\n\n")
+            self.wfile.flush()
+            while True:
+                tasks = _wait_for_tasks(KEEPALIVE_SECONDS)
+                if tasks:
+                    self.wfile.write(b"event: tasks\ndata: " + json.dumps({"tasks": tasks}).encode("utf-8") + b"\n\n")
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+                tasks = []
+        except (BrokenPipeError, ConnectionResetError):
+            # Client went away: hand undelivered tasks to the next poll/stream
+            with _cond:
+                _tasks.extendleft(reversed(tasks))
+                _cond.notify_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--no-stream", action="store_true", help="answer 404 on the SSE endpoint")
+    parser.add_argument("--no-long-poll", action="store_true", help="ignore wait_seconds on polls")
+    Handler.options = parser.parse_args()
+
+    server = ThreadingHTTPServer((Handler.options.host, Handler.options.port), Handler)
+    server.daemon_threads = True
+    print(f"[standin] listening on http://{Handler.options.host}:{Handler.options.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
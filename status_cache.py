@@ -0,0 +1,118 @@
+# status_cache.py
+"""
+In-memory cache of get_git_status_data() results per repository.
+
+An entry stays valid while:
+- the repository is watched by LiveSyncManager (so working tree edits
+  arrive as filesystem events and mark it dirty),
+- the git fingerprint (HEAD, index, refs, config; see git_cache) is
+  unchanged, which covers staging, commits, checkouts and fetches,
+- it is younger than "status_cache.ttl_seconds" (ahead/behind depends
+  on the remote, which no local event reports).
+
+Repositories that are not watched always miss.
+"""
+import os
+import copy
+import time
+import logging
+import threading
+
+import settings
+import git_cache
+
+logger = logging.getLogger('StarBridge')
+
+ENABLED = settings.get_nested("status_cache", "enabled", True)
+TTL_SECONDS = settings.get_nested("status_cache", "ttl_seconds", 300)
+
+_lock = threading.Lock()
+_entries = {}      # repo -> {"value", "fingerprint", "stored_at", "generation"}
+_generation = {}   # repo -> counter bumped on every dirty mark
+_watched = set()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0, "unwatched": 0}
+
+
+def _key(repo_path):
+    return os.path.realpath(str(repo_path))
+
+
+def mark_watched(repo_path):
+    """Called once a filesystem watcher is scheduled for the repository."""
+    with _lock:
+        _watched.add(_key(repo_path))
+
+
+def mark_dirty(repo_path):
+    """Working tree changed (filesystem event) or a task mutated the repo."""
+    key = _key(repo_path)
+    with _lock:
+        _generation[key] = _generation.get(key, 0) + 1
+        if _entries.pop(key, None) is not None:
+            _stats["invalidations"] += 1
+
+
+invalidate = mark_dirty
+
+
+def is_watched(repo_path):
+    with _lock:
+        return _key(repo_path) in _watched
+
+
+def generation(repo_path):
+    """Counter bumped on every dirty mark; equal values mean no worktree event in between."""
+    with _lock:
+        return _generation.get(_key(repo_path), 0)
+
+
+def get_or_compute(repo_path, compute):
+    """
+    Return (status_data, error) from memory when still valid, otherwise
+    call compute() -> (status_data, error) and cache successful results.
+    """
+    if not ENABLED:
+        return compute()
+
+    key = _key(repo_path)
+    with _lock:
+        watched = key in _watched
+        generation = _generation.get(key, 0)
+        entry = _entries.get(key)
+
+    if not watched:
+        with _lock:
+            _stats["unwatched"] += 1
+        return compute()
+
+    fp = git_cache.fingerprint(key)
+    if (
+        entry is not None
+        and entry["generation"] == generation
+        and entry["fingerprint"] == fp
+        and time.monotonic() - entry["stored_at"] < TTL_SECONDS
+    ):
+        with _lock:
+            _stats["hits"] += 1
+        return copy.deepcopy(entry["value"]), None
+
+    with _lock:
+        _stats["misses"] += 1
+
+    value, error = compute()
+    if error is None and fp is not None:
+        with _lock:
+            # Skip if the tree was marked dirty while status was running
+            if _generation.get(key, 0) == generation:
+                _entries[key] = {
+                    "value": copy.deepcopy(value),
+                    "fingerprint": fp,
+                    "stored_at": time.monotonic(),
+                    "generation": generation
+                }
+    return value, error
+
+
+def get_stats():
+    with _lock:
+        return {**_stats, "entries": len(_entries), "watched": len(_watched)}
@@ -0,0 +1,231 @@
+# task_channel.py
+"""
+How StarBridge receives tasks from StarGit.
+
+Three modes, selected with "task_channel.mode":
+
+- "stream":    a persistent Server-Sent Events connection
+               (GET <stream_url>, "event: tasks" with a JSON task list);
+- "long_poll": the regular poll, sent with "wait_seconds" so the server
+               holds it open until tasks arrive or the wait expires;
+- "poll":      the regular poll every "poll_interval_seconds".
+
+"auto" (default) tries stream, then long_poll, then poll. A mode that
+fails (connection refused, 404, or a server that answers a long poll
+immediately without "long_poll": true) is skipped for
+"fallback_seconds" before it is tried again.
+
+A stream server may advertise its keep-alive interval in the
+"X-Keepalive-Interval" response header (seconds); liveness_timeout() then
+allows "missed_keepalives" of them before the channel counts as stalled.
+Each stream connection starts a new generation: a reader left over from
+an earlier connection (e.g. a stalled thread that was replaced) drops
+whatever it still receives, so a task is not dispatched twice.
+
+Received tasks are handed to process(), which queues them; their results
+are sent back by result_outbox as each task finishes.
+
+stargit_standin.py is a local stand-in server for trying all three modes.
+"""
+import json
+import time
+import logging
+import threading
+
+import settings
+import http_client
+
+logger = logging.getLogger('StarBridge')
+
+MODES = ("stream", "long_poll", "poll")
+KEEPALIVE_HEADER = "X-Keepalive-Interval"
+
+_stream_generation = 0
+_stream_generation_lock = threading.Lock()
+
+
+def _setting(key, default):
+    return settings.get_nested("task_channel", key, default)
+
+
+def _next_stream_generation():
+    """A new stream connection supersedes every earlier one."""
+    global _stream_generation
+    with _stream_generation_lock:
+        _stream_generation += 1
+        return _stream_generation
+
+
+def _keepalive_interval(response):
+    """Keep-alive interval (seconds) advertised by the stream server, or None."""
+    try:
+        interval = float(response.headers.get(KEEPALIVE_HEADER))
+    except (TypeError, ValueError):
+        return None
+    return interval if interval > 0 else None
+
+
+def iter_sse(response):
+    """Yield (event, data) from a text/event-stream response; comments yield ("comment", "")."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data:
+                yield event, "\n".join(data)
+            event, data = "message", []
+        elif line.startswith(":"):
+            yield "comment", ""
+        else:
+            field, _, value = line.partition(":")
+            value = value[1:] if value.startswith(" ") else value
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+
+
+class TaskChannel:
+    """
+    poll(results, wait_seconds) -> (tasks, held): one poll request; `held`
+        is True when the server honoured wait_seconds, None if it failed.
+    process(tasks) queues tasks for processing and returns immediately.
+    token_getter() -> access token for the stream request
+    on_alive() is called whenever the channel proves to be working.
+    """
+
+    def __init__(self, poll, process, token_getter, stream_url, on_alive=None):
+        self.poll = poll
+        self.process = process
+        self.token_getter = token_getter
+        self.stream_url = stream_url
+        self.on_alive = on_alive or (lambda: None)
+        self._unavailable_until = {}   # mode -> monotonic time
+        self.mode = None
+        self.keepalive_seconds = None   # advertised by the current stream
+
+    # === Mode selection ===
+    def _candidates(self):
+        configured = _setting("mode", "auto")
+        if configured in MODES:
+            return [configured]
+        if not _setting("stream_enabled", True):
+            return ["long_poll", "poll"]
+        return list(MODES)
+
+    def _pick_mode(self):
+        now = time.monotonic()
+        candidates = self._candidates()
+        for mode in candidates:
+            if mode == "poll" or self._unavailable_until.get(mode, 0) <= now:
+                return mode
+        return candidates[-1]
+
+    def _mark_unavailable(self, mode, reason):
+        fallback = _setting("fallback_seconds", 300)
+        self._unavailable_until[mode] = time.monotonic() + fallback
+        logger.info("Task channel: %s unavailable (%s); falling back for %ds", mode, reason, fallback)
+
+    def liveness_timeout(self, default):
+        """Seconds without on_alive() after which the channel counts as stalled."""
+        if self.mode == "stream" and self.keepalive_seconds:
+            return self.keepalive_seconds * _setting("missed_keepalives", 3)
+        return default
+
+    # === Task handling ===
+    def handle(self, tasks):
+        """Hand received tasks over for processing."""
+        if tasks:
+            self.process(tasks)
+
+    # === Modes ===
+    def _poll_once(self, wait_seconds):
+        start = time.monotonic()
+        tasks, held = self.poll(None, wait_seconds)
+        self.on_alive()
+        if tasks:
+            self.handle(tasks)
+            return True
+        if held is None:
+            return False  # request failed: wait the poll interval
+        if wait_seconds and not held:
+            self._mark_unavailable("long_poll", "server answered without holding the request")
+            return False
+        # A held poll that came back empty but early (e.g. server restart): avoid a hot loop
+        return not wait_seconds or time.monotonic() - start >= 1.0
+
+    def _run_stream(self, active):
+        """Returns True if the stream was established (the caller just reconnects)."""
+        token = self.token_getter()
+        if not token:
+            return False
+        try:
+            response = http_client.get(
+                self.stream_url,
+                endpoint="task_stream",
+                headers={"Authorization": f"Bearer {token}", "Accept": "text/event-stream"},
+                stream=True,
+                timeout=(5, _setting("stream_idle_timeout_seconds", 90)),
+                retries=0
+            )
+        except Exception as e:
+            self._mark_unavailable("stream", e)
+            return False
+
+        if response.status_code != 200 or "text/event-stream" not in response.headers.get("Content-Type", ""):
+            self._mark_unavailable("stream", f"status {response.status_code}")
+            response.close()
+            return False
+
+        generation = _next_stream_generation()
+        self.keepalive_seconds = _keepalive_interval(response)
+        logger.info("Task channel: stream connected to %s (keep-alive %ss)", self.stream_url, self.keepalive_seconds)
+        received = False
+        try:
+            with response:
+                for event, data in iter_sse(response):
+                    if generation != _stream_generation or not active.is_set():
+                        # Superseded: the current stream receives these tasks
+                        logger.info("Task channel: superseded stream closed; dropping its events")
+                        break
+                    received = True
+                    self.on_alive()
+                    if event == "tasks":
+                        payload = json.loads(data)
+                        tasks = payload.get("tasks", []) if isinstance(payload, dict) else payload
+                        if tasks:
+                            self.handle(tasks)
+                    elif event == "reconnect":
+                        break
+        except Exception as e:
+            logger.info("Task channel: stream dropped (%s); reconnecting", e)
+        if not received and active.is_set() and generation == _stream_generation:
+            # Accepted but never delivered anything (not even a keep-alive): likely a proxy
+            self._mark_unavailable("stream", "closed without events")
+            return False
+        return True
+
+    def run(self, active):
+        """Receive and process tasks while the `active` threading.Event is set."""
+        while active.is_set():
+            mode = self._pick_mode()
+            if mode != self.mode:
+                logger.info("Task channel mode: %s", mode)
+                self.mode = mode
+
+            try:
+                if mode == "stream":
+                    if self._run_stream(active):
+                        time.sleep(1.0)  # brief pause before reconnecting
+                    continue
+                if mode == "long_poll":
+                    if self._poll_once(_setting("long_poll_wait_seconds", 25)):
+                        continue
+                else:
+                    self._poll_once(0)
+            except Exception:
+                logger.exception("Task channel error — will retry")
+                time.sleep(5)
+
+            time.sleep(_setting("poll_interval_seconds", 10))
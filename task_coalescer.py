@@ -0,0 +1,109 @@
+# task_coalescer.py
+"""
+Coalescing of identical read tasks.
+
+StarGit clients looking at the same repository send identical read tasks
+(get_status, get_file, ...) in the same batch or in consecutive ones.
+Tasks with the same action and params share one execution:
+
+- while one is running, identical tasks wait for it and get a copy of its
+  results under their own task id;
+- after it finished, its results are reused for "task_coalescing.
+  window_seconds" as long as the repository fingerprint (see
+  app.heartbeat_fingerprint) is unchanged. Repos without a trustworthy
+  fingerprint (None) only get the first kind. Results carrying an error
+  are never reused.
+"""
+import json
+import time
+import logging
+import threading
+
+import settings
+
+logger = logging.getLogger('StarBridge')
+
+ENABLED = settings.get_nested("task_coalescing", "enabled", True)
+WINDOW_SECONDS = settings.get_nested("task_coalescing", "window_seconds", 10)
+MAX_ENTRIES = settings.get_nested("task_coalescing", "max_entries", 256)
+
+_lock = threading.Lock()
+_inflight = {}   # key -> _Flight
+_recent = {}     # key -> (finished monotonic, results)
+_stats = {"executed": 0, "joined_inflight": 0, "reused": 0}
+
+
+class _Flight:
+    __slots__ = ("done", "results")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.results = None
+
+
+def _key(task, fingerprint):
+    params = json.dumps(task.get("params") or {}, sort_keys=True, default=str)
+    return (task.get("action"), params, fingerprint)
+
+
+def _for_task(results, task):
+    return [{**result, "task_id": task.get("id")} for result in results]
+
+
+def _reusable(results):
+    return all(not result.get("error") for result in results)
+
+
+def _prune(now):
+    expired = [key for key, (finished, _) in _recent.items() if now - finished > WINDOW_SECONDS]
+    for key in expired:
+        del _recent[key]
+    while len(_recent) >= MAX_ENTRIES:
+        del _recent[next(iter(_recent))]
+
+
+def run(task, fingerprint, execute):
+    """Return execute(task) -> [result, ...], or a copy of an identical task's results."""
+    if not ENABLED:
+        return execute(task)
+
+    key = _key(task, fingerprint)
+    with _lock:
+        recent = _recent.get(key) if fingerprint is not None else None
+        if recent is not None and time.monotonic() - recent[0] <= WINDOW_SECONDS:
+            _stats["reused"] += 1
+            return _for_task(recent[1], task)
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        if flight.results is not None:
+            with _lock:
+                _stats["joined_inflight"] += 1
+            logger.debug(f"Task {task.get('id')} coalesced with an identical {task.get('action')}")
+            return _for_task(flight.results, task)
+        return execute(task)   # the leader failed: run on our own
+
+    results = None
+    try:
+        results = execute(task)
+        return results
+    finally:
+        with _lock:
+            _stats["executed"] += 1
+            del _inflight[key]
+            if results is not None:
+                flight.results = results
+                if fingerprint is not None and _reusable(results):
+                    now = time.monotonic()
+                    _prune(now)
+                    _recent[key] = (now, results)
+        flight.done.set()
+
+
+def get_stats():
+    with _lock:
+        return {**_stats, "inflight": len(_inflight), "cached": len(_recent)}
@@ -0,0 +1,216 @@
+# task_executor.py
+"""
+Run polled tasks concurrently while keeping per-repository order.
+
+Every repository has a persistent FIFO lane that outlives the batch a
+task arrived in, so a new task only waits for earlier tasks on its own
+repository. Tasks for different repositories run in parallel on a
+bounded pool. Within one lane, tasks start in submission order:
+
+- a read task waits for earlier write tasks only, so consecutive reads
+  overlap;
+- a write task waits for everything submitted before it for that repo.
+
+Read/write and the concurrency class come from the action's handler in
+task_registry; unknown actions count as writes. Tasks without a
+repository (create_repo, import_repo) share one lane. "barrier"
+handlers (update_starbridge) wait for every earlier task and block
+every later one.
+
+submit() returns at once; on_results() receives each task's results as
+soon as it finishes. run_tasks() waits and returns all results in
+submission (task id) order, whatever the completion order was.
+"""
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+
+import settings
+import task_registry
+
+logger = logging.getLogger('StarBridge')
+
+MAX_WORKERS = settings.get_nested("task_executor", "max_workers", 4)
+
+_pool = None
+_lock = threading.Lock()
+_epochs = deque()   # _Epoch: tasks between two barriers; only the first one runs
+_stats = {"submitted": 0, "completed": 0}
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, MAX_WORKERS), thread_name_prefix="StarBridge-Task"
+        )
+    return _pool
+
+
+def is_read(task):
+    handler = task_registry.get(task.get("action"))
+    return handler is not None and handler.is_read
+
+
+def is_barrier(task):
+    handler = task_registry.get(task.get("action"))
+    return handler is not None and handler.concurrency == "barrier"
+
+
+def repo_key(task):
+    return (task.get("params") or {}).get("repo_name")
+
+
+class _Item:
+    __slots__ = ("task", "process", "on_results", "key", "read", "results", "done")
+
+    def __init__(self, task, process, on_results):
+        self.task = task
+        self.process = process
+        self.on_results = on_results
+        self.key = repo_key(task)
+        self.read = is_read(task)
+        self.results = []
+        self.done = threading.Event()
+
+
+class _Lane:
+    __slots__ = ("queue", "reads", "writing")
+
+    def __init__(self):
+        self.queue = deque()
+        self.reads = 0
+        self.writing = False
+
+
+class _Epoch:
+    __slots__ = ("barrier", "started", "lanes", "count")
+
+    def __init__(self, barrier=None):
+        self.barrier = barrier    # a barrier epoch holds just that item
+        self.started = False
+        self.lanes = {}           # repo key -> _Lane
+        self.count = 0            # queued + running items
+
+
+def _run_one(process, task, on_results=None):
+    try:
+        results = process(task) or []
+    except Exception as e:
+        logger.exception(f"Task {task.get('id')} ({task.get('action')}) failed")
+        results = [{"task_id": task.get("id"), "result": None, "error": str(e)}]
+    if on_results and results:
+        try:
+            on_results(results)
+        except Exception:
+            logger.exception("Result callback failed")
+    return results
+
+
+# === Scheduling (all under _lock) ===
+def _startable():
+    """Pop the items that may start now."""
+    ready = []
+    while _epochs and not _epochs[0].count:
+        _epochs.popleft()   # drained: whatever is behind it may start
+    if not _epochs:
+        return ready
+
+    epoch = _epochs[0]
+    if epoch.barrier is not None:
+        if not epoch.started:
+            epoch.started = True
+            ready.append(epoch.barrier)
+        return ready
+    for lane in epoch.lanes.values():
+        while lane.queue and not lane.writing:
+            item = lane.queue[0]
+            if not item.read and lane.reads:
+                break
+            lane.queue.popleft()
+            if item.read:
+                lane.reads += 1
+            else:
+                lane.writing = True
+            ready.append(item)
+    return ready
+
+
+def _finish(item):
+    epoch = _epochs[0]
+    epoch.count -= 1
+    if epoch.barrier is item:
+        return
+    lane = epoch.lanes[item.key]
+    if item.read:
+        lane.reads -= 1
+    else:
+        lane.writing = False
+    if not lane.queue and not lane.reads and not lane.writing:
+        del epoch.lanes[item.key]
+
+
+def _start(items):
+    pool = _get_pool()
+    for item in items:
+        pool.submit(_execute, item)
+
+
+def _execute(item):
+    item.results = _run_one(item.process, item.task, item.on_results)
+    with _lock:
+        _finish(item)
+        _stats["completed"] += 1
+        ready = _startable()
+    item.done.set()
+    _start(ready)
+
+
+def _enqueue(tasks, process, on_results):
+    items = [_Item(task, process, on_results) for task in tasks]
+    with _lock:
+        for item in items:
+            if is_barrier(item.task):
+                epoch = _Epoch(barrier=item)
+                _epochs.append(epoch)
+            else:
+                if not _epochs or _epochs[-1].barrier is not None:
+                    _epochs.append(_Epoch())
+                epoch = _epochs[-1]
+                lane = epoch.lanes.get(item.key)
+                if lane is None:
+                    lane = epoch.lanes[item.key] = _Lane()
+                lane.queue.append(item)
+            epoch.count += 1
+        _stats["submitted"] += len(items)
+        ready = _startable()
+    _start(ready)
+    return items
+
+
+# === Public API ===
+def submit(tasks, process, on_results):
+    """Queue process(task) for every task; results go to on_results() as each one finishes."""
+    _enqueue(list(tasks), process, on_results)
+
+
+def run_tasks(tasks, process, on_results=None):
+    """
+    Run process(task) -> [result, ...] for every task and return all
+    results flattened in submission order.
+    """
+    items = _enqueue(list(tasks), process, on_results)
+    for item in items:
+        item.done.wait()
+    return [result for item in items for result in item.results]
+
+
+def get_stats():
+    with _lock:
+        return {
+            **_stats,
+            "pending": _stats["submitted"] - _stats["completed"],
+            "lanes": sum(len(epoch.lanes) for epoch in _epochs if epoch.barrier is None),
+            "waiting_barriers": sum(1 for epoch in _epochs if epoch.barrier is not None)
+        }
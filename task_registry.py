@@ -0,0 +1,143 @@
+# task_registry.py
+"""
+Registry of the actions StarBridge accepts from polled tasks.
+
+Each action is a function registered with @task_handler, which records
+how the action behaves:
+
+- kind:           "read" or "write" (reads of one repo may overlap)
+- changes_status: refresh the repo status after it runs
+- changes_heads:  refresh ahead/behind and remote heads after it runs
+- full_sync:      attach a full repository sync (create/import)
+- timeout:        cap in seconds on every git command it starts
+                  (None: git_executor defaults; "task_registry.timeouts"
+                  in settings overrides per action)
+- concurrency:    "repo" (ordered within its repository) or "barrier"
+                  (runs alone: waits for earlier tasks, blocks later ones)
+- needs_repo:     resolve params.repo_name to a registered repository first
+
+task_executor schedules from these properties, and process_task() times
+every call into a per-action latency histogram (see get_stats()).
+"""
+import logging
+import threading
+
+import settings
+
+logger = logging.getLogger('StarBridge')
+
+KINDS = ("read", "write")
+CONCURRENCY_CLASSES = ("repo", "barrier")
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, float("inf"))
+
+REGISTRY = {}
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+class TaskHandler:
+    """A registered action handler; call it like the wrapped function."""
+
+    def __init__(self, action, func, kind, changes_status, changes_heads, full_sync,
+                 timeout, concurrency, needs_repo):
+        if kind not in KINDS:
+            raise ValueError(f"{action}: unknown kind {kind!r}")
+        if concurrency not in CONCURRENCY_CLASSES:
+            raise ValueError(f"{action}: unknown concurrency class {concurrency!r}")
+        self.action = action
+        self.func = func
+        self.kind = kind
+        self.changes_status = changes_status
+        self.changes_heads = changes_heads
+        self.full_sync = full_sync
+        self._timeout = timeout
+        self.concurrency = concurrency
+        self.needs_repo = needs_repo
+
+    @property
+    def timeout(self):
+        overrides = settings.get_nested("task_registry", "timeouts", {}) or {}
+        return overrides.get(self.action, self._timeout)
+
+    @property
+    def is_read(self):
+        return self.kind == "read"
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def describe(self):
+        return {
+            "kind": self.kind,
+            "changes_status": self.changes_status,
+            "changes_heads": self.changes_heads,
+            "full_sync": self.full_sync,
+            "timeout": self.timeout,
+            "concurrency": self.concurrency,
+            "needs_repo": self.needs_repo
+        }
+
+
+def task_handler(action, *, kind="write", changes_status=False, changes_heads=False, full_sync=False,
+                 timeout=None, concurrency="repo", needs_repo=True):
+    """Decorator registering func(task, params, repo_name, repo_path, task_result, results) for `action`."""
+    def register(func):
+        if action in REGISTRY:
+            raise ValueError(f"Duplicate task handler for {action}")
+        REGISTRY[action] = TaskHandler(
+            action, func, kind, changes_status, changes_heads, full_sync,
+            timeout, concurrency, needs_repo
+        )
+        return func
+    return register
+
+
+def get(action):
+    """The TaskHandler for `action`, or None if the action is unknown."""
+    return REGISTRY.get(action)
+
+
+# === Latency ===
+def record(action, seconds, ok=True):
+    with _stats_lock:
+        entry = _stats.get(action)
+        if entry is None:
+            entry = _stats[action] = {
+                "count": 0,
+                "errors": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "buckets": [0] * len(LATENCY_BUCKETS)
+            }
+        entry["count"] += 1
+        entry["total_seconds"] += seconds
+        entry["max_seconds"] = max(entry["max_seconds"], seconds)
+        if not ok:
+            entry["errors"] += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                entry["buckets"][i] += 1
+                break
+
+
+def get_stats():
+    """Per-action call counts and latency histograms (bucket label -> count)."""
+    labels = [f"<={bound:g}s" if bound != float("inf") else "+inf" for bound in LATENCY_BUCKETS]
+    with _stats_lock:
+        actions = {}
+        for action, entry in _stats.items():
+            actions[action] = {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "total_seconds": entry["total_seconds"],
+                "max_seconds": entry["max_seconds"],
+                "avg_seconds": entry["total_seconds"] / entry["count"] if entry["count"] else 0.0,
+                "histogram": dict(zip(labels, entry["buckets"]))
+            }
+    return {
+        "handlers": {action: handler.describe() for action, handler in sorted(REGISTRY.items())},
+        "actions": actions
+    }
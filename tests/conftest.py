@@ -0,0 +1,60 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "StarBridge Tests",
+    "GIT_AUTHOR_EMAIL": "tests@starbridge.invalid",
+    "GIT_COMMITTER_NAME": "StarBridge Tests",
+    "GIT_COMMITTER_EMAIL": "tests@starbridge.invalid",
+    "GIT_CONFIG_NOSYSTEM": "1",
+}
+
+
+class Repo:
+    """Small helper around a scratch git repository."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._tick = 0
+
+    def git(self, *args):
+        self._tick += 1
+        env = dict(os.environ, **GIT_ENV)
+        # Strictly increasing dates keep `git log` ordering deterministic
+        env["GIT_AUTHOR_DATE"] = env["GIT_COMMITTER_DATE"] = f"{1700000000 + self._tick} +0000"
+        result = subprocess.run(
+            ["git", "-C", self.path, *args], env=env, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+
+    def write(self, name, content):
+        full = os.path.join(self.path, name)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "w") as f:
+            f.write(content)
+
+    def commit(self, message, **files):
+        for name, content in files.items():
+            self.write(name.replace("__", "/"), content)
+        self.git("add", "-A")
+        self.git("commit", "-q", "--allow-empty", "-m", message)
+        return self.git("rev-parse", "HEAD")
+
+    def last_commit(self, path, ref="HEAD"):
+        return self.git("log", "-1", "--format=%H", ref, "--", path) or None
+
+    def files(self, ref="HEAD"):
+        return self.git("ls-tree", "-r", "--name-only", ref).splitlines()
+
+
+@pytest.fixture
+def repo(tmp_path):
+    r = Repo(tmp_path / "repo")
+    os.makedirs(r.path)
+    r.git("init", "-q", "-b", "main")
+    return r
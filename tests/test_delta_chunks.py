@@ -0,0 +1,100 @@
+import functools
+import json
+
+import pytest
+
+import delta_chunks
+
+
+class Response:
+    def __init__(self, status_code=200, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.text = json.dumps(self.body)
+
+    def json(self):
+        return self.body
+
+
+@pytest.fixture
+def chunks(monkeypatch):
+    monkeypatch.setattr(delta_chunks, "_outbox", {})
+    monkeypatch.setattr(delta_chunks, "_server_accepts_chunks", True)
+    return delta_chunks
+
+
+DELTAS = {
+    "repo": {
+        "main": {
+            "files": [{"name": f"src/file_{i}.py", "sha": f"{i:040x}"} for i in range(200)],
+            "diff": "+ added line é\"\n" * 400,
+            "readme": "short",
+        },
+        "dev": {"commits": [{"sha": f"{i:040x}", "message": "x" * 50} for i in range(50)]},
+    }
+}
+
+
+@pytest.mark.parametrize("budget", [256, 1000, 4096])
+def test_split_merge_round_trip(budget):
+    fragments = list(delta_chunks.split(DELTAS, budget))
+    assert len(fragments) > 1
+    assert all(delta_chunks._size(f) <= budget for f in fragments)
+    assert functools.reduce(delta_chunks.merge, json.loads(json.dumps(fragments)), {}) == DELTAS
+
+
+def test_single_update_without_server_support(chunks):
+    chunks.set_server_support(False)
+    upload = chunks.plan("repo", DELTAS, chunk_bytes=256)
+    sent = []
+    ok, _ = chunks.send(upload, lambda fields: sent.append(fields) or Response())
+    assert ok
+    assert sent == [{"mode": "update", "deltas": DELTAS}]
+
+
+def test_failed_upload_resumes_from_first_missing_chunk(chunks):
+    basis = chunks.basis({"main": "aaa"}, {"main": "bbb"}, state=("refs", 1))
+    upload = chunks.plan("repo", DELTAS, basis=basis, chunk_bytes=1000)
+    sent = []
+
+    def post(fields):
+        sent.append(fields["seq"])
+        return Response(500) if fields["seq"] == 2 else Response()
+
+    ok, _ = chunks.send(upload, post)
+    assert not ok and sent == [0, 1, 2]
+
+    resumed = chunks.pending("repo", basis)
+    assert resumed is upload and resumed["next_seq"] == 2
+    sent.clear()
+    ok, _ = chunks.send(resumed, lambda fields: sent.append(fields["seq"]) or Response())
+    assert ok and sent == list(range(2, upload["total"]))
+    assert chunks.pending("repo", basis) is None
+
+
+def test_stale_or_unknown_basis_is_not_resumed(chunks):
+    basis = chunks.basis({"main": "aaa"}, {"main": "bbb"}, state=("refs", 1))
+    upload = chunks.plan("repo", DELTAS, basis=basis, chunk_bytes=1000)
+    chunks.send(upload, lambda fields: Response(500))
+
+    moved = chunks.basis({"main": "aaa"}, {"main": "bbb"}, state=("refs", 2))
+    assert chunks.pending("repo", moved) is None
+    assert chunks.pending("repo", basis) is None   # dropped as stale
+    assert chunks.basis({"main": "aaa"}, {"main": "bbb"}, state=None) is None
+
+
+def test_server_next_seq_rewinds_upload(chunks):
+    upload = chunks.plan("repo", DELTAS, chunk_bytes=1000)
+    sent = []
+
+    def post(fields):
+        sent.append(fields["seq"])
+        # Server lost chunk 0 once it sees chunk 1
+        if fields["seq"] == 1 and sent.count(1) == 1:
+            return Response(body={"next_seq": 0})
+        return Response()
+
+    ok, _ = chunks.send(upload, post)
+    assert ok
+    assert sent[:4] == [0, 1, 0, 1]
+    assert sent[-1] == upload["total"] - 1
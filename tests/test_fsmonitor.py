@@ -0,0 +1,75 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+import fsmonitor
+
+
+@pytest.fixture
+def journal(repo):
+    repo.commit("c1", f="1")
+    journal = fsmonitor.FsMonitorJournal(repo.path)
+    yield journal
+    journal.close()
+
+
+@pytest.fixture
+def observer(journal):
+    """Stand-in for the watchdog observer: answers the hook's sync cookies."""
+    stop = threading.Event()
+
+    def loop():
+        while not stop.wait(0.005):
+            for cookie in journal.cookie_dir.iterdir():
+                journal._on_path(cookie, False)
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    yield
+    stop.set()
+    thread.join()
+
+
+def hook(repo, token):
+    result = subprocess.run(
+        [sys.executable, str(fsmonitor.HOOK_SCRIPT), "2", token], cwd=repo.path, capture_output=True
+    )
+    fields = result.stdout.split(b"\0")
+    return result.returncode, fields[0].decode() if fields[0] else None, [f.decode() for f in fields[1:-1]]
+
+
+def test_changes_since_token(repo, journal, observer):
+    journal._on_path(Path(repo.path) / "f", False)
+    journal._on_path(Path(repo.path) / "dir", True)
+    journal._on_path(Path(repo.path) / ".git" / "index", False)   # git's own files are ignored
+
+    assert hook(repo, f"{journal.epoch}:0") == (0, f"{journal.epoch}:2", ["f", "dir/"])
+    assert hook(repo, f"{journal.epoch}:1") == (0, f"{journal.epoch}:2", ["dir/"])
+    assert hook(repo, f"{journal.epoch}:2") == (0, f"{journal.epoch}:2", [])
+
+
+@pytest.mark.parametrize("token", ["otherepoch:1", "garbage", "{epoch}:99", "{epoch}:x"])
+def test_token_mismatch_reports_everything(repo, journal, observer, token):
+    journal.record("f")
+    assert hook(repo, token.format(epoch=journal.epoch)) == (0, f"{journal.epoch}:1", ["/"])
+
+
+def test_rotation_invalidates_earlier_tokens(repo, journal, observer):
+    journal.record("f")
+    old = f"{journal.epoch}:1"
+    journal._rotate()
+    assert hook(repo, old) == (0, f"{journal.epoch}:0", ["/"])
+
+
+def test_unanswered_cookie_reports_everything(repo, journal):
+    journal.record("f")
+    assert hook(repo, f"{journal.epoch}:0") == (0, f"{journal.epoch}:0", ["/"])
+    assert not list(journal.cookie_dir.iterdir())
+
+
+def test_without_starbridge_git_scans(repo, journal):
+    journal.close()
+    assert hook(repo, "anything")[0] == 1
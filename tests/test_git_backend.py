@@ -0,0 +1,67 @@
+import pytest
+
+import git_backend
+import git_cache
+
+
+@pytest.fixture
+def backends(tmp_path, monkeypatch):
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(home / ".config"))
+    monkeypatch.setenv("GIT_CONFIG_NOSYSTEM", "1")
+    monkeypatch.delenv("GIT_CONFIG_GLOBAL", raising=False)
+    monkeypatch.setattr(git_cache, "ENABLED", False)
+    return git_backend.NativeBackend(), git_backend.SubprocessBackend(), home
+
+
+def assert_same(native, subprocess_backend, repo):
+    assert native.show_ref(repo.path) == subprocess_backend.show_ref(repo.path)
+    assert native.symbolic_ref(repo.path) == subprocess_backend.symbolic_ref(repo.path)
+    for remote in (False, True):
+        assert native.branches(repo.path, remote) == subprocess_backend.branches(repo.path, remote)
+    for ref in ("HEAD", "main", "feature", "v1", "origin/main", "nope"):
+        assert native.rev_parse(repo.path, ref) == subprocess_backend.rev_parse(repo.path, ref)
+    assert native.remotes(repo.path) == subprocess_backend.remotes(repo.path)
+
+
+def populate(repo):
+    repo.commit("c1", f="1")
+    repo.git("tag", "v1")
+    repo.git("branch", "feature")
+    repo.commit("c2", f="2")
+    repo.git("remote", "add", "origin", "https://example.invalid/repo.git")
+    repo.git("remote", "add", "mirror", "gh:org/repo.git")
+    repo.git("config", "remote.mirror.pushurl", "ssh://push.example.invalid/repo.git")
+    repo.git("update-ref", "refs/remotes/origin/main", "HEAD~1")
+    repo.git("pack-refs", "--all")
+    repo.git("update-ref", "refs/heads/feature", "HEAD")
+
+
+def test_native_matches_subprocess(repo, backends):
+    native, subprocess_backend, _ = backends
+    populate(repo)
+    assert_same(native, subprocess_backend, repo)
+
+
+def test_global_url_rewrite_matches_subprocess(repo, backends):
+    native, subprocess_backend, home = backends
+    populate(repo)
+    assert_same(native, subprocess_backend, repo)
+
+    (home / ".gitconfig").write_text('[url "https://github.com/"]\n\tinsteadOf = gh:\n')
+    assert ("mirror", "https://github.com/org/repo.git", "fetch") in native.remotes(repo.path)
+    assert_same(native, subprocess_backend, repo)
+
+    (home / ".gitconfig").unlink()
+    (home / ".config" / "git").mkdir(parents=True)
+    (home / ".config" / "git" / "config").write_text('[url "ssh://git@github.com/"]\n\tpushInsteadOf = gh:\n')
+    assert_same(native, subprocess_backend, repo)
+
+
+def test_repo_url_rewrite_matches_subprocess(repo, backends):
+    native, subprocess_backend, _ = backends
+    populate(repo)
+    repo.git("config", "url.https://github.com/.insteadOf", "gh:")
+    assert_same(native, subprocess_backend, repo)
@@ -0,0 +1,38 @@
+import pytest
+
+import git_cache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(git_cache, "ENABLED", True)
+    monkeypatch.setattr(git_cache, "RACY_WINDOW_NS", 0)
+    git_cache.invalidate()
+    yield git_cache
+    git_cache.invalidate()
+
+
+def test_sizeof_counts_nested_values():
+    blob = "x" * 10000
+    assert git_cache._sizeof([{"name": blob}]) > 10000
+    assert git_cache._sizeof({"heads": {"main": blob}}) > 10000
+    assert git_cache._sizeof(({"a": [blob]},)) > 10000
+
+
+def test_callers_cannot_mutate_cached_values(repo, cache):
+    repo.commit("init", README="x")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"local_heads": {"main": "abc"}, "files": [{"name": "README"}]}
+
+    first = cache.get_or_compute(repo.path, ("snapshot",), compute)
+    first["local_heads"]["main"] = "changed"
+    first["files"].append({"name": "extra"})
+
+    second = cache.get_or_compute(repo.path, ("snapshot",), compute)
+    assert len(calls) == 1
+    assert second == {"local_heads": {"main": "abc"}, "files": [{"name": "README"}]}
+    second["files"].clear()
+    assert cache.get_or_compute(repo.path, ("snapshot",), compute)["files"] == [{"name": "README"}]
@@ -0,0 +1,48 @@
+import signal
+import time
+
+import pytest
+
+import git_cat_file
+import git_executor
+
+
+@pytest.fixture
+def pool():
+    pool = git_cat_file.CatFilePool(workers_per_repo=1, idle_timeout=0, read_timeout=30)
+    yield pool
+    pool.close_all()
+
+
+def test_read_object(repo, pool):
+    repo.commit("add", README="hello\n")
+    sha, obj_type, size, content = pool.request(repo.path, "HEAD:README")
+    assert (obj_type, size, content) == ("blob", 6, b"hello\n")
+    assert pool.request(repo.path, "HEAD:missing") is None
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGSTOP"), reason="needs SIGSTOP to hang the worker")
+def test_hung_worker_is_killed_at_the_deadline(repo, pool, monkeypatch):
+    repo.commit("add", README="hello\n")
+    pool.request(repo.path, "HEAD:README")
+    key = next(iter(pool._idle))
+    worker = pool._idle[key][0]
+
+    # Stop the process so the request blocks on its pipe
+    worker.proc.send_signal(signal.SIGSTOP)
+    start = time.monotonic()
+    with git_executor.deadline(0.5):
+        with pytest.raises(git_cat_file.CatFileTimeout):
+            pool.request(repo.path, "HEAD:README")
+    assert time.monotonic() - start < 5
+    assert worker.timed_out and not worker.alive()
+
+    # The pool replaces the discarded worker
+    assert pool.request(repo.path, "HEAD:README")[3] == b"hello\n"
+
+
+def test_expired_deadline_fails_fast(repo, pool):
+    repo.commit("add", README="hello\n")
+    with git_executor.deadline(0):
+        with pytest.raises(git_cat_file.CatFileTimeout):
+            pool.request(repo.path, "HEAD:README")
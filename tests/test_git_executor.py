@@ -0,0 +1,88 @@
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+
+import git_executor
+
+
+def hang(repo):
+    """A git command that waits on stdin until it is killed."""
+    return ["git", "-C", repo.path, "hash-object", "--stdin"]
+
+
+@pytest.fixture
+def one_per_repo(monkeypatch):
+    monkeypatch.setattr(git_executor, "MAX_PER_REPO", 1)
+    monkeypatch.setattr(git_executor, "_repo_slots", {})
+
+
+def test_popen_is_killed_at_the_deadline(repo):
+    before = git_executor.get_stats()["commands"].get("hash-object", {}).get("timeouts", 0)
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        with git_executor.deadline(0.3):
+            with git_executor.popen(hang(repo), stdin=subprocess.PIPE, stdout=subprocess.PIPE) as proc:
+                proc.stdout.read()
+    assert time.monotonic() - start < 5
+    stats = git_executor.get_stats()
+    assert stats["commands"]["hash-object"]["timeouts"] == before + 1
+    assert stats["active"] == 0
+
+
+def test_popen_finishing_in_time_is_not_a_timeout(repo):
+    with git_executor.deadline(10):
+        with git_executor.popen(["git", "-C", repo.path, "version"], stdout=subprocess.PIPE) as proc:
+            assert proc.stdout.read().startswith(b"git version")
+
+
+def test_expired_deadline_fails_before_starting(repo):
+    with git_executor.deadline(0):
+        with pytest.raises(subprocess.TimeoutExpired):
+            git_executor.run(["git", "-C", repo.path, "version"], capture_output=True)
+
+
+def test_nested_deadline_keeps_the_tighter_one(repo):
+    with git_executor.deadline(0.2):
+        with git_executor.deadline(60):
+            start = time.monotonic()
+            read_end, write_end = os.pipe()   # stdin stays open: the command never finishes
+            try:
+                with pytest.raises(subprocess.TimeoutExpired):
+                    git_executor.run(hang(repo), stdin=read_end, capture_output=True)
+            finally:
+                os.close(read_end)
+                os.close(write_end)
+    assert time.monotonic() - start < 5
+
+
+def test_per_repo_slots_serialize_one_repo_only(repo, tmp_path, one_per_repo):
+    other = tmp_path / "other"
+    other.mkdir()
+    released = threading.Event()
+    timings = {}
+
+    def hold():
+        with git_executor.popen(["git", "-C", repo.path, "version"], stdout=subprocess.PIPE):
+            released.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    time.sleep(0.1)
+
+    def run(name, path):
+        git_executor.run(["git", "-C", str(path), "version"], capture_output=True)
+        timings[name] = time.monotonic()
+
+    same = threading.Thread(target=run, args=("same", repo.path))
+    same.start()
+    run("other", other)
+    time.sleep(0.2)
+    assert "same" not in timings and git_executor.get_stats()["waiting"] == 1
+
+    released.set()
+    holder.join()
+    same.join(5)
+    assert timings["same"] > timings["other"]
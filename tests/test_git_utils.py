@@ -0,0 +1,198 @@
+import os
+import random
+import subprocess
+
+import pytest
+
+import git_cache
+import git_utils
+from conftest import Repo
+
+
+def assert_matches_git_log(repo, paths, ref="HEAD"):
+    expected = {path: repo.last_commit(path, ref) for path in paths}
+    assert git_utils.get_last_commits(repo.path, paths, ref=ref) == expected
+
+
+def test_linear_history(repo):
+    repo.commit("c1", f="1", g="1")
+    repo.commit("c2", f="2")
+    repo.commit("c3", h="1")
+    assert_matches_git_log(repo, ["f", "g", "h", "missing"])
+
+
+def test_ours_merge_is_treesame_to_first_parent(repo):
+    c1 = repo.commit("c1", f="1", g="1")
+    repo.git("checkout", "-q", "-b", "side")
+    repo.commit("side-f", f="2")
+    repo.git("checkout", "-q", "main")
+    repo.commit("main-g", g="2")
+    repo.git("merge", "-q", "-s", "ours", "side", "-m", "m1")
+
+    assert git_utils.get_last_commits(repo.path, ["f"])["f"] == c1
+    assert_matches_git_log(repo, ["f", "g"])
+
+
+def test_merged_side_branch_change(repo):
+    repo.commit("c1", f="1", g="1")
+    repo.git("checkout", "-q", "-b", "side")
+    side = repo.commit("side-f", f="2")
+    repo.git("checkout", "-q", "main")
+    repo.commit("main-g", g="2")
+    repo.git("merge", "-q", "--no-edit", "side")
+
+    assert git_utils.get_last_commits(repo.path, ["f"])["f"] == side
+    assert_matches_git_log(repo, ["f", "g"])
+
+
+def test_cherry_picked_backport(repo):
+    repo.commit("c1", f="1", g="1")
+    repo.git("checkout", "-q", "-b", "release")
+    repo.commit("fix", f="fixed")
+    repo.git("checkout", "-q", "main")
+    repo.git("cherry-pick", "release")
+    repo.commit("main-g", g="2")
+    repo.git("merge", "-q", "--no-edit", "release")
+    assert_matches_git_log(repo, ["f", "g"])
+
+
+def test_conflict_resolution_credits_the_merge(repo):
+    repo.commit("c1", f="1")
+    repo.git("checkout", "-q", "-b", "side")
+    repo.commit("side", f="side")
+    repo.git("checkout", "-q", "main")
+    repo.commit("main", f="main")
+    repo.git("merge", "-q", "-s", "ours", "--no-commit", "side")
+    repo.write("f", "resolved")
+    repo.git("add", "f")
+    merge = repo.commit("merge")
+    assert git_utils.get_last_commits(repo.path, ["f"])["f"] == merge
+    assert_matches_git_log(repo, ["f"])
+
+
+def test_random_histories_match_git_log(repo):
+    rng = random.Random(6)
+    names = [f"d{i % 3}/f{i}" for i in range(8)]
+    repo.commit("root", **{name.replace("/", "__"): "0" for name in names})
+    branches = ["main"]
+    for step in range(40):
+        branch = rng.choice(branches)
+        repo.git("checkout", "-q", branch)
+        roll = rng.random()
+        if roll < 0.2:
+            new = f"b{step}"
+            repo.git("checkout", "-q", "-b", new)
+            branches.append(new)
+        elif roll < 0.4 and len(branches) > 1:
+            other = rng.choice([b for b in branches if b != branch])
+            strategy = ["-s", "ours"] if rng.random() < 0.3 else ["-X", "theirs"]
+            repo.git("merge", "-q", "--no-edit", *strategy, other)
+        else:
+            touched = rng.sample(names, rng.randint(1, 3))
+            repo.commit(f"s{step}", **{name.replace("/", "__"): f"{step}" for name in touched})
+    for branch in branches:
+        assert_matches_git_log(repo, names + ["nope"], ref=branch)
+
+
+def _ref(name, upstream=None):
+    return {"name": name, "short": name.split("/", 2)[2], "sha": "0" * 40, "upstream": upstream, "gone": False}
+
+
+def test_fallback_upstream_ignores_nested_remote_refs():
+    snapshot = {
+        "remotes": ["upstream"],
+        "refs": [_ref("refs/heads/main"), _ref("refs/remotes/upstream/release/main")]
+    }
+    assert git_utils._resolve_upstreams(snapshot) == {}
+
+    snapshot["refs"].append(_ref("refs/remotes/upstream/main"))
+    assert git_utils._resolve_upstreams(snapshot) == {"main": ("refs/remotes/upstream/main", False)}
+
+
+def test_ref_snapshot_lists_remotes(repo):
+    repo.commit("c1", f="1")
+    repo.git("remote", "add", "upstream", "https://example.invalid/repo.git")
+    repo.git("update-ref", "refs/remotes/upstream/release/main", "HEAD")
+    snapshot = git_utils.get_ref_snapshot(repo.path)
+    assert snapshot["remotes"] == ["upstream"]
+    assert git_utils._resolve_upstreams(snapshot) == {}
+
+
+def _gitlink(repo, path, sha):
+    repo.git("update-index", "--add", "--cacheinfo", f"160000,{sha},{path}")
+
+
+def test_file_delta_ignores_deleted_submodules(repo):
+    base = repo.commit("c1", keep="1", gone="1")
+    _gitlink(repo, "vendor/lib", base)
+    repo.git("commit", "-q", "-m", "add submodule")
+    before = repo.git("rev-parse", "HEAD")
+    repo.git("rm", "-q", "--cached", "vendor/lib")
+    repo.git("rm", "-q", "gone")
+    repo.git("commit", "-q", "-m", "drop submodule and file")
+    head = repo.git("rev-parse", "HEAD")
+
+    delta = git_utils.get_file_delta(repo.path, before, head)
+    assert delta["deleted"] == ["gone"]
+    assert not delta["added"] and not delta["modified"] and not delta["renamed"]
+
+
+def test_file_delta_type_change_between_blob_and_submodule(repo):
+    base = repo.commit("c1", lib="blob\n", other="1")
+    repo.git("rm", "-q", "--cached", "lib")
+    _gitlink(repo, "lib", base)
+    repo.git("commit", "-q", "-m", "lib becomes a submodule")
+    as_submodule = repo.git("rev-parse", "HEAD")
+
+    delta = git_utils.get_file_delta(repo.path, base, as_submodule)
+    assert delta["deleted"] == ["lib"]
+    assert not delta["added"] and not delta["modified"]
+
+    repo.git("rm", "-q", "--cached", "lib")
+    os.remove(os.path.join(repo.path, "lib"))
+    back = repo.commit("lib is a file again", lib="blob again\n")
+    delta = git_utils.get_file_delta(repo.path, as_submodule, back)
+    assert [entry["name"] for entry in delta["added"]] == ["lib"]
+    assert delta["added"][0]["latest_sha"] == back
+    assert not delta["deleted"]
+
+
+@pytest.fixture
+def tracking(repo, tmp_path, monkeypatch):
+    """A clone of `repo` with main ahead 1 / behind 1, a gone upstream and an annotated tag."""
+    monkeypatch.setattr(git_cache, "ENABLED", False)
+    repo.commit("c1", f="1")
+    repo.git("branch", "feature")
+    clone = Repo(tmp_path / "clone")
+    subprocess.run(["git", "clone", "-q", repo.path, clone.path], check=True, capture_output=True)
+    clone.git("checkout", "-q", "-b", "feature", "--track", "origin/feature")
+    clone.git("checkout", "-q", "main")
+    clone.commit("local", f="local")
+    clone.git("tag", "-a", "v1", "-m", "release")
+    repo.commit("remote", g="remote")
+    repo.git("branch", "-D", "feature")
+    clone.git("fetch", "-q", "--prune")
+    return clone
+
+
+def test_ref_snapshot_tracking(tracking):
+    snapshot = git_utils.get_ref_snapshot(tracking.path)
+    refs = {ref["name"]: ref for ref in snapshot["refs"]}
+
+    assert snapshot["head"] == "refs/heads/main"
+    assert snapshot["remotes"] == ["origin"]
+    main = refs["refs/heads/main"]
+    assert (main["upstream"], main["ahead"], main["behind"], main["gone"]) == ("refs/remotes/origin/main", 1, 1, False)
+    feature = refs["refs/heads/feature"]
+    assert (feature["upstream"], feature["gone"]) == ("refs/remotes/origin/feature", True)
+    assert refs["refs/tags/v1"]["peeled"] == tracking.git("rev-parse", "v1^{commit}")
+    assert snapshot["local_heads"] == {"main": tracking.git("rev-parse", "main"),
+                                       "feature": tracking.git("rev-parse", "feature")}
+    assert snapshot["remote_heads"]["origin/main"] == tracking.git("rev-parse", "origin/main")
+    assert snapshot["tags"]["v1"] == refs["refs/tags/v1"]["peeled"]
+
+
+def test_ahead_behind_all_uses_live_upstreams(tracking):
+    assert git_utils.get_ahead_behind_all(tracking.path) == {
+        "main": {"upstream": "origin/main", "ahead": 1, "behind": 1}
+    }
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+import heartbeat_manifest
+
+
+class Response:
+    def __init__(self, status_code=200, body=None, text=None):
+        self.status_code = status_code
+        self.body = body
+        self.text = text if text is not None else json.dumps(body)
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("not JSON")
+        return self.body
+
+
+@pytest.fixture
+def manifest(monkeypatch):
+    monkeypatch.setattr(heartbeat_manifest, "_sent", {})
+    monkeypatch.setattr(heartbeat_manifest, "_server_accepts_manifest", True)
+    heartbeat_manifest.record_sent("/repos/a", "fp-a")
+    heartbeat_manifest.record_sent("/repos/b", "fp-b")
+    return heartbeat_manifest
+
+
+PATHS = ["/repos/a", "/repos/b", "/repos/c"]
+FINGERPRINTS = {"/repos/a": "fp-a", "/repos/b": "fp-b", "/repos/c": "fp-c"}
+
+
+def test_only_repos_unchanged_since_their_last_send_are_listed(manifest):
+    moved = {**FINGERPRINTS, "/repos/b": "fp-b2"}
+    assert manifest.unchanged(PATHS, moved) == ["/repos/a"]
+    assert manifest.unchanged(PATHS, {**FINGERPRINTS, "/repos/a": None}) == ["/repos/b"]
+    assert manifest.unchanged(PATHS, FINGERPRINTS, force_full=True) == []
+
+
+def test_no_manifest_without_server_support(manifest):
+    manifest.set_server_support(False)
+    assert manifest.unchanged(PATHS, FINGERPRINTS) == []
+    manifest.set_server_support(True)
+    assert manifest.unchanged(PATHS, FINGERPRINTS) == ["/repos/a", "/repos/b"]
+
+
+def test_unknown_repos_are_resent_in_full(manifest):
+    sent = []
+
+    def post(fields):
+        sent.append(fields)
+        return Response(body={"unknown_repos": ["b"]})
+
+    assert manifest.exchange(["/repos/a", "/repos/b"], post) == ["/repos/b"]
+    assert sent == [{"mode": "probe", "unchanged_repos": ["a", "b"]}]
+    # Forgotten until it is sent in full again
+    assert manifest.unchanged(PATHS, FINGERPRINTS) == ["/repos/a"]
+
+
+@pytest.mark.parametrize("response", [
+    Response(500, text="error"),
+    Response(200, text="<html>"),     # not JSON
+    Response(200, body=["a"]),        # not an object
+    None,
+])
+def test_unusable_answer_resends_everything(manifest, response):
+    assert manifest.exchange(["/repos/a", "/repos/b"], lambda fields: response) == ["/repos/a", "/repos/b"]
+    assert manifest.unchanged(PATHS, FINGERPRINTS) == []
+
+
+def test_post_failure_resends_everything(manifest):
+    def post(fields):
+        raise ConnectionError("refused")
+
+    assert manifest.exchange(["/repos/a"], post) == ["/repos/a"]
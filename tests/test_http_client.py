@@ -0,0 +1,119 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+
+
+class Server:
+    """Local HTTP/1.1 server answering each request with the next scripted status (then 200)."""
+
+    def __init__(self):
+        self.statuses = []
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                encoding = self.headers.get("Content-Encoding")
+                status = server.statuses.pop(0) if server.statuses else 200
+                if status == "reject-encoded":
+                    status = 415 if encoding else 200
+                if encoding == "gzip" and status == 200:
+                    body = gzip.decompress(body)
+                server.requests.append((self.path, encoding, body))
+                data = json.dumps({"ok": status == 200}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http_client, "_session", None)
+    monkeypatch.setattr(http_client, "_server_encodings", {})
+    monkeypatch.setattr(http_client, "BACKOFF_SECONDS", 0)
+    monkeypatch.setattr(http_client, "COMPRESSION", "gzip")
+    server = Server()
+    yield server
+    server.close()
+
+
+BIG = {"deltas": ["x" * 100] * 50}
+
+
+def test_connections_are_reused(server):
+    for _ in range(3):
+        assert http_client.post(server.url + "/heartbeat", endpoint="heartbeat", json={}).status_code == 200
+    pool = http_client.get_stats()["pools"][server.url]
+    assert pool["connections_opened"] == 1 and pool["requests"] == 3
+
+
+def test_retries_follow_the_endpoint_policy(server):
+    server.statuses = [503]
+    assert http_client.post(server.url + "/heartbeat", endpoint="heartbeat", json={}).status_code == 200
+    assert len(server.requests) == 2
+
+    server.requests.clear()
+    server.statuses = [503]
+    assert http_client.post(server.url + "/poll", endpoint="poll", json={}).status_code == 503
+    assert len(server.requests) == 1   # polls are not safe to repeat
+
+
+def test_refused_connection_is_retried_and_not_sent(server):
+    url = server.url
+    server.close()
+    with pytest.raises(http_client.requests.exceptions.ConnectionError) as error:
+        http_client.post(url + "/poll", endpoint="poll", json={}, retries=1)
+    assert http_client.not_sent(error.value)
+    assert http_client.get_stats()["endpoints"]["poll"]["retries"] >= 1
+
+
+def test_bodies_are_compressed_once_negotiated(server):
+    http_client.post(server.url + "/h", endpoint="heartbeat", json=BIG, compress=True)
+    http_client.set_server_encodings(server.url, ["gzip", "br"])
+    http_client.post(server.url + "/h", endpoint="heartbeat", json=BIG, compress=True)
+    http_client.post(server.url + "/h", endpoint="heartbeat", json={"small": 1}, compress=True)
+    assert [encoding for _, encoding, _ in server.requests] == [None, "gzip", None]
+    assert json.loads(server.requests[1][2]) == BIG
+
+
+@pytest.mark.parametrize("status", [400, 415])
+def test_rejected_encoding_falls_back_to_plain(server, status):
+    http_client.set_server_encodings(server.url, ["gzip"])
+    server.statuses = [status if status == 400 else "reject-encoded"]
+    response = http_client.post(server.url + "/h", endpoint="heartbeat", json=BIG, compress=True)
+    assert response.status_code == 200
+    assert [encoding for _, encoding, _ in server.requests] == ["gzip", None]
+    assert json.loads(server.requests[1][2]) == BIG
+
+    # Compression stays off for that server
+    http_client.post(server.url + "/h", endpoint="heartbeat", json=BIG, compress=True)
+    assert server.requests[-1][1] is None
+
+
+def test_plain_body_rejected_too_keeps_compression(server):
+    http_client.set_server_encodings(server.url, ["gzip"])
+    server.statuses = [400, 400]
+    assert http_client.post(server.url + "/h", endpoint="heartbeat", json=BIG, compress=True).status_code == 400
+    http_client.post(server.url + "/h", endpoint="heartbeat", json=BIG, compress=True)
+    assert server.requests[-1][1] == "gzip"
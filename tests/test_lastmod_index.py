@@ -0,0 +1,71 @@
+import lastmod_index
+
+
+def index_matches_git_log(repo, paths):
+    expected = {path: repo.last_commit(path) for path in paths}
+    assert lastmod_index.get_last_commits(repo.path, paths) == expected
+
+
+def test_advance_over_ours_merge(repo):
+    c1 = repo.commit("c1", f="1", g="1")
+    index_matches_git_log(repo, ["f", "g"])   # builds and stamps the index at c1
+
+    repo.git("checkout", "-q", "-b", "side")
+    repo.commit("side-f", f="2")
+    repo.git("checkout", "-q", "main")
+    repo.commit("main-g", g="2")
+    repo.git("merge", "-q", "-s", "ours", "side", "-m", "m1")
+    lastmod_index.update(repo.path)
+
+    assert lastmod_index.get_last_commits(repo.path, ["f"])["f"] == c1
+    index_matches_git_log(repo, ["f", "g"])
+
+
+def test_rebuild_over_ours_merge(repo):
+    c1 = repo.commit("c1", f="1", g="1")
+    repo.git("checkout", "-q", "-b", "side")
+    repo.commit("side-f", f="2")
+    repo.git("checkout", "-q", "main")
+    repo.git("merge", "-q", "-s", "ours", "side", "-m", "m1")
+
+    assert lastmod_index.get_last_commits(repo.path, ["f", "g"])["f"] == c1
+    index_matches_git_log(repo, ["f", "g"])
+
+
+def test_advance_over_merged_side_branch(repo):
+    repo.commit("c1", f="1", g="1", h="1")
+    index_matches_git_log(repo, ["f", "g", "h"])
+
+    repo.git("checkout", "-q", "-b", "side")
+    repo.commit("side-f", f="2")
+    repo.git("checkout", "-q", "main")
+    repo.commit("main-g", g="2")
+    repo.git("merge", "-q", "--no-edit", "side")
+    repo.commit("main-h", h="2")
+    lastmod_index.update(repo.path)
+    index_matches_git_log(repo, ["f", "g", "h"])
+
+
+def test_reset_rebuilds(repo):
+    repo.commit("c1", f="1")
+    repo.commit("c2", f="2")
+    index_matches_git_log(repo, ["f"])
+    repo.git("reset", "-q", "--hard", "HEAD~1")
+    lastmod_index.update(repo.path)
+    index_matches_git_log(repo, ["f"])
+
+
+def test_other_heads_leave_the_index_alone(repo, monkeypatch):
+    repo.commit("c1", f="1", g="1")
+    repo.git("checkout", "-q", "-b", "side")
+    side = repo.commit("side-f", f="2")
+    repo.git("checkout", "-q", "main")
+    repo.commit("main-g", g="2")
+    index_matches_git_log(repo, ["f", "g"])
+
+    rebuilds = []
+    monkeypatch.setattr(lastmod_index, "_rebuild", lambda *args: rebuilds.append(args))
+    found = lastmod_index.get_last_commits(repo.path, ["f"], head=side)
+    assert found == {"f": repo.last_commit("f", side)}
+    index_matches_git_log(repo, ["f", "g"])
+    assert rebuilds == []
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+
+import local_ip
+
+
+@pytest.fixture
+def discovery(monkeypatch):
+    """local_ip with a scripted interface signature and counted lookups."""
+    state = {"signature": ("eth0",), "public": "203.0.113.7", "local": 0, "lookups": 0}
+
+    def local():
+        state["local"] += 1
+        return {"ipv4": [f"10.0.0.{state['local']}"]}
+
+    def lookup():
+        state["lookups"] += 1
+        return state["public"]
+
+    monkeypatch.setattr(local_ip, "_cache", {"local": None, "public": None, "public_checked_at": 0.0, "signature": None})
+    monkeypatch.setattr(local_ip, "_public_ready", threading.Event())
+    monkeypatch.setattr(local_ip, "PUBLIC_IP_URL", "https://ip.invalid")
+    monkeypatch.setattr(local_ip, "PUBLIC_REFRESH_SECONDS", 3600)
+    monkeypatch.setattr(local_ip, "_interface_signature", lambda: state["signature"])
+    monkeypatch.setattr(local_ip, "get_local_ip_addresses", local)
+    monkeypatch.setattr(local_ip, "_lookup_public_ip", lookup)
+    return state
+
+
+def test_unchanged_interfaces_are_not_rediscovered(discovery):
+    local_ip.refresh()
+    local_ip.refresh()
+    assert (discovery["local"], discovery["lookups"]) == (1, 1)
+    assert local_ip.get_cached_local_ip_addresses() == {"ipv4": ["10.0.0.1"]}
+    assert local_ip.get_public_ip() == "203.0.113.7"
+
+    discovery["signature"] = ("eth0", "wlan0")
+    local_ip.refresh()
+    assert (discovery["local"], discovery["lookups"]) == (2, 2)
+    assert local_ip.get_cached_local_ip_addresses() == {"ipv4": ["10.0.0.2"]}
+
+
+def test_public_ip_is_refreshed_when_due(discovery, monkeypatch):
+    local_ip.refresh()
+    local_ip.refresh(force_public=True)
+    assert discovery["lookups"] == 2
+
+    monkeypatch.setattr(local_ip, "PUBLIC_REFRESH_SECONDS", 0)
+    local_ip.refresh()
+    assert (discovery["local"], discovery["lookups"]) == (1, 3)
+
+
+def test_failed_lookup_keeps_the_last_public_ip(discovery):
+    local_ip.refresh()
+    discovery["public"] = None
+    local_ip.refresh(force_public=True)
+    assert local_ip.get_public_ip() == "203.0.113.7"
+
+
+def test_readers_never_look_up_themselves(discovery):
+    assert local_ip.get_public_ip() is None
+    assert local_ip.get_public_ip(wait_seconds=0.05) is None
+    assert local_ip.get_cached_local_ip_addresses() == {"ipv4": ["10.0.0.1"]}
+    assert local_ip.get_cached_local_ip_addresses() == {"ipv4": ["10.0.0.1"]}
+    assert (discovery["local"], discovery["lookups"]) == (1, 0)
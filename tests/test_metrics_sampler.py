@@ -0,0 +1,38 @@
+from collections import deque
+
+import pytest
+
+import metrics_sampler
+
+
+@pytest.fixture
+def sampler(monkeypatch):
+    monkeypatch.setattr(metrics_sampler, "_history", deque(maxlen=3))
+    return metrics_sampler
+
+
+def test_sample_fields(sampler):
+    entry = sampler.sample()
+    assert set(entry) == {
+        "timestamp", "cpu_percent", "memory_percent", "process_rss_bytes",
+        "disk_read_bytes_per_s", "disk_write_bytes_per_s", "open_files", "threads", "git_processes"
+    }
+    assert entry["process_rss_bytes"] > 0 and entry["threads"] >= 1
+
+
+def test_history_is_a_ring_buffer(sampler):
+    entries = [sampler.sample() for _ in range(5)]
+    assert sampler.history() == entries[2:]
+
+    sampler._history[0]["timestamp"] -= 3600
+    assert sampler.history(seconds=60) == entries[3:]
+
+
+def test_latest_reads_the_buffer(sampler):
+    first = sampler.latest()   # nothing sampled yet: taken inline
+    assert sampler.history() == [first]
+
+    latest = sampler.latest()
+    assert latest == first and len(sampler.history()) == 1
+    latest["cpu_percent"] = -1
+    assert sampler.latest()["cpu_percent"] != -1
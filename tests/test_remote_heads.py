@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+
+import pytest
+
+import git_cache
+import git_utils
+from conftest import Repo
+
+
+@pytest.fixture
+def remote_cache(monkeypatch):
+    monkeypatch.setattr(git_cache, "ENABLED", False)
+    monkeypatch.setattr(git_utils, "_remote_heads_cache", {})
+    monkeypatch.setattr(git_utils, "_remote_heads_versions", {})
+    return git_utils
+
+
+@pytest.fixture
+def upstream(repo):
+    repo.commit("c1", f="1")
+    repo.git("branch", "feature")
+    return repo
+
+
+def local(tmp_path, name, *remotes):
+    """An empty repo with the given (name, url) remotes."""
+    r = Repo(tmp_path / name)
+    os.makedirs(r.path)
+    r.git("init", "-q", "-b", "main")
+    for remote_name, url in remotes:
+        r.git("remote", "add", remote_name, url)
+    return r
+
+
+def test_every_remote_of_every_repo_is_probed(remote_cache, upstream, tmp_path):
+    a = local(tmp_path, "a", ("origin", upstream.path), ("broken", str(tmp_path / "missing")))
+    b = local(tmp_path, "b", ("broken", str(tmp_path / "missing")), ("mirror", upstream.path))
+    head = upstream.git("rev-parse", "HEAD")
+
+    details = remote_cache.get_remote_heads_details_many([a.path, b.path])
+
+    assert details[a.path]["canonical_remote"] == "origin"
+    assert details[a.path]["canonical_heads"] == {"main": head, "feature": head}
+    assert details[a.path]["remotes"]["broken"]["error"]
+    assert details[a.path]["remotes"]["broken"]["heads"] == {}
+    # No healthy origin: the first healthy remote wins
+    assert details[b.path]["canonical_remote"] == "mirror"
+    assert details[b.path]["canonical_heads"] == {"main": head, "feature": head}
+
+
+def test_remotes_pending_at_the_deadline_are_reported(remote_cache, upstream, tmp_path, monkeypatch):
+    a = local(tmp_path, "a", ("origin", upstream.path))
+    release = threading.Event()
+    monkeypatch.setattr(git_utils, "_probe_remote", lambda *args: release.wait(5) and ({}, None, False, 0))
+
+    try:
+        start = time.monotonic()
+        details = remote_cache.get_remote_heads_details_many([a.path], deadline=time.monotonic() + 0.2)
+        assert time.monotonic() - start < 2
+    finally:
+        release.set()
+    origin = details[a.path]["remotes"]["origin"]
+    assert (origin["error"], origin["timed_out"], origin["heads"]) == ("deadline exceeded", True, {})
+
+
+def probe_counter(monkeypatch):
+    calls = []
+    probe = git_utils._probe_remote
+
+    def counting(repo_path, remote_name, timeout):
+        calls.append(remote_name)
+        return probe(repo_path, remote_name, timeout)
+
+    monkeypatch.setattr(git_utils, "_probe_remote", counting)
+    return calls
+
+
+def test_fresh_results_are_served_from_the_cache(remote_cache, upstream, tmp_path, monkeypatch):
+    a = local(tmp_path, "a", ("origin", upstream.path))
+    calls = probe_counter(monkeypatch)
+
+    first = remote_cache.get_remote_heads_details(a.path)
+    second = remote_cache.get_remote_heads_details(a.path)
+    assert calls == ["origin"]
+    assert first["remotes"]["origin"]["cached"] is False
+    assert second["remotes"]["origin"]["cached"] is True
+    assert second["canonical_heads"] == first["canonical_heads"]
+
+    remote_cache.get_remote_heads_details(a.path, use_cache=False)
+    assert calls == ["origin", "origin"]
+
+
+def test_cache_misses_after_invalidation_or_url_change(remote_cache, upstream, tmp_path, monkeypatch):
+    a = local(tmp_path, "a", ("origin", upstream.path))
+    calls = probe_counter(monkeypatch)
+    remote_cache.get_remote_heads_details(a.path)
+
+    remote_cache.invalidate_remote_heads(a.path, "origin")
+    remote_cache.get_remote_heads_details(a.path)
+    assert len(calls) == 2
+
+    a.git("remote", "set-url", "origin", upstream.path + "/.git")
+    assert remote_cache.get_remote_heads_details(a.path)["remotes"]["origin"]["cached"] is False
+    assert len(calls) == 3
+
+
+def test_stale_results_are_served_while_revalidating(remote_cache, upstream, tmp_path, monkeypatch):
+    a = local(tmp_path, "a", ("origin", upstream.path))
+    old = upstream.git("rev-parse", "HEAD")
+    remote_cache.get_remote_heads_details(a.path)
+    version = remote_cache.remote_heads_version(a.path)
+
+    new = upstream.commit("c2", f="2")
+    monkeypatch.setattr(git_utils, "REMOTE_HEADS_TTL_SECONDS", 0)
+    stale = remote_cache.get_remote_heads_details(a.path)
+    assert stale["remotes"]["origin"]["cached"] is True
+    assert stale["canonical_heads"]["main"] == old
+
+    for _ in range(100):
+        if remote_cache.remote_heads_version(a.path) != version:
+            break
+        time.sleep(0.05)
+    assert remote_cache.remote_heads_version(a.path) == version + 1
+    monkeypatch.setattr(git_utils, "REMOTE_HEADS_TTL_SECONDS", 30)
+    assert remote_cache.get_remote_heads_details(a.path)["canonical_heads"]["main"] == new
+
+
+def test_too_stale_results_are_probed_again(remote_cache, upstream, tmp_path, monkeypatch):
+    a = local(tmp_path, "a", ("origin", upstream.path))
+    remote_cache.get_remote_heads_details(a.path)
+    new = upstream.commit("c2", f="2")
+
+    monkeypatch.setattr(git_utils, "REMOTE_HEADS_MAX_STALE_SECONDS", 0)
+    details = remote_cache.get_remote_heads_details(a.path)
+    assert details["remotes"]["origin"]["cached"] is False
+    assert details["canonical_heads"]["main"] == new
+
+
+def test_version_only_moves_when_heads_change(remote_cache, upstream, tmp_path):
+    a = local(tmp_path, "a", ("origin", upstream.path))
+    assert remote_cache.remote_heads_version(a.path) == 0
+    remote_cache.get_remote_heads_details(a.path)
+    assert remote_cache.remote_heads_version(a.path) == 1
+
+    remote_cache.get_remote_heads_details(a.path, use_cache=False)
+    assert remote_cache.remote_heads_version(a.path) == 1
+
+    upstream.commit("c2", f="2")
+    remote_cache.get_remote_heads_details(a.path, use_cache=False)
+    assert remote_cache.remote_heads_version(a.path) == 2
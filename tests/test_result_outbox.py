@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+import http_client
+import result_outbox
+
+
+def refused():
+    return requests.exceptions.ConnectionError(MaxRetryError(None, "/", NewConnectionError(None, "refused")))
+
+
+@pytest.mark.parametrize("error, unsent", [
+    (http_client.NotSent("no token"), True),
+    (requests.exceptions.ConnectTimeout(), True),
+    (refused(), True),
+    (requests.exceptions.ReadTimeout(), False),
+    (requests.exceptions.ConnectionError("Connection aborted"), False),
+    (RuntimeError("HTTP 500"), False),
+])
+def test_not_sent(error, unsent):
+    assert http_client.not_sent(error) is unsent
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    monkeypatch.setattr(result_outbox, "BATCH_WINDOW_MS", 0)
+    monkeypatch.setattr(result_outbox, "RETRY_SECONDS", 0)
+    monkeypatch.setattr(result_outbox, "_queue", result_outbox.deque())
+    monkeypatch.setattr(result_outbox, "_stats", dict.fromkeys(result_outbox._stats, 0))
+    return result_outbox
+
+
+class Stop(BaseException):
+    pass
+
+
+def run(outbox, outcomes):
+    """Run the send loop; send() raises each scripted error in turn, then stops the loop."""
+    calls = []
+
+    def send(results, wait_seconds):
+        calls.append(list(results))
+        if len(calls) > len(outcomes):
+            raise Stop()
+        raise outcomes[len(calls) - 1]
+
+    def loop():
+        try:
+            outbox._send_loop(send, lambda tasks: None, None)
+        except Stop:
+            pass
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    return calls, thread
+
+
+def test_unsent_results_are_retried(outbox):
+    outbox.put([{"task_id": "a"}])
+    calls, thread = run(outbox, [refused(), requests.exceptions.ConnectTimeout()])
+    thread.join(5)
+    assert calls == [[{"task_id": "a"}]] * 3
+    assert outbox.get_stats()["dropped"] == 0
+
+
+def test_results_are_not_resent_after_read_timeout(outbox):
+    outbox.put([{"task_id": "a"}])
+    calls, thread = run(outbox, [requests.exceptions.ReadTimeout()])
+    thread.join(0.5)
+    outbox.put([{"task_id": "b"}])
+    thread.join(5)
+    assert calls == [[{"task_id": "a"}], [{"task_id": "b"}]]
+    assert outbox.get_stats()["dropped"] == 1
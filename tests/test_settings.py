@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+import settings
+
+
+@pytest.fixture
+def settings_file(tmp_path, monkeypatch):
+    path = tmp_path / "settings.json"
+    monkeypatch.setattr(settings, "SETTINGS_FILE", path)
+    monkeypatch.setattr(settings, "_settings", {})
+    monkeypatch.setattr(settings, "_user_settings", {})
+    return path
+
+
+def test_saving_keeps_defaults_out_of_the_file(settings_file):
+    settings_file.write_text(json.dumps({"log_level": "DEBUG", "git_executor": {"max_processes": 4}}))
+    settings.reload()
+    assert settings.get_nested("git_executor", "max_processes") == 4
+    assert settings.get_nested("git_cache", "enabled", True) is True
+
+    settings.add_repository("/srv/repo", reload_settings=False)
+    assert json.loads(settings_file.read_text()) == {
+        "log_level": "DEBUG",
+        "git_executor": {"max_processes": 4},
+        "repositories": ["/srv/repo"],
+    }
+
+    settings.remove_repository("/srv/repo")
+    assert json.loads(settings_file.read_text())["repositories"] == []
+
+
+def test_first_save_writes_only_repositories(settings_file):
+    settings.add_repository("/srv/repo")
+    assert json.loads(settings_file.read_text()) == {"repositories": ["/srv/repo"]}
+    settings.remove_repository("/srv/repo")
@@ -0,0 +1,89 @@
+import pytest
+
+import status_cache
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(status_cache, "ENABLED", True)
+    monkeypatch.setattr(status_cache, "TTL_SECONDS", 300)
+    monkeypatch.setattr(status_cache, "_entries", {})
+    monkeypatch.setattr(status_cache, "_generation", {})
+    monkeypatch.setattr(status_cache, "_watched", set())
+    return status_cache
+
+
+class Compute:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return {"files": [{"path": "f", "status": "M"}], "run": self.calls}, None
+
+
+def test_unwatched_repo_always_misses(repo, cache):
+    repo.commit("c1", f="1")
+    compute = Compute()
+    cache.get_or_compute(repo.path, compute)
+    cache.get_or_compute(repo.path, compute)
+    assert compute.calls == 2
+
+
+def test_watched_repo_hits_until_marked_dirty(repo, cache):
+    repo.commit("c1", f="1")
+    cache.mark_watched(repo.path)
+    compute = Compute()
+
+    first, _ = cache.get_or_compute(repo.path, compute)
+    first["files"].clear()   # callers get copies
+    second, _ = cache.get_or_compute(repo.path, compute)
+    assert compute.calls == 1 and second["files"] == [{"path": "f", "status": "M"}]
+
+    generation = cache.generation(repo.path)
+    cache.mark_dirty(repo.path)
+    assert cache.generation(repo.path) == generation + 1
+    assert cache.get_or_compute(repo.path, compute)[0]["run"] == 2
+
+
+def test_git_changes_and_ttl_invalidate(repo, cache, monkeypatch):
+    repo.commit("c1", f="1")
+    cache.mark_watched(repo.path)
+    compute = Compute()
+    cache.get_or_compute(repo.path, compute)
+
+    repo.commit("c2", f="2")   # moves HEAD/index: new fingerprint
+    cache.get_or_compute(repo.path, compute)
+    assert compute.calls == 2
+
+    monkeypatch.setattr(cache, "TTL_SECONDS", 0)
+    cache.get_or_compute(repo.path, compute)
+    assert compute.calls == 3
+
+
+def test_errors_are_not_cached(repo, cache):
+    repo.commit("c1", f="1")
+    cache.mark_watched(repo.path)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        return None, "git status failed"
+
+    assert cache.get_or_compute(repo.path, failing) == (None, "git status failed")
+    cache.get_or_compute(repo.path, failing)
+    assert len(calls) == 2
+
+
+def test_result_racing_a_dirty_mark_is_not_stored(repo, cache):
+    repo.commit("c1", f="1")
+    cache.mark_watched(repo.path)
+    compute = Compute()
+
+    def racing():
+        cache.mark_dirty(repo.path)   # a file changed while status was running
+        return compute()
+
+    cache.get_or_compute(repo.path, racing)
+    cache.get_or_compute(repo.path, compute)
+    assert compute.calls == 2
@@ -0,0 +1,169 @@
+import json
+import threading
+
+import pytest
+
+import http_client
+import task_channel
+
+
+class StreamResponse:
+    def __init__(self, lines, status_code=200, content_type="text/event-stream", headers=None):
+        self.lines = lines
+        self.status_code = status_code
+        self.headers = {"Content-Type": content_type, **(headers or {})}
+        self.closed = False
+
+    def iter_lines(self, decode_unicode=True):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def test_iter_sse_framing():
+    lines = [
+        ": keep-alive",
+        "event: tasks",
+        "data: [1,",
+        "data:2]",
+        "",
+        "data: plain",
+        "",
+        "event: empty",
+        "",
+        "event: reconnect",
+        "data: {}",
+        "",
+    ]
+    assert list(task_channel.iter_sse(StreamResponse(lines))) == [
+        ("comment", ""),
+        ("tasks", "[1,\n2]"),
+        ("message", "plain"),
+        ("reconnect", "{}"),
+    ]
+
+
+@pytest.fixture
+def channel(monkeypatch):
+    monkeypatch.setattr(task_channel, "_setting", lambda key, default: {"mode": "auto"}.get(key, default))
+    handled, polls = [], []
+
+    def poll(results, wait_seconds):
+        polls.append(wait_seconds)
+        return [], False
+
+    return task_channel.TaskChannel(poll, handled.extend, lambda: "token", "http://stargit/stream"), handled, polls
+
+
+def test_stream_delivers_tasks(channel, monkeypatch):
+    channel, handled, _ = channel
+    tasks = [{"id": "t1", "action": "get_status"}]
+    response = StreamResponse(["event: tasks", "data: " + json.dumps({"tasks": tasks}), "", "event: reconnect", "data: x", ""])
+    monkeypatch.setattr(http_client, "get", lambda *args, **kwargs: response)
+
+    active = threading.Event()
+    active.set()
+    assert channel._run_stream(active)
+    assert handled == tasks and response.closed
+    assert channel._pick_mode() == "stream"
+
+
+@pytest.mark.parametrize("outcome", [
+    ConnectionError("refused"),
+    StreamResponse([], status_code=404, content_type="text/html"),
+    StreamResponse([]),   # accepted but closed without any event
+])
+def test_failed_stream_falls_back_to_long_poll_then_poll(channel, monkeypatch, outcome):
+    channel, _, polls = channel
+
+    def get(*args, **kwargs):
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(http_client, "get", get)
+    active = threading.Event()
+    active.set()
+    assert not channel._run_stream(active)
+    assert channel._pick_mode() == "long_poll"
+
+    # The server answered the long poll at once without holding it
+    assert not channel._poll_once(25)
+    assert polls == [25]
+    assert channel._pick_mode() == "poll"
+
+
+def test_liveness_follows_the_advertised_keepalive(channel, monkeypatch):
+    channel, _, _ = channel
+    response = StreamResponse([": keepalive", ""], headers={"X-Keepalive-Interval": "60"})
+    monkeypatch.setattr(http_client, "get", lambda *args, **kwargs: response)
+    active = threading.Event()
+    active.set()
+
+    channel.mode = "stream"
+    assert channel.liveness_timeout(45) == 45
+    assert channel._run_stream(active)
+    assert channel.keepalive_seconds == 60
+    assert channel.liveness_timeout(45) == 180
+
+    channel.mode = "long_poll"
+    assert channel.liveness_timeout(45) == 45
+
+
+@pytest.mark.parametrize("header", [None, "soon", "0"])
+def test_unusable_keepalive_keeps_the_default(channel, monkeypatch, header):
+    channel, _, _ = channel
+    response = StreamResponse([": keepalive", ""], headers={"X-Keepalive-Interval": header} if header else {})
+    monkeypatch.setattr(http_client, "get", lambda *args, **kwargs: response)
+    active = threading.Event()
+    active.set()
+
+    channel.mode = "stream"
+    assert channel._run_stream(active)
+    assert channel.liveness_timeout(45) == 45
+
+
+class BlockingStream(StreamResponse):
+    """Delivers its lines only once `release` is set, like a reader stuck in a stalled read."""
+
+    def __init__(self, lines, release):
+        super().__init__(lines)
+        self.release = release
+        self.reading = threading.Event()
+
+    def iter_lines(self, decode_unicode=True):
+        self.reading.set()
+        self.release.wait(5)
+        return iter(self.lines)
+
+
+def test_superseded_stream_drops_its_events(channel, monkeypatch):
+    old, handled, _ = channel
+    new = task_channel.TaskChannel(lambda *args: ([], False), handled.extend, lambda: "token", "http://stargit/stream")
+    task = "data: " + json.dumps({"tasks": [{"id": "t1"}]})
+    release = threading.Event()
+    stalled_response = BlockingStream(["event: tasks", task, ""], release)
+    responses = [stalled_response,
+                 StreamResponse(["event: tasks", task, "", "event: reconnect", "data: x", ""])]
+    monkeypatch.setattr(http_client, "get", lambda *args, **kwargs: responses.pop(0))
+
+    # The stalled reader is replaced while its own Event is still set
+    old_active, new_active = threading.Event(), threading.Event()
+    old_active.set()
+    new_active.set()
+    stalled = threading.Thread(target=old._run_stream, args=(old_active,))
+    stalled.start()
+    assert stalled_response.reading.wait(5)
+    assert new._run_stream(new_active)
+    release.set()
+    stalled.join(5)
+
+    assert handled == [{"id": "t1"}]
+    assert old._pick_mode() == "stream"   # superseded, not unavailable
@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+import task_coalescer
+
+
+@pytest.fixture
+def coalescer(monkeypatch):
+    monkeypatch.setattr(task_coalescer, "ENABLED", True)
+    monkeypatch.setattr(task_coalescer, "WINDOW_SECONDS", 10)
+    monkeypatch.setattr(task_coalescer, "_inflight", {})
+    monkeypatch.setattr(task_coalescer, "_recent", {})
+    return task_coalescer
+
+
+def task(task_id, path="README.md", action="get_file"):
+    return {"id": task_id, "action": action, "params": {"repo_name": "a", "file_path": path}}
+
+
+class Execute:
+    def __init__(self, seconds=0, error=None):
+        self.calls = []
+        self.seconds = seconds
+        self.error = error
+
+    def __call__(self, t):
+        self.calls.append(t["id"])
+        time.sleep(self.seconds)
+        return [{"task_id": t["id"], "result": f"content of {t['params']['file_path']}", "error": self.error}]
+
+
+def test_identical_task_reuses_results_under_its_own_id(coalescer):
+    execute = Execute()
+    coalescer.run(task("1"), "fp", execute)
+    assert coalescer.run(task("2"), "fp", execute) == [
+        {"task_id": "2", "result": "content of README.md", "error": None}
+    ]
+    assert execute.calls == ["1"]
+
+
+@pytest.mark.parametrize("second, fingerprint", [
+    (task("2", path="other.md"), "fp"),          # different params
+    (task("2", action="get_blame"), "fp"),       # different action
+    (task("2"), "fp-moved"),                     # repository changed
+])
+def test_only_identical_tasks_on_an_unchanged_repo_are_merged(coalescer, second, fingerprint):
+    execute = Execute()
+    coalescer.run(task("1"), "fp", execute)
+    coalescer.run(second, fingerprint, execute)
+    assert execute.calls == ["1", "2"]
+
+
+def test_no_reuse_without_fingerprint_errors_or_after_the_window(coalescer, monkeypatch):
+    execute = Execute()
+    coalescer.run(task("1"), None, execute)
+    coalescer.run(task("2"), None, execute)
+
+    failing = Execute(error="boom")
+    coalescer.run(task("3"), "fp", failing)
+    coalescer.run(task("4"), "fp", failing)
+
+    coalescer.run(task("5"), "fp2", execute)
+    monkeypatch.setattr(coalescer, "WINDOW_SECONDS", 0)
+    time.sleep(0.01)
+    coalescer.run(task("6"), "fp2", execute)
+
+    assert execute.calls == ["1", "2", "5", "6"]
+    assert failing.calls == ["3", "4"]
+
+
+def test_concurrent_identical_tasks_share_one_execution(coalescer):
+    execute = Execute(seconds=0.2)
+    results = {}
+
+    def run(task_id):
+        results[task_id] = coalescer.run(task(task_id), None, execute)
+
+    threads = [threading.Thread(target=run, args=(task_id,)) for task_id in ("1", "2", "3")]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert execute.calls == ["1"]
+    assert [results[task_id][0]["task_id"] for task_id in ("1", "2", "3")] == ["1", "2", "3"]
@@ -0,0 +1,113 @@
+import time
+import threading
+
+import task_executor
+import task_registry
+
+
+@task_registry.task_handler("test_read", kind="read")
+def _test_read(*args):
+    pass
+
+
+@task_registry.task_handler("test_write")
+def _test_write(*args):
+    pass
+
+
+@task_registry.task_handler("test_barrier", concurrency="barrier", needs_repo=False)
+def _test_barrier(*args):
+    pass
+
+
+def task(task_id, action, repo="a", seconds=0.05):
+    return {"id": task_id, "action": action, "params": {"repo_name": repo}, "seconds": seconds}
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+
+    def __call__(self, t):
+        with self.lock:
+            self.events.append(("start", t["id"], time.monotonic()))
+        time.sleep(t["seconds"])
+        with self.lock:
+            self.events.append(("end", t["id"], time.monotonic()))
+        return [{"task_id": t["id"]}]
+
+    def at(self, kind, task_id):
+        return next(when for k, i, when in self.events if k == kind and i == task_id)
+
+
+def test_later_batch_for_other_repo_does_not_wait():
+    process = Recorder()
+    sent = []
+    task_executor.submit([task("slow", "test_write", "a", 0.5)], process, sent.extend)
+    time.sleep(0.05)
+    task_executor.submit([task("fast", "test_read", "b")], process, sent.extend)
+    time.sleep(0.2)
+    assert [r["task_id"] for r in sent] == ["fast"]
+
+    task_executor.run_tasks([task("after", "test_read", "a")], process)
+    assert process.at("start", "after") >= process.at("end", "slow")
+    assert [r["task_id"] for r in sent] == ["fast", "slow"]
+
+
+def test_writes_on_one_repo_run_in_order():
+    process = Recorder()
+    task_executor.run_tasks([task(f"w{i}", "test_write", "a", 0.03) for i in range(4)], process)
+    for i in range(3):
+        assert process.at("start", f"w{i + 1}") >= process.at("end", f"w{i}")
+
+
+def test_reads_overlap_but_wait_for_earlier_writes():
+    process = Recorder()
+    task_executor.run_tasks([
+        task("w", "test_write", "a", 0.1),
+        task("r1", "test_read", "a", 0.2),
+        task("r2", "test_read", "a", 0.2),
+        task("w2", "test_write", "a", 0.05),
+    ], process)
+    assert process.at("start", "r1") >= process.at("end", "w")
+    assert process.at("start", "r2") < process.at("end", "r1")
+    assert process.at("start", "w2") >= max(process.at("end", "r1"), process.at("end", "r2"))
+
+
+def test_repos_run_concurrently_and_results_keep_submission_order():
+    process = Recorder()
+    results = task_executor.run_tasks([
+        task("a", "test_write", "a", 0.3),
+        task("b", "test_write", "b", 0.05),
+        task("c", "test_write", "c", 0.05),
+    ], process)
+    assert process.at("end", "b") < process.at("end", "a")
+    assert process.at("start", "c") < process.at("end", "a")
+    assert [r["task_id"] for r in results] == ["a", "b", "c"]
+
+
+def test_barrier_waits_for_earlier_tasks_and_blocks_later_ones():
+    process = Recorder()
+    task_executor.run_tasks([
+        task("a", "test_read", "a", 0.1),
+        task("b", "test_write", "b", 0.1),
+        task("bar", "test_barrier", None, 0.05),
+        task("after", "test_read", "c", 0.01),
+    ], process)
+    assert process.at("start", "bar") >= max(process.at("end", "a"), process.at("end", "b"))
+    assert process.at("start", "after") >= process.at("end", "bar")
+
+
+def test_failing_task_reports_an_error_and_does_not_block_its_lane():
+    def process(t):
+        if t["id"] == "bad":
+            raise RuntimeError("boom")
+        return [{"task_id": t["id"], "result": "ok"}]
+
+    results = task_executor.run_tasks([task("bad", "test_write"), task("next", "test_write")], process)
+    assert results == [
+        {"task_id": "bad", "result": None, "error": "boom"},
+        {"task_id": "next", "result": "ok"},
+    ]
+    assert task_executor.get_stats()["lanes"] == 0
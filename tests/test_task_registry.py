@@ -0,0 +1,51 @@
+import pytest
+
+import settings
+import task_executor
+import task_registry
+
+
+@task_registry.task_handler("test_registry_read", kind="read", timeout=5)
+def _test_registry_read(*args):
+    return "read"
+
+
+def test_unknown_action_has_no_handler_and_is_scheduled_as_a_write():
+    task = {"id": "t", "action": "no_such_action", "params": {"repo_name": "a"}}
+    assert task_registry.get("no_such_action") is None
+    assert not task_executor.is_read(task)
+    assert not task_executor.is_barrier(task)
+
+
+def test_registration_is_validated():
+    with pytest.raises(ValueError):
+        task_registry.task_handler("test_registry_read")(lambda *args: None)
+    with pytest.raises(ValueError):
+        task_registry.task_handler("test_registry_bad_kind", kind="delete")(lambda *args: None)
+    with pytest.raises(ValueError):
+        task_registry.task_handler("test_registry_bad_class", concurrency="global")(lambda *args: None)
+    assert task_registry.get("test_registry_bad_kind") is None
+
+
+def test_timeout_override_from_settings(monkeypatch):
+    handler = task_registry.get("test_registry_read")
+    assert handler.is_read and handler.timeout == 5
+
+    original = settings.get_nested
+
+    def get_nested(section, key, default=None):
+        if (section, key) == ("task_registry", "timeouts"):
+            return {"test_registry_read": 1}
+        return original(section, key, default)
+
+    monkeypatch.setattr(settings, "get_nested", get_nested)
+    assert handler.timeout == 1
+
+
+def test_latency_histogram():
+    task_registry.record("test_registry_latency", 0.02)
+    task_registry.record("test_registry_latency", 3, ok=False)
+    stats = task_registry.get_stats()["actions"]["test_registry_latency"]
+    assert stats["count"] == 2 and stats["errors"] == 1
+    assert stats["histogram"]["<=0.05s"] == 1 and stats["histogram"]["<=5s"] == 1
+    assert stats["max_seconds"] == 3
@@ -3,13 +3,15 @@ import os
 import time
 import threading
 import logging
-import requests
 import json
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
 import git_utils
+import http_client
+import status_cache
+import fsmonitor
 
 # === SILENCE WATCHDOG NOISE FOREVER ===
 logging.getLogger("watchdog").setLevel(logging.WARNING)
@@ -46,6 +48,9 @@ class LiveDiffWatcher(FileSystemEventHandler):
         self.last_reported = 0
         self.report_every = 1000  # Whisper every 1000th ignored event
 
+        # core.fsmonitor journal (None unless enabled for this repo)
+        self.fsmonitor_journal = None
+
     def should_ignore(self, event_src_path: str) -> bool:
         try:
             path = Path(event_src_path).resolve()
@@ -83,6 +88,14 @@ class LiveDiffWatcher(FileSystemEventHandler):
             return True  # Be safe
 
     def on_any_event(self, event):
+        if self.fsmonitor_journal:
+            try:
+                self.fsmonitor_journal.on_event(event)
+            except Exception as e:
+                logger.debug(f"fsmonitor journal failed: {e}")
+
+        self._mark_status_dirty(event)
+
         if event.is_directory:
             return
 
@@ -129,6 +142,21 @@ class LiveDiffWatcher(FileSystemEventHandler):
         except Exception as e:
             logger.error(f"Failed to compute diff for live update: {e}")
 
+    def _mark_status_dirty(self, event):
+        """
+        Any working tree change (tracked, untracked, directories) can change
+        `git status`. Changes inside .git are covered by the status cache's
+        own fingerprint, and status itself rewrites .git/index.
+        """
+        for src in (event.src_path, getattr(event, "dest_path", None)):
+            if not src:
+                continue
+            path = Path(src)
+            if '.git' in path.parts or (self.log_file_path and path == self.log_file_path):
+                continue
+            status_cache.mark_dirty(self.repo_path)
+            return
+
     def _increment_and_maybe_report(self, path: Path, reason: str):
         """Thread-safe counter + occasional whisper"""
         self.ignored_count += 1
@@ -189,11 +217,11 @@ class LiveSyncManager:
 
                 print(f"Sending to {LIVE_UPDATE_ENDPOINT} with token: {access_token[:20]}...", flush=True)
 
-                ret = requests.post(
+                ret = http_client.post(
                     LIVE_UPDATE_ENDPOINT,
+                    endpoint="live_update",
                     json=payload,
-                    headers={"Authorization": f"Bearer {access_token}"},
-                    timeout=8
+                    headers={"Authorization": f"Bearer {access_token}"}
                 )
 
                 #print(f"HTTP {ret.status_code} {ret.reason}", flush=True)
@@ -215,7 +243,9 @@ class LiveSyncManager:
                 logger.error(f"Live update failed for {name}: {e}")
 
         handler = LiveDiffWatcher(repo_path, repo_name, server_uuid, send_update)
+        handler.fsmonitor_journal = fsmonitor.attach(repo_path)
         self.observer.schedule(handler, repo_path, recursive=True)
+        status_cache.mark_watched(repo_path)
         logger.info(f"Started live sync watcher: {repo_name}")
 
     def start_all(self, repositories, server_uuid, token_getter):
@@ -252,4 +282,4 @@ class LiveSyncManager:
 # === Public API ===
 def start_live_sync(repositories, server_uuid, token_getter):
     """Call this once at startup"""
-    LiveSyncManager().start_all(repositories, server_uuid, token_getter)
+    LiveSyncManager().start_all(repositories, server_uuid, token_getter)